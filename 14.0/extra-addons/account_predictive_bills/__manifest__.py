@@ -5,7 +5,10 @@
     'version': '1.0',
     'depends': ['account_accountant'],
     'description': """Let the system try to select the right account, taxes and/or product for your vendor bills""",
-    'data': ['views/account_move_view.xml'],
+    'data': [
+        'security/ir.model.access.csv',
+        'views/account_move_view.xml',
+    ],
     'auto_install': True,
     'license': 'OEEL-1',
 }
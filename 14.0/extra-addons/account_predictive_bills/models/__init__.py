@@ -1,3 +1,4 @@
 # -*- encoding: utf-8 -*-
 
+from . import account_bill_prediction
 from . import account_invoice
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+from odoo import api, fields, models, tools
+
+# Mapping between the languages and the postgres text search configurations used to predict the vendor bill lines.
+# The lines are indexed for each configuration, 'english' being the default one.
+PREDICT_POSTGRES_DICTIONARIES = {'fr': 'french'}
+PREDICT_POSTGRES_DEFAULT_DICTIONARY = 'english'
+
+
+class AccountBillPrediction(models.Model):
+    ''' The text search documents of the posted vendor bill lines used to predict the new ones.
+
+    The documents are computed once when posting the vendor bills, instead of rebuilding them from the names of the
+    journal items for each prediction. They are stored in a GIN-indexed 'document' column created in 'init'.
+    '''
+    _name = 'account.bill.prediction'
+    _description = "Vendor Bill Line Prediction Document"
+    _log_access = False
+
+    line_id = fields.Many2one('account.move.line', string='Journal Item', required=True, readonly=True, index=True, ondelete='cascade')
+    company_id = fields.Many2one('res.company', string='Company', required=True, readonly=True)
+    partner_id = fields.Many2one('res.partner', string='Partner', readonly=True)
+    product_id = fields.Many2one('product.product', string='Product', readonly=True)
+    account_id = fields.Many2one('account.account', string='Account', readonly=True)
+    invoice_date = fields.Date(string='Bill Date', readonly=True)
+    dictionary = fields.Char(string='Text Search Configuration', required=True, readonly=True)
+
+    def init(self):
+        if not tools.column_exists(self._cr, self._table, 'document'):
+            tools.create_column(self._cr, self._table, 'document', 'tsvector')
+        self._cr.execute('''
+            CREATE INDEX IF NOT EXISTS account_bill_prediction_document_idx
+            ON account_bill_prediction USING gin (document)
+        ''')
+        self._cr.execute('''
+            CREATE INDEX IF NOT EXISTS account_bill_prediction_date_idx
+            ON account_bill_prediction (company_id, dictionary, invoice_date DESC)
+        ''')
+
+        # Index the bills posted before installing the module.
+        self._cr.execute('SELECT 1 FROM account_bill_prediction LIMIT 1')
+        if not self._cr.fetchone():
+            self._index_lines()
+
+    @api.model
+    def _get_dictionaries(self):
+        return list(set(PREDICT_POSTGRES_DICTIONARIES.values()) | {PREDICT_POSTGRES_DEFAULT_DICTIONARY})
+
+    @api.model
+    def _index_lines(self, lines=None):
+        ''' (Re)compute the documents of the posted vendor bill lines.
+        :param lines:   An optional account.move.line recordset. All vendor bill lines are indexed if not specified.
+                        Lines that are not posted vendor bill lines are only removed from the index.
+        '''
+        if lines is not None and not lines:
+            return
+
+        self.env['account.move.line'].flush(['name', 'partner_id', 'product_id', 'account_id', 'display_type', 'exclude_from_invoice_tab'])
+        self.env['account.move'].flush(['move_type', 'state', 'invoice_date'])
+
+        line_clause = ''
+        params = {'dictionaries': self._get_dictionaries()}
+        if lines is not None:
+            line_clause = 'AND aml.id IN %(line_ids)s'
+            params['line_ids'] = tuple(lines.ids)
+            self._cr.execute('DELETE FROM account_bill_prediction WHERE line_id IN %(line_ids)s', params)
+        else:
+            self._cr.execute('DELETE FROM account_bill_prediction')
+
+        self._cr.execute('''
+            INSERT INTO account_bill_prediction
+                (line_id, company_id, partner_id, product_id, account_id, invoice_date, dictionary, document)
+            SELECT
+                aml.id,
+                aml.company_id,
+                aml.partner_id,
+                aml.product_id,
+                aml.account_id,
+                move.invoice_date,
+                dictionary.name,
+                COALESCE(setweight(to_tsvector(dictionary.name::regconfig, aml.name), 'B'), ''::tsvector) ||
+                COALESCE(setweight(to_tsvector('simple', 'partnerid' || replace(aml.partner_id::text, '-', 'x')), 'A'), ''::tsvector)
+            FROM account_move_line aml
+            JOIN account_move move ON move.id = aml.move_id
+            CROSS JOIN unnest(%(dictionaries)s::text[]) AS dictionary(name)
+            WHERE move.move_type = 'in_invoice'
+                AND move.state = 'posted'
+                AND aml.display_type IS NULL
+                AND NOT aml.exclude_from_invoice_tab
+                ''' + line_clause + '''
+        ''', params)
+        self.invalidate_cache()
@@ -2,6 +2,7 @@
 # Part of Odoo. See LICENSE file for full copyright and licensing details.
 
 from odoo import api, fields, models, _
+from odoo.addons.account_predictive_bills.models.account_bill_prediction import PREDICT_POSTGRES_DICTIONARIES, PREDICT_POSTGRES_DEFAULT_DICTIONARY
 import re
 
 import logging
@@ -16,10 +17,13 @@ class AccountMove(models.Model):
         # OVERRIDE
         to_predict_lines = self.invoice_line_ids.filtered(lambda line: line.predict_from_name)
         to_predict_lines.predict_from_name = False
+        predictions = to_predict_lines._predict_values()
         for line in to_predict_lines:
+            prediction = predictions.get(line, {})
+
             # Predict product.
             if not line.product_id:
-                predicted_product_id = line._predict_product(line.name)
+                predicted_product_id = prediction.get('product_id')
                 if predicted_product_id and predicted_product_id != line.product_id.id:
                     line.product_id = predicted_product_id
                     line._onchange_product_id()
@@ -28,22 +32,32 @@ class AccountMove(models.Model):
             # Product may or may not have been set above, if it has been set, account and taxes are set too
             if not line.product_id:
                 # Predict account.
-                predicted_account_id = line._predict_account(line.name, line.partner_id)
+                predicted_account_id = prediction.get('account_id')
                 if predicted_account_id and predicted_account_id != line.account_id.id:
                     line.account_id = predicted_account_id
                     line._onchange_account_id()
                     line.recompute_tax_line = True
 
                 # Predict taxes
-                predicted_tax_ids = line._predict_taxes(line.name)
-                if predicted_tax_ids == [None]:
-                    predicted_tax_ids = []
+                predicted_tax_ids = prediction.get('tax_ids', False)
                 if predicted_tax_ids is not False and set(predicted_tax_ids) != set(line.tax_ids.ids):
                     line.tax_ids = self.env['account.tax'].browse(predicted_tax_ids)
                     line.recompute_tax_line = True
 
         return super(AccountMove, self)._onchange_recompute_dynamic_lines()
 
+    def _post(self, soft=True):
+        # OVERRIDE to index the lines of the posted vendor bills for the next predictions.
+        posted = super()._post(soft)
+        self.env['account.bill.prediction']._index_lines(posted.filtered(lambda move: move.move_type == 'in_invoice').line_ids)
+        return posted
+
+    def button_draft(self):
+        # OVERRIDE to remove the lines of the vendor bills from the prediction index.
+        res = super().button_draft()
+        self.env['account.bill.prediction']._index_lines(self.filtered(lambda move: move.move_type == 'in_invoice').line_ids)
+        return res
+
 
 class AccountMoveLine(models.Model):
     _inherit = 'account.move.line'
@@ -51,110 +65,197 @@ class AccountMoveLine(models.Model):
     predict_from_name = fields.Boolean(store=False,
         help="Technical field used to know on which lines the prediction must be done.")
 
+    def write(self, vals):
+        # OVERRIDE to keep the prediction index up-to-date when editing the posted vendor bill lines.
+        res = super().write(vals)
+        if any(field_name in vals for field_name in ('name', 'partner_id', 'product_id', 'account_id', 'tax_ids')):
+            self.env['account.bill.prediction']._index_lines(self.filtered(
+                lambda line: line.parent_state == 'posted' and line.move_id.move_type == 'in_invoice'
+            ))
+        return res
+
     def _get_predict_postgres_dictionary(self):
         lang = self._context.get('lang') and self._context.get('lang')[:2]
-        return {'fr': 'french'}.get(lang, 'english')
+        return PREDICT_POSTGRES_DICTIONARIES.get(lang, PREDICT_POSTGRES_DEFAULT_DICTIONARY)
 
-    def _predict_field(self, sql_query, description):
-        psql_lang = self._get_predict_postgres_dictionary()
+    def _get_predict_company_id(self):
+        return self.move_id.journal_id.company_id.id or self.env.company.id
+
+    @api.model
+    def _get_predict_description(self, description):
+        ''' Convert a line description to a text search query matching any of its words. '''
         parsed_description = re.sub(r"[*&()|!':<>=%/~@,.;$\[\]]+", " ", description)
-        parsed_description = ' | '.join(parsed_description.split())
-        limit_parameter = self.env["ir.config_parameter"].sudo().get_param("account.bill.predict.history.limit", '10000')
+        return ' | '.join(parsed_description.split())
+
+    def _predict_values(self):
+        ''' Predict the product, the account and the taxes of the lines in self based on their description.
+        All lines of a company are predicted at once (see '_predict_batch').
+        :return: A dictionary mapping each line to its predicted values (see '_predict_batch').
+        '''
+        lines_by_company = {}
+        for line in self.filtered('name'):
+            company_id = line._get_predict_company_id()
+            lines_by_company.setdefault(company_id, []).append(line)
+
+        predictions = {}
+        for company_id, lines in lines_by_company.items():
+            results = self._predict_batch(company_id, [(line.name, line.partner_id) for line in lines])
+            for line, prediction in zip(lines, results):
+                predictions[line] = prediction
+        return predictions
+
+    @api.model
+    def _predict_batch(self, company_id, descriptions):
+        ''' Predict the product, the account and the taxes of some vendor bill lines based on their description, using
+        the documents of the latest posted vendor bill lines (see account.bill.prediction). All predictions are made by
+        a single query.
+        :param company_id:      The id of the company of the vendor bill.
+        :param descriptions:    A list of (description, partner) tuples, one per line to predict. The account is only
+                                predicted when a partner is given.
+        :return:                A list of dictionaries, one per description, containing the predicted values:
+                                {'product_id': <id or None>, 'account_id': <id>, 'tax_ids': [<id>, ...]}.
+                                A key is missing when nothing has been predicted.
+        '''
+        predictions = [{} for dummy in descriptions]
+        if not descriptions:
+            return predictions
+
+        psql_lang = self._get_predict_postgres_dictionary()
+        limit_parameter = int(self.env["ir.config_parameter"].sudo().get_param("account.bill.predict.history.limit", '10000'))
+
+        queries = []
+        account_queries = []
+        for description, partner in descriptions:
+            queries.append(self._get_predict_description(description))
+            if partner:
+                description += ' partnerid' + str(partner.id or '').replace('-', 'x')
+                account_queries.append(self._get_predict_description(description))
+            else:
+                account_queries.append(None)
+
+        # Only the latest 'limit_parameter' vendor bill lines are used to predict.
+        self.env.cr.execute('''
+            SELECT invoice_date
+            FROM account_bill_prediction
+            WHERE company_id = %s AND dictionary = %s
+            ORDER BY invoice_date DESC
+            OFFSET %s
+            LIMIT 1
+        ''', [company_id, psql_lang, max(limit_parameter - 1, 0)])
+        res = self.env.cr.fetchone()
         params = {
             'lang': psql_lang,
-            'description': parsed_description,
-            'company_id': self.move_id.journal_id.company_id.id or self.env.company.id,
-            'limit_parameter': int(limit_parameter),
+            'company_id': company_id,
+            'date_limit': res and res[0] or None,
+            'line_indexes': list(range(len(descriptions))),
+            'descriptions': queries,
+            'account_descriptions': account_queries,
         }
+        history_clause = '''
+            history.company_id = %(company_id)s
+            AND history.dictionary = %(lang)s
+            AND (%(date_limit)s IS NULL OR history.invoice_date >= %(date_limit)s)
+        '''
+        sql_query = '''
+            WITH queries AS (
+                SELECT
+                    q.line_index,
+                    to_tsquery(%(lang)s, q.description) AS query_plain,
+                    to_tsquery(%(lang)s, q.account_description) AS account_query_plain
+                FROM unnest(%(line_indexes)s::int[], %(descriptions)s::text[], %(account_descriptions)s::text[])
+                    AS q(line_index, description, account_description)
+            )
+            SELECT DISTINCT ON (f.field, f.line_index)
+                f.field,
+                f.line_index,
+                f.value
+            FROM (
+                SELECT
+                    'product_id' AS field,
+                    q.line_index,
+                    ARRAY[history.product_id] AS value,
+                    max(ts_rank(history.document, q.query_plain)) AS ranking,
+                    count(coalesce(history.product_id, 1)) AS count
+                FROM queries q
+                JOIN account_bill_prediction history ON history.document @@ q.query_plain
+                WHERE ''' + history_clause + '''
+                GROUP BY q.line_index, history.product_id
+
+                UNION ALL
+
+                SELECT
+                    'tax_ids' AS field,
+                    q.line_index,
+                    taxes.tax_ids AS value,
+                    max(ts_rank(history.document, q.query_plain)) AS ranking,
+                    count(*) AS count
+                FROM queries q
+                JOIN account_bill_prediction history ON history.document @@ q.query_plain
+                CROSS JOIN LATERAL (
+                    SELECT array_agg(tax_rel.account_tax_id ORDER BY tax_rel.account_tax_id) AS tax_ids
+                    FROM account_move_line_account_tax_rel tax_rel
+                    WHERE tax_rel.account_move_line_id = history.line_id
+                ) taxes
+                WHERE ''' + history_clause + '''
+                GROUP BY q.line_index, taxes.tax_ids
+
+                UNION ALL
+
+                SELECT
+                    'account_id' AS field,
+                    q.line_index,
+                    ARRAY[history.account_id] AS value,
+                    max(ts_rank(history.document, q.account_query_plain)) AS ranking,
+                    count(history.account_id) AS count
+                FROM queries q
+                JOIN (
+                    SELECT history.account_id, history.document
+                    FROM account_bill_prediction history
+                    WHERE ''' + history_clause + '''
+
+                    UNION ALL
+
+                    SELECT
+                        account.id AS account_id,
+                        setweight(to_tsvector(%(lang)s, account.name), 'B') AS document
+                    FROM account_account account
+                    WHERE account.user_type_id IN (
+                        SELECT id
+                        FROM account_account_type
+                        WHERE internal_group = 'expense')
+                        AND account.company_id = %(company_id)s
+                ) history ON history.document @@ q.account_query_plain
+                GROUP BY q.line_index, history.account_id
+            ) AS f
+            ORDER BY f.field, f.line_index, f.ranking DESC, f.count DESC
+        '''
         try:
-            self.env.cr.execute(sql_query, params)
-            result = self.env.cr.fetchone()
-            if result:
-                return result[1]
-        except Exception as e:
+            with self.env.cr.savepoint():
+                self.env.cr.execute(sql_query, params)
+                results = self.env.cr.fetchall()
+        except Exception:
             # In case there is an error while parsing the to_tsquery (wrong character for example)
-            # We don't want to have a blocking traceback, instead return False
+            # We don't want to have a blocking traceback, instead predict nothing
             _logger.exception('Error while predicting invoice line fields')
-            return False
-        return False
+            return predictions
+
+        for field_name, line_index, value in results:
+            prediction = predictions[line_index]
+            if field_name == 'tax_ids':
+                prediction[field_name] = [tax_id for tax_id in value or [] if tax_id]
+            else:
+                prediction[field_name] = value[0]
+        return predictions
 
     def _predict_taxes(self, description):
         if not description:
             return False
-
-        sql_query = """
-            SELECT
-                max(f.rel) AS ranking,
-                f.tax_ids,
-                count(coalesce(f.tax_ids)) AS count
-            FROM (
-                SELECT
-                    p_search.tax_ids,
-                    ts_rank(p_search.document, query_plain) AS rel
-                FROM (
-                    SELECT
-                        array_agg(tax_rel.account_tax_id ORDER BY tax_rel.account_tax_id) AS tax_ids,
-                        (setweight(to_tsvector(%(lang)s, aml.name), 'B'))
-                        AS document
-                    FROM account_move_line aml
-                    JOIN account_move move
-                        ON aml.move_id = move.id
-                    LEFT JOIN account_move_line_account_tax_rel tax_rel
-                        ON tax_rel.account_move_line_id = aml.id
-                    WHERE move.move_type = 'in_invoice'
-                        AND move.state = 'posted'
-                        AND aml.display_type IS NULL
-                        AND NOT aml.exclude_from_invoice_tab
-                        AND aml.company_id = %(company_id)s
-                    GROUP BY aml.id, aml.name, move.invoice_date
-                    ORDER BY move.invoice_date DESC
-                    LIMIT %(limit_parameter)s
-                ) p_search,
-                to_tsquery(%(lang)s, %(description)s) query_plain
-                WHERE (p_search.document @@ query_plain)
-            ) AS f
-            GROUP BY f.tax_ids
-            ORDER BY ranking DESC, count DESC
-        """
-        return self._predict_field(sql_query, description)
+        return self._predict_batch(self._get_predict_company_id(), [(description, None)])[0].get('tax_ids', False)
 
     def _predict_product(self, description):
         if not description:
             return False
-
-        sql_query = """
-            SELECT
-                max(f.rel) AS ranking,
-                f.product_id,
-                count(coalesce(f.product_id, 1)) AS count
-            FROM (
-                SELECT
-                    p_search.product_id,
-                    ts_rank(p_search.document, query_plain) AS rel
-                FROM (
-                    SELECT
-                        ail.product_id,
-                        (setweight(to_tsvector(%(lang)s, ail.name), 'B'))
-                         AS document
-                    FROM account_move_line ail
-                    JOIN account_move inv
-                        ON ail.move_id = inv.id
-
-                    WHERE inv.move_type = 'in_invoice'
-                        AND inv.state = 'posted'
-                        AND ail.display_type IS NULL
-                        AND NOT ail.exclude_from_invoice_tab
-                        AND ail.company_id = %(company_id)s
-                    ORDER BY inv.invoice_date DESC
-                    LIMIT %(limit_parameter)s
-                ) p_search,
-                to_tsquery(%(lang)s, %(description)s) query_plain
-                WHERE (p_search.document @@ query_plain)
-            ) AS f
-            GROUP BY f.product_id
-            ORDER BY ranking desc, count desc
-        """
-        return self._predict_field(sql_query, description)
+        return self._predict_batch(self._get_predict_company_id(), [(description, None)])[0].get('product_id', False)
 
     def _predict_account(self, description, partner):
         # This method uses postgres tsvector in order to try to deduce the account_id of an invoice line
@@ -170,51 +271,7 @@ class AccountMoveLine(models.Model):
         # The result is roughly 90% of success.
         if not description or not partner:
             return False
-
-        sql_query = """
-            SELECT
-                max(f.rel) AS ranking,
-                f.account_id,
-                count(f.account_id) AS count
-            FROM (
-                SELECT
-                    p_search.account_id,
-                    ts_rank(p_search.document, query_plain) AS rel
-                FROM (
-                    (SELECT
-                        ail.account_id,
-                        (setweight(to_tsvector(%(lang)s, ail.name), 'B')) ||
-                        (setweight(to_tsvector('simple', 'partnerid'|| replace(ail.partner_id::text, '-', 'x')), 'A')) AS document
-                    FROM account_move_line ail
-                    JOIN account_move inv
-                        ON ail.move_id = inv.id
-                    WHERE inv.move_type = 'in_invoice'
-                        AND inv.state = 'posted'
-                        AND ail.display_type IS NULL
-                        AND NOT ail.exclude_from_invoice_tab
-                        AND ail.company_id = %(company_id)s
-                    ORDER BY inv.invoice_date DESC
-                    LIMIT %(limit_parameter)s
-                    ) UNION ALL (
-                    SELECT
-                        id as account_id,
-                        (setweight(to_tsvector(%(lang)s, name), 'B')) AS document
-                    FROM account_account
-                    WHERE user_type_id IN (
-                        SELECT id
-                        FROM account_account_type
-                        WHERE internal_group = 'expense')
-                        AND company_id = %(company_id)s
-                    )
-                ) p_search,
-                to_tsquery(%(lang)s, %(description)s) query_plain
-                WHERE (p_search.document @@ query_plain)
-            ) AS f
-            GROUP BY f.account_id
-            ORDER BY ranking desc, count desc
-        """
-        description += ' partnerid' + str(partner.id or '').replace('-', 'x')
-        return self._predict_field(sql_query, description)
+        return self._predict_batch(self._get_predict_company_id(), [(description, partner)])[0].get('account_id', False)
 
     @api.onchange('name')
     def _onchange_enable_predictive(self):
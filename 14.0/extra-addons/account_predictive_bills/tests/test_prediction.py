@@ -103,3 +103,25 @@ class TestBillsPrediction(AccountTestInvoicingCommon):
             'product_id': product.id,
             'account_id': self.company_data['default_account_expense'].id,
         }])
+
+    def test_account_prediction_batch(self):
+        default_account = self.company_data['default_journal_purchase'].default_account_id
+        self._create_bill(self.test_partners[1], "Contributions January", self.test_accounts[2])
+        bill = self._create_bill(self.test_partners[3], "Electricity Bruxelles", default_account, account_to_set=self.test_accounts[3])
+
+        predictions = self.env['account.move.line']._predict_batch(self.company_data['company'].id, [
+            ("Electricity Grand-Rosière", self.test_partners[3]),
+            ("Contribution February", self.test_partners[1]),
+            ("Electricity Grand-Rosière", None),
+        ])
+        self.assertEqual(predictions[0].get('account_id'), self.test_accounts[3].id)
+        self.assertEqual(predictions[1].get('account_id'), self.test_accounts[2].id)
+        self.assertNotIn('account_id', predictions[2])
+
+        # The lines of the bills reset to draft are no longer used to predict.
+        bill.button_draft()
+        self.assertFalse(self.env['account.bill.prediction'].search([('line_id', 'in', bill.invoice_line_ids.ids)]))
+        predictions = self.env['account.move.line']._predict_batch(self.company_data['company'].id, [
+            ("Electricity Grand-Rosière", self.test_partners[3]),
+        ])
+        self.assertNotEqual(predictions[0].get('account_id'), self.test_accounts[3].id)
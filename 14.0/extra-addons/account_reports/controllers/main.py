@@ -6,7 +6,10 @@ from odoo.http import content_disposition, request
 from odoo.addons.web.controllers.main import _serialize_exception
 from odoo.tools import html_escape
 
+from werkzeug.wsgi import wrap_file
+
 import json
+import os
 
 
 class FinancialReportController(http.Controller):
@@ -24,14 +27,17 @@ class FinancialReportController(http.Controller):
         report_name = report_obj.get_report_filename(options)
         try:
             if output_format == 'xlsx':
+                xlsx_file = report_obj._get_xlsx_file(options)
                 response = request.make_response(
-                    None,
+                    wrap_file(request.httprequest.environ, xlsx_file),
                     headers=[
                         ('Content-Type', account_report_model.get_export_mime_type('xlsx')),
-                        ('Content-Disposition', content_disposition(report_name + '.xlsx'))
+                        ('Content-Disposition', content_disposition(report_name + '.xlsx')),
+                        ('Content-Length', os.fstat(xlsx_file.fileno()).st_size),
                     ]
                 )
-                response.stream.write(report_obj.get_xlsx(options))
+                # Stream the generated file by chunks instead of loading it in memory.
+                response.direct_passthrough = True
             if output_format == 'pdf':
                 response = request.make_response(
                     report_obj.get_pdf(options),
@@ -14,6 +14,8 @@ from . import account_analytic_report
 from . import account_consolidated_journals
 from . import account_cash_flow_report
 from . import account_multicurrency_revaluation_report
+from . import account_balance_snapshot
+from . import account_move
 from . import account_move_line
 from . import account_report_coa
 from . import account_aged_partner_balance
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+from odoo import api, fields, models
+
+# Fields of account.move.line whose edition changes the balances stored in account.balance.snapshot.
+SNAPSHOT_LINE_FIELDS = (
+    'company_id', 'account_id', 'partner_id', 'currency_id', 'date',
+    'debit', 'credit', 'balance', 'amount_currency',
+)
+
+
+class AccountBalanceSnapshot(models.Model):
+    ''' Monthly balances of the posted journal items by company, account, partner and currency.
+
+    The balances are maintained incrementally when posting, resetting to draft or editing posted journal entries. They
+    are used by the reports to compute the initial balances without aggregating the whole history of the journal
+    items: only the journal items dated after the last month fully covered by the report are still read from the
+    account_move_line table (see '_get_balance_snapshot_date' on account.report).
+    '''
+    _name = 'account.balance.snapshot'
+    _description = "Journal Items Monthly Balance"
+    _order = 'date, company_id, account_id'
+    _log_access = False
+
+    company_id = fields.Many2one('res.company', string='Company', required=True, readonly=True, ondelete='cascade')
+    account_id = fields.Many2one('account.account', string='Account', required=True, readonly=True, ondelete='cascade')
+    partner_id = fields.Many2one('res.partner', string='Partner', readonly=True, ondelete='cascade')
+    currency_id = fields.Many2one('res.currency', string='Currency', required=True, readonly=True)
+    date = fields.Date(string='Month', required=True, readonly=True,
+        help="First day of the month aggregated by this balance.")
+    company_currency_id = fields.Many2one(related='company_id.currency_id', string='Company Currency')
+    debit = fields.Monetary(currency_field='company_currency_id', readonly=True)
+    credit = fields.Monetary(currency_field='company_currency_id', readonly=True)
+    balance = fields.Monetary(currency_field='company_currency_id', readonly=True)
+    amount_currency = fields.Monetary(currency_field='currency_id', readonly=True)
+
+    def init(self):
+        # The partner is part of the key but optional: use an expression to make the missing partners conflicting.
+        self._cr.execute('''
+            CREATE UNIQUE INDEX IF NOT EXISTS account_balance_snapshot_unique_idx
+            ON account_balance_snapshot (company_id, account_id, COALESCE(partner_id, 0), currency_id, date)
+        ''')
+
+        # Fill the balances when installing the module on an existing database.
+        self._cr.execute('SELECT 1 FROM account_balance_snapshot LIMIT 1')
+        if not self._cr.fetchone():
+            self._rebuild()
+
+    @api.model
+    def _rebuild(self):
+        ''' Recompute all the balances from scratch using the posted journal items. '''
+        self.flush()
+        self.env['account.move.line'].flush(SNAPSHOT_LINE_FIELDS + ('parent_state',))
+        self._cr.execute('DELETE FROM account_balance_snapshot')
+        self._cr.execute('''
+            INSERT INTO account_balance_snapshot
+                (company_id, account_id, partner_id, currency_id, date, debit, credit, balance, amount_currency)
+            SELECT
+                line.company_id,
+                line.account_id,
+                line.partner_id,
+                line.currency_id,
+                DATE_TRUNC('month', line.date)::date,
+                SUM(line.debit),
+                SUM(line.credit),
+                SUM(line.balance),
+                SUM(line.amount_currency)
+            FROM account_move_line line
+            WHERE line.parent_state = 'posted'
+            AND line.account_id IS NOT NULL
+            GROUP BY line.company_id, line.account_id, line.partner_id, line.currency_id, DATE_TRUNC('month', line.date)
+        ''')
+        self.invalidate_cache()
+
+    @api.model
+    def _update_balances(self, lines, sign=1):
+        ''' Add the amounts of the posted journal items passed as parameter to the balances.
+        :param lines:   An account.move.line recordset. Journal items that are not posted are ignored.
+        :param sign:    1 to add the journal items to the balances, -1 to remove them.
+        '''
+        if not lines:
+            return
+
+        self.env['account.move.line'].flush(SNAPSHOT_LINE_FIELDS + ('parent_state',), records=lines)
+        self._cr.execute('''
+            INSERT INTO account_balance_snapshot
+                (company_id, account_id, partner_id, currency_id, date, debit, credit, balance, amount_currency)
+            SELECT
+                line.company_id,
+                line.account_id,
+                line.partner_id,
+                line.currency_id,
+                DATE_TRUNC('month', line.date)::date,
+                %(sign)s * SUM(line.debit),
+                %(sign)s * SUM(line.credit),
+                %(sign)s * SUM(line.balance),
+                %(sign)s * SUM(line.amount_currency)
+            FROM account_move_line line
+            WHERE line.id IN %(line_ids)s
+            AND line.parent_state = 'posted'
+            AND line.account_id IS NOT NULL
+            GROUP BY line.company_id, line.account_id, line.partner_id, line.currency_id, DATE_TRUNC('month', line.date)
+            ON CONFLICT (company_id, account_id, COALESCE(partner_id, 0), currency_id, date) DO UPDATE SET
+                debit = account_balance_snapshot.debit + EXCLUDED.debit,
+                credit = account_balance_snapshot.credit + EXCLUDED.credit,
+                balance = account_balance_snapshot.balance + EXCLUDED.balance,
+                amount_currency = account_balance_snapshot.amount_currency + EXCLUDED.amount_currency
+            RETURNING id
+        ''', {
+            'sign': sign,
+            'line_ids': tuple(lines.ids),
+        })
+        snapshot_ids = [r[0] for r in self._cr.fetchall()]
+
+        # Drop the emptied balances to not make the reports believe there are still some journal items in these months.
+        if sign < 0 and snapshot_ids:
+            self._cr.execute('''
+                DELETE FROM account_balance_snapshot
+                WHERE id IN %s
+                AND debit = 0.0 AND credit = 0.0 AND amount_currency = 0.0
+            ''', [tuple(snapshot_ids)])
+        self.invalidate_cache()
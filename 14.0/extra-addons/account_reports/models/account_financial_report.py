@@ -5,10 +5,13 @@ import json
 
 from .formula import FormulaSolver, PROTECTED_KEYWORDS
 from odoo import models, fields, api, _
-from odoo.tools import float_is_zero, ustr
+from odoo.tools import float_is_zero, ustr, split_every
 from dateutil.relativedelta import relativedelta
 from odoo.exceptions import UserError, ValidationError
 
+# Maximum number of financial report lines computed by a single query in '_compute_sum_batch'.
+SUM_BATCH_SIZE = 100
+
 
 class ReportAccountFinancialReport(models.Model):
     _name = "account.financial.html.report"
@@ -1057,62 +1060,114 @@ class AccountFinancialReportLine(models.Model):
         :return:                    A python dictionary.
         '''
         self.ensure_one()
-        params = []
-        queries = []
+        return self._compute_sum_batch(options_list)[self.id]
 
-        AccountFinancialReportHtml = self.financial_report_id
-        groupby_list = AccountFinancialReportHtml._get_options_groupby_fields(options_list[0])
-        groupby_clause = ','.join('account_move_line.%s' % gb for gb in groupby_list)
-        ct_query = self.env['res.currency']._get_query_currency_table(options_list[0])
-        financial_report = self._get_financial_report()
+    def _get_options_list_sum(self, options_list):
+        ''' Hook to adapt the options used to compute the values of the current line in '_compute_sum_batch'.
+        :param options_list:        The report options list, first one being the current dates range, others being the
+                                    comparisons.
+        :return:                    The options list to use for the current line.
+        '''
+        self.ensure_one()
+        return options_list
 
-        # Prepare a query by period as the date is different for each comparison.
+    def _compute_sum_batch(self, options_list):
+        ''' Compute the values to be used inside the formula of all lines in self at once (see '_compute_sum').
 
-        for i, options in enumerate(options_list):
-            new_options = self._get_options_financial_line(options)
-            line_domain = self._get_domain(new_options, financial_report)
+        Instead of one query per line, the lines are computed by a single scan of the journal items per period
+        (and per set of tables joined by their domains), each line getting its own aggregates restricted to its own
+        domain using FILTER clauses:
 
-            tables, where_clause, where_params = AccountFinancialReportHtml._query_get(new_options, domain=line_domain)
-
-            queries.append('''
-                SELECT
-                    ''' + (groupby_clause and '%s,' % groupby_clause) + '''
-                    %s AS period_index,
-                    COUNT(DISTINCT account_move_line.''' + (self.groupby or 'id') + ''') AS count_rows,
-                    COALESCE(SUM(ROUND(account_move_line.balance * currency_table.rate, currency_table.precision)), 0.0) AS balance
-                FROM ''' + tables + '''
-                JOIN ''' + ct_query + ''' ON currency_table.company_id = account_move_line.company_id
-                WHERE ''' + where_clause + '''
-                ''' + (groupby_clause and 'GROUP BY %s' % groupby_clause) + '''
-            ''')
-            params.append(i)
-            params += where_params
-
-        # Fetch the results.
+        SELECT
+            <groupby>, 0 AS period_index,
+            COUNT(*) FILTER (WHERE <line 1 domain>) AS nb_0,
+            COUNT(DISTINCT ...) FILTER (WHERE <line 1 domain>) AS count_rows_0,
+            SUM(...) FILTER (WHERE <line 1 domain>) AS balance_0,
+            ... same for the other lines ...
+        FROM account_move_line
+        WHERE <line 1 domain> OR <line 2 domain> OR ...
+        GROUP BY <groupby>
 
+        :param options_list:        The report options list, first one being the current dates range, others being the
+                                    comparisons.
+        :return:                    A python dictionary mapping each line id to its results, see '_compute_sum'.
+        '''
         results = {
-            'sum': {},
-            'sum_if_pos': {},
-            'sum_if_neg': {},
-            'count_rows': {},
+            line.id: {'sum': {}, 'sum_if_pos': {}, 'sum_if_neg': {}, 'count_rows': {}}
+            for line in self
         }
+        if not self:
+            return results
 
-        financial_report._cr_execute(options_list[0], ' UNION ALL '.join(queries), params)
-        for res in self._cr.dictfetchall():
-            # Build the key.
-            key = [res['period_index']]
-            for gb in groupby_list:
-                key.append(res[gb])
-            key = tuple(key)
+        AccountFinancialReportHtml = self.env['account.financial.html.report']
+        groupby_list = AccountFinancialReportHtml._get_options_groupby_fields(options_list[0])
+        groupby_clause = ','.join('account_move_line.%s' % gb for gb in groupby_list)
+        ct_query = self.env['res.currency']._get_query_currency_table(options_list[0])
 
-            # Compute values.
-            results['count_rows'].setdefault(res['period_index'], 0)
-            results['count_rows'][res['period_index']] += res['count_rows']
-            results['sum'][key] = res['balance']
-            if results['sum'][key] > 0:
-                results['sum_if_pos'][key] = results['sum'][key]
-            if results['sum'][key] < 0:
-                results['sum_if_neg'][key] = results['sum'][key]
+        # Group the lines by period and by joined tables, as the date is different for each comparison.
+
+        groups = {}
+        for line in self:
+            financial_report = line._get_financial_report()
+            for i, options in enumerate(line._get_options_list_sum(options_list)):
+                new_options = line._get_options_financial_line(options)
+                line_domain = line._get_domain(new_options, financial_report)
+
+                tables, where_clause, where_params = AccountFinancialReportHtml._query_get(new_options, domain=line_domain)
+                groups.setdefault((i, tables), []).append((line, where_clause, where_params))
+
+        # Prepare and fetch a query by group.
+        # When grouping by some fields, a line having no journal item in a group must not get a result for it.
+
+        for (period_index, tables), group in groups.items():
+            for sub_group in split_every(SUM_BATCH_SIZE, group):
+                select_clauses = []
+                where_clauses = []
+                params = [period_index]
+                for j, (line, where_clause, where_params) in enumerate(sub_group):
+                    select_clauses.append('''
+                        COUNT(*) FILTER (WHERE ''' + where_clause + ''') AS nb_''' + str(j) + ''',
+                        COUNT(DISTINCT account_move_line.''' + (line.groupby or 'id') + ''')
+                            FILTER (WHERE ''' + where_clause + ''') AS count_rows_''' + str(j) + ''',
+                        COALESCE(SUM(ROUND(account_move_line.balance * currency_table.rate, currency_table.precision))
+                            FILTER (WHERE ''' + where_clause + '''), 0.0) AS balance_''' + str(j) + '''
+                    ''')
+                    where_clauses.append('(%s)' % where_clause)
+                    params += where_params * 3
+                for line, where_clause, where_params in sub_group:
+                    params += where_params
+
+                query = '''
+                    SELECT
+                        ''' + (groupby_clause and '%s,' % groupby_clause) + '''
+                        %s AS period_index,
+                        ''' + ','.join(select_clauses) + '''
+                    FROM ''' + tables + '''
+                    JOIN ''' + ct_query + ''' ON currency_table.company_id = account_move_line.company_id
+                    WHERE ''' + ' OR '.join(where_clauses) + '''
+                    ''' + (groupby_clause and 'GROUP BY %s' % groupby_clause) + '''
+                '''
+
+                AccountFinancialReportHtml._cr_execute(options_list[0], query, params)
+                for res in self._cr.dictfetchall():
+                    # Build the key.
+                    key = [res['period_index']]
+                    for gb in groupby_list:
+                        key.append(res[gb])
+                    key = tuple(key)
+
+                    # Compute values.
+                    for j, (line, where_clause, where_params) in enumerate(sub_group):
+                        if groupby_list and not res['nb_%s' % j]:
+                            continue
+                        line_results = results[line.id]
+                        line_results['count_rows'].setdefault(res['period_index'], 0)
+                        line_results['count_rows'][res['period_index']] += res['count_rows_%s' % j]
+                        line_results['sum'][key] = res['balance_%s' % j]
+                        if line_results['sum'][key] > 0:
+                            line_results['sum_if_pos'][key] = line_results['sum'][key]
+                        if line_results['sum'][key] < 0:
+                            line_results['sum_if_neg'][key] = line_results['sum'][key]
 
         return results
 
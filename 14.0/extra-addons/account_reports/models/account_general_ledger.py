@@ -69,17 +69,38 @@ class AccountGeneralLedgerReport(models.AbstractModel):
     def _get_general_ledger_lines(self, options, line_id=None):
         ''' Get lines for the whole report or for a specific line.
         :param options: The report options.
-        :return:        A list of lines, each one represented by a dictionary.
+        :return:        A list of lines, each one represented by a dictionary. When 'lazy_lines' is set in the context
+                        (e.g. when exporting the report), an iterator yielding the lines is returned instead.
         '''
-        lines = []
         aml_lines = []
+        lines = self._iter_general_ledger_lines(options, line_id=line_id, aml_lines=aml_lines)
+        if self._context.get('lazy_lines') and not self._context.get('aml_only'):
+            return lines
+        lines = list(lines)
+        if self.env.context.get('aml_only'):
+            return aml_lines
+        return lines
+
+    @api.model
+    def _iter_general_ledger_lines(self, options, line_id=None, aml_lines=None):
+        ''' Iterate over the lines for the whole report or for a specific line (see '_get_general_ledger_lines').
+        In print mode, the journal items of the unfolded accounts are fetched account by account using a SQL cursor in
+        order to never load all of them in memory.
+        :param options:     The report options.
+        :param line_id:     The optional line to expand.
+        :param aml_lines:   An optional list to be filled with the ids of the rendered journal items.
+        :return:            An iterator yielding the lines, each one represented by a dictionary.
+        '''
+        if aml_lines is None:
+            aml_lines = []
         options_list = self._get_options_periods_list(options)
-        unfold_all = options.get('unfold_all') or (self._context.get('print_mode') and not options['unfolded_lines'])
+        print_mode = self._context.get('print_mode')
+        unfold_all = options.get('unfold_all') or (print_mode and not options['unfolded_lines'])
         date_from = fields.Date.from_string(options['date']['date_from'])
         company_currency = self.env.company.currency_id
 
         expanded_account = line_id and self.env['account.account'].browse(int(line_id[8:]))
-        accounts_results, taxes_results = self._do_query(options_list, expanded_account=expanded_account)
+        accounts_results, taxes_results = self._do_query(options_list, expanded_account=expanded_account, fetch_lines=not print_mode)
 
         total_debit = total_credit = total_balance = 0.0
         for account, periods_results in accounts_results:
@@ -101,7 +122,7 @@ class AccountGeneralLedgerReport(models.AbstractModel):
             credit = account_sum.get('credit', 0.0) + account_un_earn.get('credit', 0.0)
             balance = account_sum.get('balance', 0.0) + account_un_earn.get('balance', 0.0)
 
-            lines.append(self._get_account_title_line(options, account, amount_currency, debit, credit, balance, has_lines))
+            yield self._get_account_title_line(options, account, amount_currency, debit, credit, balance, has_lines)
 
             total_debit += debit
             total_credit += credit
@@ -113,69 +134,72 @@ class AccountGeneralLedgerReport(models.AbstractModel):
 
                 cumulated_balance = account_init_bal.get('balance', 0.0) + account_un_earn.get('balance', 0.0)
 
-                lines.append(self._get_initial_balance_line(
+                yield self._get_initial_balance_line(
                     options, account,
                     account_init_bal.get('amount_currency', 0.0) + account_un_earn.get('amount_currency', 0.0),
                     account_init_bal.get('debit', 0.0) + account_un_earn.get('debit', 0.0),
                     account_init_bal.get('credit', 0.0) + account_un_earn.get('credit', 0.0),
                     cumulated_balance,
-                ))
+                )
 
                 # account.move.line record lines.
-                amls = results.get('lines', [])
-
-                load_more_remaining = len(amls)
-                load_more_counter = self._context.get('print_mode') and load_more_remaining or self.MAX_LINES
+                if print_mode:
+                    # All lines are printed: stream them instead of fetching them all at once.
+                    amls_query, amls_params = self._get_query_amls(options, account)
+                    amls = self._cr_execute_iter(options, amls_query, amls_params)
+                    load_more_remaining = None
+                else:
+                    amls = results.get('lines', [])
+                    load_more_remaining = len(amls)
+                load_more_counter = self.MAX_LINES
 
                 for aml in amls:
                     # Don't show more line than load_more_counter.
-                    if load_more_counter == 0:
+                    if load_more_remaining is not None and load_more_counter == 0:
                         break
 
                     cumulated_balance += aml['balance']
-                    lines.append(self._get_aml_line(options, account, aml, company_currency.round(cumulated_balance)))
+                    yield self._get_aml_line(options, account, aml, company_currency.round(cumulated_balance))
 
-                    load_more_remaining -= 1
-                    load_more_counter -= 1
+                    if load_more_remaining is not None:
+                        load_more_remaining -= 1
+                        load_more_counter -= 1
                     aml_lines.append(aml['id'])
 
-                if load_more_remaining > 0:
+                if load_more_remaining:
                     # Load more line.
-                    lines.append(self._get_load_more_line(
+                    yield self._get_load_more_line(
                         options, account,
                         self.MAX_LINES,
                         load_more_remaining,
                         cumulated_balance,
-                    ))
+                    )
 
                 if self.env.company.totals_below_sections:
                     # Account total line.
-                    lines.append(self._get_account_total_line(
+                    yield self._get_account_total_line(
                         options, account,
                         account_sum.get('amount_currency', 0.0),
                         account_sum.get('debit', 0.0),
                         account_sum.get('credit', 0.0),
                         account_sum.get('balance', 0.0),
-                    ))
+                    )
 
         if not line_id:
             # Report total line.
-            lines.append(self._get_total_line(
+            yield self._get_total_line(
                 options,
                 total_debit,
                 total_credit,
                 company_currency.round(total_balance),
-            ))
+            )
 
             # Tax Declaration lines.
             journal_options = self._get_options_journals(options)
             if len(journal_options) == 1 and journal_options[0]['type'] in ('sale', 'purchase'):
-                lines += self._get_tax_declaration_lines(
+                yield from self._get_tax_declaration_lines(
                     options, journal_options[0]['type'], taxes_results
                 )
-        if self.env.context.get('aml_only'):
-            return aml_lines
-        return lines
 
     @api.model
     def _load_more_lines(self, options, line_id, offset, load_more_remaining, balance_progress):
@@ -246,6 +270,19 @@ class AccountGeneralLedgerReport(models.AbstractModel):
             ]
         return domain
 
+    @api.model
+    def _get_options_balance_snapshot_domain(self, options):
+        # OVERRIDE
+        domain = super(AccountGeneralLedgerReport, self)._get_options_balance_snapshot_domain(options)
+        # Filter accounts based on the search bar.
+        if options.get('filter_accounts'):
+            domain += [
+                '|',
+                ('account_id.name', 'ilike', options['filter_accounts']),
+                ('account_id.code', 'ilike', options['filter_accounts'])
+            ]
+        return domain
+
     @api.model
     def _get_options_sum_balance(self, options):
         ''' Create options used to compute the aggregated sums on accounts.
@@ -359,23 +396,33 @@ class AccountGeneralLedgerReport(models.AbstractModel):
             # ]
 
             new_options = self._get_options_sum_balance(options_period)
-            tables, where_clause, where_params = self._query_get(new_options, domain=domain)
+            balance_query, balance_params = self._get_query_balance(new_options, 'account_id', domain=domain, snapshot_domain=domain)
+            params += balance_params
+
+            # The last date of the journal items of the period tells if the account has lines to display. It can't be
+            # taken from the sums, whose months may be read from the monthly balances.
+            tables, where_clause, where_params = self._query_get(options_period, domain=domain)
             params += where_params
             queries.append('''
                 SELECT
-                    account_move_line.account_id                            AS groupby,
+                    balance_sums.groupby                                    AS groupby,
                     'sum'                                                   AS key,
-                    MAX(account_move_line.date)                             AS max_date,
+                    period_dates.max_date                                   AS max_date,
                     %s                                                      AS period_number,
-                    COALESCE(SUM(account_move_line.amount_currency), 0.0)   AS amount_currency,
-                    SUM(ROUND(account_move_line.debit * currency_table.rate, currency_table.precision))   AS debit,
-                    SUM(ROUND(account_move_line.credit * currency_table.rate, currency_table.precision))  AS credit,
-                    SUM(ROUND(account_move_line.balance * currency_table.rate, currency_table.precision)) AS balance
-                FROM %s
-                LEFT JOIN %s ON currency_table.company_id = account_move_line.company_id
-                WHERE %s
-                GROUP BY account_move_line.account_id
-            ''' % (i, tables, ct_query, where_clause))
+                    balance_sums.amount_currency                            AS amount_currency,
+                    balance_sums.debit                                      AS debit,
+                    balance_sums.credit                                     AS credit,
+                    balance_sums.balance                                    AS balance
+                FROM (%s) AS balance_sums
+                LEFT JOIN (
+                    SELECT
+                        account_move_line.account_id                        AS account_id,
+                        MAX(account_move_line.date)                         AS max_date
+                    FROM %s
+                    WHERE %s
+                    GROUP BY account_move_line.account_id
+                ) AS period_dates ON period_dates.account_id = balance_sums.groupby
+            ''' % (i, balance_query, tables, where_clause))
 
         # ============================================
         # 2) Get sums for the unaffected earnings.
@@ -397,23 +444,20 @@ class AccountGeneralLedgerReport(models.AbstractModel):
         # ]
 
         new_options = self._get_options_unaffected_earnings(options_period)
-        tables, where_clause, where_params = self._query_get(new_options, domain=domain)
-        params += where_params
+        balance_query, balance_params = self._get_query_balance(new_options, 'company_id', domain=domain, snapshot_domain=domain)
+        params += balance_params
         queries.append('''
             SELECT
-                account_move_line.company_id                            AS groupby,
+                balance_sums.groupby                                    AS groupby,
                 'unaffected_earnings'                                   AS key,
                 NULL                                                    AS max_date,
                 %s                                                      AS period_number,
-                COALESCE(SUM(account_move_line.amount_currency), 0.0)   AS amount_currency,
-                SUM(ROUND(account_move_line.debit * currency_table.rate, currency_table.precision))   AS debit,
-                SUM(ROUND(account_move_line.credit * currency_table.rate, currency_table.precision))  AS credit,
-                SUM(ROUND(account_move_line.balance * currency_table.rate, currency_table.precision)) AS balance
-            FROM %s
-            LEFT JOIN %s ON currency_table.company_id = account_move_line.company_id
-            WHERE %s
-            GROUP BY account_move_line.company_id
-        ''' % (i, tables, ct_query, where_clause))
+                balance_sums.amount_currency                            AS amount_currency,
+                balance_sums.debit                                      AS debit,
+                balance_sums.credit                                     AS credit,
+                balance_sums.balance                                    AS balance
+            FROM (%s) AS balance_sums
+        ''' % (i, balance_query))
 
         # ============================================
         # 3) Get sums for the initial balance.
@@ -439,23 +483,20 @@ class AccountGeneralLedgerReport(models.AbstractModel):
                 # ]
 
                 new_options = self._get_options_initial_balance(options_period)
-                tables, where_clause, where_params = self._query_get(new_options, domain=domain)
-                params += where_params
+                balance_query, balance_params = self._get_query_balance(new_options, 'account_id', domain=domain, snapshot_domain=domain)
+                params += balance_params
                 queries.append('''
                     SELECT
-                        account_move_line.account_id                            AS groupby,
+                        balance_sums.groupby                                    AS groupby,
                         'initial_balance'                                       AS key,
                         NULL                                                    AS max_date,
                         %s                                                      AS period_number,
-                        COALESCE(SUM(account_move_line.amount_currency), 0.0)   AS amount_currency,
-                        SUM(ROUND(account_move_line.debit * currency_table.rate, currency_table.precision))   AS debit,
-                        SUM(ROUND(account_move_line.credit * currency_table.rate, currency_table.precision))  AS credit,
-                        SUM(ROUND(account_move_line.balance * currency_table.rate, currency_table.precision)) AS balance
-                    FROM %s
-                    LEFT JOIN %s ON currency_table.company_id = account_move_line.company_id
-                    WHERE %s
-                    GROUP BY account_move_line.account_id
-                ''' % (i, tables, ct_query, where_clause))
+                        balance_sums.amount_currency                            AS amount_currency,
+                        balance_sums.debit                                      AS debit,
+                        balance_sums.credit                                     AS credit,
+                        balance_sums.balance                                    AS balance
+                    FROM (%s) AS balance_sums
+                ''' % (i, balance_query))
 
         # ============================================
         # 4) Get sums for the tax declaration.
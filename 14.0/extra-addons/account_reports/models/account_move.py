@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+from odoo import models
+
+
+class AccountMove(models.Model):
+    _inherit = "account.move"
+
+    def _post(self, soft=True):
+        # OVERRIDE to add the newly posted journal items to the monthly balances.
+        posted = super()._post(soft)
+        self.env['account.balance.snapshot']._update_balances(posted.line_ids)
+        return posted
+
+    def button_draft(self):
+        # OVERRIDE to remove the journal items from the monthly balances before they are no longer posted.
+        self.env['account.balance.snapshot']._update_balances(self.filtered(lambda move: move.state == 'posted').line_ids, sign=-1)
+        return super().button_draft()
+
+    def unlink(self):
+        # OVERRIDE to remove the journal items of the posted entries deleted using 'force_delete'.
+        self.env['account.balance.snapshot']._update_balances(self.filtered(lambda move: move.state == 'posted').line_ids, sign=-1)
+        return super().unlink()
@@ -2,6 +2,7 @@
 # Part of Odoo. See LICENSE file for full copyright and licensing details.
 
 from odoo import api, fields, models
+from odoo.addons.account_reports.models.account_balance_snapshot import SNAPSHOT_LINE_FIELDS
 
 
 class AccountMoveLine(models.Model):
@@ -17,3 +18,14 @@ class AccountMoveLine(models.Model):
             You need to be able to change it even if the aml is locked by the lock date
             (this function is used in the follow-ups) """
         return self.with_context(check_move_validity=False).write({'blocked': blocked})
+
+    def write(self, vals):
+        # OVERRIDE to keep the monthly balances up-to-date when editing the amounts or the keys of posted journal items.
+        if not any(field_name in vals for field_name in SNAPSHOT_LINE_FIELDS):
+            return super().write(vals)
+
+        posted_lines = self.filtered(lambda line: line.parent_state == 'posted')
+        self.env['account.balance.snapshot']._update_balances(posted_lines, sign=-1)
+        res = super().write(vals)
+        self.env['account.balance.snapshot']._update_balances(posted_lines)
+        return res
@@ -60,6 +60,23 @@ class ReportPartnerLedger(models.AbstractModel):
 
         return domain
 
+    @api.model
+    def _get_balance_snapshot_date(self, options):
+        # OVERRIDE
+        # The monthly balances don't know about the reconciliation.
+        if options.get('unreconciled'):
+            return None
+        return super(ReportPartnerLedger, self)._get_balance_snapshot_date(options)
+
+    @api.model
+    def _get_options_balance_snapshot_domain(self, options):
+        # OVERRIDE
+        # Handle filter_account_type. The exchange difference lines excluded by '_get_options_domain' don't need to be
+        # filtered out as they don't have any debit or credit.
+        domain = super(ReportPartnerLedger, self)._get_options_balance_snapshot_domain(options)
+        domain.append(('account_id.internal_type', 'in', [t['id'] for t in self._get_options_account_type(options)]))
+        return domain
+
     @api.model
     def _get_options_sum_balance(self, options):
         ''' Create options with the 'strict_range' enabled on the filter_date.
@@ -153,20 +170,17 @@ class ReportPartnerLedger(models.AbstractModel):
         # Get sums for the initial balance.
         # period: [('date' <= options['date_from'] - 1)]
         new_options = self._get_options_initial_balance(options)
-        tables, where_clause, where_params = self._query_get(new_options, domain=domain)
-        params += where_params
+        balance_query, balance_params = self._get_query_balance(new_options, 'partner_id', domain=domain, snapshot_domain=domain)
+        params += balance_params
         queries.append('''
             SELECT
-                account_move_line.partner_id        AS groupby,
+                balance_sums.groupby                AS groupby,
                 'initial_balance'                   AS key,
-                SUM(ROUND(account_move_line.debit * currency_table.rate, currency_table.precision))   AS debit,
-                SUM(ROUND(account_move_line.credit * currency_table.rate, currency_table.precision))  AS credit,
-                SUM(ROUND(account_move_line.balance * currency_table.rate, currency_table.precision)) AS balance
-            FROM %s
-            LEFT JOIN %s ON currency_table.company_id = account_move_line.company_id
-            WHERE %s
-            GROUP BY account_move_line.partner_id
-        ''' % (tables, ct_query, where_clause))
+                balance_sums.debit                  AS debit,
+                balance_sums.credit                 AS credit,
+                balance_sums.balance                AS balance
+            FROM (%s) AS balance_sums
+        ''' % balance_query)
 
         return ' UNION ALL '.join(queries), params
 
@@ -3,10 +3,11 @@
 import ast
 import copy
 import json
-import io
 import logging
 import lxml.html
 import datetime
+import tempfile
+import uuid
 import ast
 from collections import defaultdict
 from math import copysign
@@ -656,6 +657,28 @@ class AccountReport(models.AbstractModel):
         '''
         return self._cr.execute(query, params)
 
+    def _cr_execute_iter(self, options, query, params=None, fetch_size=1000):
+        ''' Similar to '_cr_execute' but iterating over the resulting rows using a SQL cursor, to never load all of
+        them in memory. The cursor being declared inside the transaction, other queries could be executed while
+        iterating.
+        :param options:     The report options.
+        :param query:       The query to be executed by the report.
+        :param params:      The optional params of the _cr.execute method.
+        :param fetch_size:  The number of rows fetched at once.
+        :return:            An iterator yielding the rows as dictionaries.
+        '''
+        cursor_name = 'account_report_%s' % uuid.uuid4().hex
+        self._cr_execute(options, 'DECLARE %s NO SCROLL CURSOR FOR %s' % (cursor_name, query), params)
+        try:
+            while True:
+                self._cr.execute('FETCH %s FROM %s' % (fetch_size, cursor_name))
+                rows = self._cr.dictfetchall()
+                yield from rows
+                if len(rows) < fetch_size:
+                    break
+        finally:
+            self._cr.execute('CLOSE %s' % cursor_name)
+
     @api.model
     def _query_get(self, options, domain=None):
         domain = self._get_options_domain(options) + (domain or [])
@@ -668,6 +691,125 @@ class AccountReport(models.AbstractModel):
 
         return query.get_sql()
 
+    @api.model
+    def _get_balance_snapshot_date(self, options):
+        ''' Get the date from which the journal items must be read from account_move_line when using the monthly
+        balances of account.balance.snapshot to compute the sums of the options passed as parameter.
+        The journal items dated before are read from the balances instead.
+        :param options: The report options.
+        :return:        A date or None if the monthly balances can't be used with such options.
+        '''
+        # The balances only contain the posted journal items and can't be filtered by journal or analytic.
+        if options.get('all_entries') or options.get('cash_basis') \
+                or options.get('analytic_accounts') or options.get('analytic_tags') \
+                or not options.get('date') or options['date'].get('date_field', 'date') != 'date':
+            return None
+
+        all_journals = [j for j in options.get('journals', []) if j['id'] not in ('divider', 'group')]
+        if len(self._get_options_journals(options)) not in (0, len(all_journals)):
+            return None
+
+        # The balances are aggregated by month: they can only be used if the period starts on the first day of a month.
+        date_from = options['date'].get('date_from')
+        date_from = date_from and fields.Date.from_string(date_from)
+        if options['date']['mode'] == 'range' and date_from and date_from.day != 1:
+            return None
+
+        snapshot_date = (fields.Date.from_string(options['date']['date_to']) + relativedelta(days=1)).replace(day=1)
+        if options['date']['mode'] == 'range' and date_from and snapshot_date <= date_from:
+            return None
+        return snapshot_date
+
+    @api.model
+    def _get_options_balance_snapshot_domain(self, options):
+        ''' Same as '_get_options_domain' but restricted to the fields available on account.balance.snapshot.
+        :param options: The report options.
+        :return:        A domain on account.balance.snapshot.
+        '''
+        if options.get('multi_company', False):
+            domain = [('company_id', 'in', self.env.companies.ids)]
+        else:
+            domain = [('company_id', '=', self.env.company.id)]
+        domain += self._get_options_date_domain(options)
+        domain += self._get_options_partner_domain(options)
+        return domain
+
+    @api.model
+    def _get_query_balance(self, options, groupby, domain=None, snapshot_domain=None):
+        ''' Construct a query aggregating the amounts of the journal items matching the options by the field passed as
+        parameter. When possible, the journal items dated before the last month covered by the options are read from the
+        monthly balances of account.balance.snapshot (see '_get_balance_snapshot_date').
+        The resulting query returns the 'groupby', 'max_date', 'amount_currency', 'debit', 'credit' and 'balance'
+        columns. Note 'max_date' only considers the journal items read from account_move_line, not the months read
+        from the monthly balances.
+        :param options:         The report options.
+        :param groupby:         The name of a field available on both account.move.line and account.balance.snapshot.
+        :param domain:          An optional additional domain on account.move.line.
+        :param snapshot_domain: The same additional domain as 'domain' but expressed on account.balance.snapshot.
+                                The balances are not used when not specified while 'domain' is.
+        :return:                (query, params)
+        '''
+        ct_query = self.env['res.currency']._get_query_currency_table(options)
+        snapshot_date = None
+        if not domain or snapshot_domain is not None:
+            snapshot_date = self._get_balance_snapshot_date(options)
+
+        aml_domain = list(domain or [])
+        if snapshot_date:
+            aml_domain.append(('date', '>=', fields.Date.to_string(snapshot_date)))
+        tables, where_clause, params = self._query_get(options, domain=aml_domain)
+        queries = ['''
+            SELECT
+                account_move_line.%(groupby)s                           AS groupby,
+                MAX(account_move_line.date)                             AS max_date,
+                COALESCE(SUM(account_move_line.amount_currency), 0.0)   AS amount_currency,
+                SUM(ROUND(account_move_line.debit * currency_table.rate, currency_table.precision))   AS debit,
+                SUM(ROUND(account_move_line.credit * currency_table.rate, currency_table.precision))  AS credit,
+                SUM(ROUND(account_move_line.balance * currency_table.rate, currency_table.precision)) AS balance
+            FROM %(tables)s
+            LEFT JOIN %(ct_query)s ON currency_table.company_id = account_move_line.company_id
+            WHERE %(where_clause)s
+            GROUP BY account_move_line.%(groupby)s
+        ''' % {'groupby': groupby, 'tables': tables, 'ct_query': ct_query, 'where_clause': where_clause}]
+
+        if snapshot_date:
+            Snapshot = self.env['account.balance.snapshot']
+            query = Snapshot._where_calc(
+                self._get_options_balance_snapshot_domain(options)
+                + (snapshot_domain or [])
+                + [('date', '<', fields.Date.to_string(snapshot_date))]
+            )
+            tables, where_clause, where_params = query.get_sql()
+            params += where_params
+
+            # The balances being already aggregated by company, the currency conversion is made on the monthly amounts.
+            queries.append('''
+                SELECT
+                    account_balance_snapshot.%(groupby)s                            AS groupby,
+                    NULL::date                                                      AS max_date,
+                    COALESCE(SUM(account_balance_snapshot.amount_currency), 0.0)    AS amount_currency,
+                    SUM(ROUND(account_balance_snapshot.debit * currency_table.rate, currency_table.precision))   AS debit,
+                    SUM(ROUND(account_balance_snapshot.credit * currency_table.rate, currency_table.precision))  AS credit,
+                    SUM(ROUND(account_balance_snapshot.balance * currency_table.rate, currency_table.precision)) AS balance
+                FROM %(tables)s
+                LEFT JOIN %(ct_query)s ON currency_table.company_id = account_balance_snapshot.company_id
+                WHERE %(where_clause)s
+                GROUP BY account_balance_snapshot.%(groupby)s
+            ''' % {'groupby': groupby, 'tables': tables, 'ct_query': ct_query, 'where_clause': where_clause})
+
+        query = '''
+            SELECT
+                balance_sums.groupby                AS groupby,
+                MAX(balance_sums.max_date)          AS max_date,
+                SUM(balance_sums.amount_currency)   AS amount_currency,
+                SUM(balance_sums.debit)             AS debit,
+                SUM(balance_sums.credit)            AS credit,
+                SUM(balance_sums.balance)           AS balance
+            FROM (%s) AS balance_sums
+            GROUP BY balance_sums.groupby
+        ''' % ' UNION ALL '.join(queries)
+        return query, params
+
     ####################################################
     # MISC
     ####################################################
@@ -1390,8 +1532,21 @@ class AccountReport(models.AbstractModel):
                 }
 
     def get_xlsx(self, options, response=None):
-        output = io.BytesIO()
-        workbook = xlsxwriter.Workbook(output, {'in_memory': True})
+        xlsx_file = self._get_xlsx_file(options)
+        generated_file = xlsx_file.read()
+        xlsx_file.close()
+
+        return generated_file
+
+    def _get_xlsx_file(self, options):
+        ''' Generate the xlsx export of the report into a temporary file.
+        The lines are written one by one as they are yielded by the report using the constant memory mode of
+        xlsxwriter, so that exporting a huge report doesn't require to keep it whole in memory.
+        :param options: The report options.
+        :return:        A file object positioned at its beginning. It's up to the caller to close it.
+        '''
+        output = tempfile.TemporaryFile()
+        workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
         sheet = workbook.add_worksheet(self._get_report_name()[:31])
 
         date_default_col1_style = workbook.add_format({'font_name': 'Arial', 'font_size': 12, 'font_color': '#666666', 'indent': 2, 'num_format': 'yyyy-mm-dd'})
@@ -1412,7 +1567,7 @@ class AccountReport(models.AbstractModel):
         sheet.set_column(0, 0, 50)
 
         y_offset = 0
-        headers, lines = self.with_context(no_format=True, print_mode=True, prefetch_fields=False)._get_table(options)
+        headers, lines = self.with_context(no_format=True, print_mode=True, prefetch_fields=False, lazy_lines=True)._get_table(options)
 
         # Add headers.
         for header in headers:
@@ -1428,14 +1583,14 @@ class AccountReport(models.AbstractModel):
             y_offset += 1
 
         if options.get('hierarchy'):
-            lines = self._create_hierarchy(lines, options)
+            lines = self._create_hierarchy(list(lines), options)
         if options.get('selected_column'):
-            lines = self._sort_lines(lines, options)
+            lines = self._sort_lines(list(lines), options)
 
         # Add lines.
-        for y in range(0, len(lines)):
-            level = lines[y].get('level')
-            if lines[y].get('caret_options'):
+        for y, line in enumerate(lines):
+            level = line.get('level')
+            if line.get('caret_options'):
                 style = level_3_style
                 col1_style = level_3_col1_style
             elif level == 0:
@@ -1447,35 +1602,33 @@ class AccountReport(models.AbstractModel):
                 col1_style = style
             elif level == 2:
                 style = level_2_style
-                col1_style = 'total' in lines[y].get('class', '').split(' ') and level_2_col1_total_style or level_2_col1_style
+                col1_style = 'total' in line.get('class', '').split(' ') and level_2_col1_total_style or level_2_col1_style
             elif level == 3:
                 style = level_3_style
-                col1_style = 'total' in lines[y].get('class', '').split(' ') and level_3_col1_total_style or level_3_col1_style
+                col1_style = 'total' in line.get('class', '').split(' ') and level_3_col1_total_style or level_3_col1_style
             else:
                 style = default_style
                 col1_style = default_col1_style
 
             #write the first column, with a specific style to manage the indentation
-            cell_type, cell_value = self._get_cell_type_value(lines[y])
+            cell_type, cell_value = self._get_cell_type_value(line)
             if cell_type == 'date':
                 sheet.write_datetime(y + y_offset, 0, cell_value, date_default_col1_style)
             else:
                 sheet.write(y + y_offset, 0, cell_value, col1_style)
 
             #write all the remaining cells
-            for x in range(1, len(lines[y]['columns']) + 1):
-                cell_type, cell_value = self._get_cell_type_value(lines[y]['columns'][x - 1])
+            for x in range(1, len(line['columns']) + 1):
+                cell_type, cell_value = self._get_cell_type_value(line['columns'][x - 1])
                 if cell_type == 'date':
-                    sheet.write_datetime(y + y_offset, x + lines[y].get('colspan', 1) - 1, cell_value, date_default_style)
+                    sheet.write_datetime(y + y_offset, x + line.get('colspan', 1) - 1, cell_value, date_default_style)
                 else:
-                    sheet.write(y + y_offset, x + lines[y].get('colspan', 1) - 1, cell_value, style)
+                    sheet.write(y + y_offset, x + line.get('colspan', 1) - 1, cell_value, style)
 
         workbook.close()
         output.seek(0)
-        generated_file = output.read()
-        output.close()
 
-        return generated_file
+        return output
 
     def _get_cell_type_value(self, cell):
         if 'date' not in cell.get('class', '') or not cell.get('name'):
@@ -85,6 +85,14 @@ class FormulaSolver:
         # contains (0, 1), (0, 2), (0, 3), (1, 2), (1, 3), (1, 4).
         self.encountered_keys = set()
 
+        # The leaves found during the prefetching but not yet computed. They are computed all at once by
+        # '_compute_pending_leaves' to share the scans of the journal items.
+        self.pending_leaves = self.env['account.financial.html.report.line']
+
+        # The depth of the lines being prefetched. The pending leaves are only computed once the prefetching is over,
+        # so that all the leaves reached through the codes of the formulas share the same scans.
+        self.prefetch_depth = 0
+
     # -------------------------------------------------------------------------
     # PRIVATE METHODS
     # -------------------------------------------------------------------------
@@ -120,6 +128,8 @@ class FormulaSolver:
 
             if financial_line:
                 self._prefetch_line(financial_line)
+                if not self.prefetch_depth:
+                    self._compute_pending_leaves()
 
             return financial_line
 
@@ -131,6 +141,8 @@ class FormulaSolver:
         self.cache_results_by_id.setdefault(financial_line.id, {})
 
         if 'formula' not in self.cache_results_by_id[financial_line.id]:
+            # The keys of all the leaves must be known before evaluating the formula.
+            self._compute_pending_leaves()
             results = {}
             if financial_line.formulas:
                 for key in self.encountered_keys:
@@ -151,10 +163,25 @@ class FormulaSolver:
         if 'amls' not in self.cache_results_by_id[financial_line.id]:
 
             # The current financial line is a leaf using at least one "sum" in its formulas.
-            # If this line is visited for the first time, trigger the computation of '_compute_sum' and
-            # cache the results.
+            # If this line is visited for the first time, trigger the computation of the pending leaves.
+
+            self.pending_leaves |= financial_line
+            self._compute_pending_leaves()
+
+        return self.cache_results_by_id[financial_line.id]['amls']
+
+    def _compute_pending_leaves(self):
+        ''' Compute the 'amls' results of all pending leaves at once using '_compute_sum_batch' and cache them
+        (see 'cache_results_by_id').
+        '''
+        pending_leaves = self.pending_leaves
+        self.pending_leaves = self.env['account.financial.html.report.line']
+        if not pending_leaves:
+            return
 
-            results = financial_line._compute_sum(self.options_list)
+        results_by_line = pending_leaves._compute_sum_batch(self.options_list)
+        for financial_line in pending_leaves:
+            results = results_by_line[financial_line.id]
             for key in results['sum']:
                 self.encountered_keys.add(key)
 
@@ -166,10 +193,9 @@ class FormulaSolver:
             else:
                 results['sign'] = 1
 
+            self.cache_results_by_id.setdefault(financial_line.id, {})
             self.cache_results_by_id[financial_line.id]['amls'] = results
 
-        return self.cache_results_by_id[financial_line.id]['amls']
-
     def _prefetch_line(self, financial_line):
         ''' Ensure all leaves that depends of this line are evaluated.
         E.g. if the formula is 'A + B', make sure 'A' and 'B' are also fetch.
@@ -185,6 +211,16 @@ class FormulaSolver:
         if not financial_line.formulas:
             return
 
+        self.prefetch_depth += 1
+        try:
+            self._resolve_leaves(financial_line)
+        finally:
+            self.prefetch_depth -= 1
+
+    def _resolve_leaves(self, financial_line):
+        ''' Collect the leaves of the formula of the line passed as parameter, prefetching the lines of its codes.
+        :param financial_line:  A record of the account.financial.html.report.line model.
+        '''
         class LeafResolver(ast.NodeTransformer):
             # Helper class to iterate through the AST without evaluating the formulas, only leaves.
             #
@@ -203,8 +239,10 @@ class FormulaSolver:
 
             def visit_Name(self, node):
                 if node.id in ('sum', 'sum_if_pos', 'sum_if_neg'):
-                    # The current line contains a 'sum' and then, must be evaluate directly.
-                    self.solver._get_amls_results(self.financial_line)
+                    # The current line contains a 'sum' and then, must be evaluated before the formulas. The leaves
+                    # are computed all together at the end of the prefetching.
+                    if 'amls' not in self.solver.cache_results_by_id[self.financial_line.id]:
+                        self.solver.pending_leaves |= self.financial_line
                 else:
 
                     # Iterate sub-formula recursively. If the line is not already computed, it will trigger a new
@@ -270,6 +308,7 @@ class FormulaSolver:
             children_financial_lines += financial_line.children_ids
         if children_financial_lines:
             self.fetch_lines(children_financial_lines)
+        self._compute_pending_leaves()
 
     def get_keys(self):
         ''' Get all involved keys found in the solver. '''
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+from unittest.mock import patch
+
+from .common import TestAccountReportsCommon
+
+from odoo import fields
+from odoo.tests import tagged
+
+
+@tagged('post_install', '-at_install')
+class TestAccountBalanceSnapshot(TestAccountReportsCommon):
+
+    @classmethod
+    def setUpClass(cls, chart_template_ref=None):
+        super().setUpClass(chart_template_ref=chart_template_ref)
+
+        cls.move_2016 = cls.env['account.move'].create({
+            'move_type': 'entry',
+            'date': fields.Date.from_string('2016-01-15'),
+            'journal_id': cls.company_data['default_journal_misc'].id,
+            'line_ids': [
+                (0, 0, {'debit': 100.0,     'credit': 0.0,      'name': '2016_1',   'account_id': cls.company_data['default_account_receivable'].id, 'partner_id': cls.partner_a.id}),
+                (0, 0, {'debit': 0.0,       'credit': 100.0,    'name': '2016_2',   'account_id': cls.company_data['default_account_revenue'].id}),
+            ],
+        })
+        cls.move_2016.action_post()
+
+        cls.move_2017 = cls.env['account.move'].create({
+            'move_type': 'entry',
+            'date': fields.Date.from_string('2017-01-20'),
+            'journal_id': cls.company_data['default_journal_misc'].id,
+            'line_ids': [
+                (0, 0, {'debit': 300.0,     'credit': 0.0,      'name': '2017_1',   'account_id': cls.company_data['default_account_receivable'].id, 'partner_id': cls.partner_a.id}),
+                (0, 0, {'debit': 0.0,       'credit': 300.0,    'name': '2017_2',   'account_id': cls.company_data['default_account_revenue'].id}),
+            ],
+        })
+        cls.move_2017.action_post()
+
+    def _get_snapshot_balances(self, account):
+        snapshots = self.env['account.balance.snapshot'].search([('account_id', '=', account.id)])
+        return [(s.date, s.partner_id, s.debit, s.credit, s.balance) for s in snapshots]
+
+    def test_balance_snapshot_post_draft(self):
+        receivable = self.company_data['default_account_receivable']
+
+        self.assertEqual(self._get_snapshot_balances(receivable), [
+            (fields.Date.from_string('2016-01-01'), self.partner_a, 100.0, 0.0, 100.0),
+            (fields.Date.from_string('2017-01-01'), self.partner_a, 300.0, 0.0, 300.0),
+        ])
+
+        self.move_2017.button_draft()
+        self.assertEqual(self._get_snapshot_balances(receivable), [
+            (fields.Date.from_string('2016-01-01'), self.partner_a, 100.0, 0.0, 100.0),
+        ])
+
+        self.move_2017.line_ids.filtered(lambda line: line.debit).partner_id = self.partner_b
+        self.move_2017.action_post()
+        self.assertEqual(self._get_snapshot_balances(receivable), [
+            (fields.Date.from_string('2016-01-01'), self.partner_a, 100.0, 0.0, 100.0),
+            (fields.Date.from_string('2017-01-01'), self.partner_b, 300.0, 0.0, 300.0),
+        ])
+
+    def test_balance_snapshot_rebuild(self):
+        Snapshot = self.env['account.balance.snapshot']
+        snapshots = Snapshot.search([])
+        balances = snapshots.mapped(lambda s: (s.company_id, s.account_id, s.partner_id, s.currency_id, s.date, s.balance))
+
+        Snapshot._rebuild()
+        snapshots = Snapshot.search([])
+        self.assertEqual(snapshots.mapped(lambda s: (s.company_id, s.account_id, s.partner_id, s.currency_id, s.date, s.balance)), balances)
+
+    def test_balance_snapshot_general_ledger(self):
+        ''' The report must be the same with or without using the monthly balances. '''
+        report = self.env['account.general.ledger']
+        options = self._init_options(report, fields.Date.from_string('2017-02-01'), fields.Date.from_string('2017-02-28'))
+        self.assertEqual(report._get_balance_snapshot_date(options), fields.Date.from_string('2017-03-01'))
+
+        lines = report._get_lines(options)
+        with patch.object(type(report), '_get_balance_snapshot_date', lambda self, options: None):
+            self.assertEqual(lines, report._get_lines(options))
+
+    def test_balance_snapshot_general_ledger_mid_month(self):
+        ''' The accounts having journal items in a period not starting on the first day of a month must be unfoldable,
+        even if their sums are read from the monthly balances. '''
+        report = self.env['account.general.ledger']
+        options = self._init_options(report, fields.Date.from_string('2017-01-10'), fields.Date.from_string('2017-01-31'))
+        options['unfold_all'] = True
+
+        lines = report._get_lines(options)
+        receivable = self.company_data['default_account_receivable']
+        account_line = next(line for line in lines if line['id'] == 'account_%s' % receivable.id)
+        self.assertTrue(account_line['unfoldable'])
+        self.assertIn(self.move_2017.line_ids.filtered(lambda line: line.debit).id,
+                      [line['id'] for line in lines if line.get('parent_id') == account_line['id']])
+
+        with patch.object(type(report), '_get_balance_snapshot_date', lambda self, options: None):
+            self.assertEqual(lines, report._get_lines(options))
+
+    def test_balance_snapshot_partner_ledger(self):
+        ''' The report must be the same with or without using the monthly balances. '''
+        report = self.env['account.partner.ledger']
+        options = self._init_options(report, fields.Date.from_string('2017-01-01'), fields.Date.from_string('2017-01-31'))
+
+        lines = report._get_lines(options)
+        with patch.object(type(report), '_get_balance_snapshot_date', lambda self, options: None):
+            self.assertEqual(lines, report._get_lines(options))
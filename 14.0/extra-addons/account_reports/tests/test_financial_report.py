@@ -1,5 +1,8 @@
 # -*- coding: utf-8 -*-
+from unittest.mock import patch
+
 from .common import TestAccountReportsCommon
+from odoo.addons.account_reports.models.formula import FormulaSolver
 
 from odoo import fields
 from odoo.tests import tagged
@@ -174,6 +177,31 @@ class TestFinancialReport(TestAccountReportsCommon):
             ],
         )
 
+    def test_financial_report_grouped_leaves(self):
+        ''' The leaves of the report, including the ones reached through the codes of the formulas, are computed
+        together, with the same results as when computed one by one. '''
+        options = self._init_options(self.report, fields.Date.from_string('2019-01-01'), fields.Date.from_string('2019-12-31'))
+        options.pop('multi_company', None)
+        options_list = self.report._get_options_periods_list(options)
+        financial_lines = self.env['account.financial.html.report.line'].search([('id', 'child_of', self.report.line_ids.ids)])
+
+        ReportLine = type(self.env['account.financial.html.report.line'])
+        compute_sum_batch = ReportLine._compute_sum_batch
+        solver = FormulaSolver(options_list, self.report)
+        with patch.object(ReportLine, '_compute_sum_batch', autospec=True, side_effect=compute_sum_batch) as patched:
+            solver.fetch_lines(financial_lines)
+            for financial_line in financial_lines:
+                solver.get_results(financial_line)
+        self.assertEqual(patched.call_count, 1)
+
+        leaves = self.env['account.financial.html.report.line'].browse([
+            line_id for line_id, results in solver.cache_results_by_id.items() if 'amls' in results
+        ])
+        self.assertGreater(len(leaves - financial_lines), 0, "Some leaves should come from the codes of the formulas")
+        for leaf in leaves:
+            results = leaf._compute_sum_batch(options_list)[leaf.id]
+            self.assertEqual(solver.cache_results_by_id[leaf.id]['amls']['sum'], results['sum'])
+
     def test_financial_report_multi_company_currency(self):
         line_id = self.env.ref('account_reports.account_financial_report_bank_view0').id
         options = self._init_options(self.report, fields.Date.from_string('2019-01-01'), fields.Date.from_string('2019-12-31'))
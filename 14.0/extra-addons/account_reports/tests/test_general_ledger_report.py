@@ -193,6 +193,20 @@ class TestGeneralLedgerReport(TestAccountReportsCommon):
                 ],
             )
 
+    def test_general_ledger_unfold_4_print_mode(self):
+        ''' Test the lines streamed when exporting the report are the same as the ones printed. '''
+        report = self.env['account.general.ledger']
+        options = self._init_options(report, fields.Date.from_string('2017-01-01'), fields.Date.from_string('2017-12-31'))
+
+        lines = report.with_context(print_mode=True)._get_lines(options)
+        lazy_lines = report.with_context(print_mode=True, lazy_lines=True)._get_lines(options)
+        self.assertNotIsInstance(lazy_lines, list)
+        self.assertEqual(list(lazy_lines), lines)
+
+        xlsx_file = report._get_xlsx_file(options)
+        self.assertEqual(xlsx_file.read(2), b'PK')
+        xlsx_file.close()
+
     def test_general_ledger_foreign_currency_account(self):
         ''' Ensure the total in foreign currency of an account is displayed only if all journal items are sharing the
         same currency.
@@ -5,17 +5,20 @@ import threading
 import time
 import psycopg2
 import pytz
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
 
 import odoo
-from odoo import api, fields, models, _
+from odoo import api, fields, models, SUPERUSER_ID, _
 from odoo.exceptions import UserError
+from odoo.tools import config
 
 _logger = logging.getLogger(__name__)
 
 BASE_VERSION = odoo.modules.load_information_from_description_file('base')['version']
 MAX_FAIL_TIME = timedelta(hours=5)  # chosen with a fair roll of the dice
+RUN_RETENTION = timedelta(days=30)
 
 
 class BadVersion(Exception):
@@ -64,6 +67,20 @@ class ir_cron(models.Model):
     nextcall = fields.Datetime(string='Next Execution Date', required=True, default=fields.Datetime.now, help="Next planned execution date for this job.")
     lastcall = fields.Datetime(string='Last Execution Date', help="Previous time the cron ran successfully, provided to the job through the context on the `lastcall` key")
     priority = fields.Integer(default=5, help='The priority of the job, as an integer: 0 means higher priority, 10 means lower priority.')
+    progress_done = fields.Integer(string='Processed Records', compute='_compute_progress',
+                                   help="Number of records processed by the current or last run of a batched job.")
+    progress_remaining = fields.Integer(string='Remaining Records', compute='_compute_progress',
+                                        help="Number of records left to process by a batched job.")
+
+    def _compute_progress(self):
+        progress_by_cron = {
+            progress.cron_id.id: progress
+            for progress in self.env['ir.cron.progress'].sudo().search([('cron_id', 'in', self.ids)])
+        }
+        for cron in self:
+            progress = progress_by_cron.get(cron.id)
+            cron.progress_done = progress.done if progress else 0
+            cron.progress_remaining = progress.remaining if progress else 0
 
     @api.model
     def create(self, values):
@@ -112,11 +129,104 @@ class ir_cron(models.Model):
                 end_time = time.time()
                 _logger.debug('%.3fs (cron %s, server action %d with uid %d)', end_time - start_time, cron_name, server_action_id, self.env.uid)
             self.pool.signal_changes()
+            return True
         except Exception as e:
             self.pool.reset_changes()
             _logger.exception("Call from cron %s for server action #%s failed in Job #%s",
                               cron_name, server_action_id, job_id)
             self._handle_callback_exception(cron_name, server_action_id, job_id, e)
+            return False
+
+    def _run_callback(self, job):
+        """ Run the callback of ``job`` (a dictionary), and record statistics
+        about it.
+
+        A callback processing its records by batches reports its progress by
+        calling ``_notify_progress``. As long as it reports remaining work,
+        the current transaction is committed and the callback is called again,
+        until it has processed everything, fails, stops making progress, or
+        exhausts half of the cron worker's real time limit.
+
+        :return: a pair ``(run, unfinished)`` where ``run`` are the values of
+            the ``ir.cron.run`` to create, and ``unfinished`` is whether the
+            callback stopped because of the time limit
+        """
+        cr = self._cr
+        start_date = fields.Datetime.now()
+        start_time = time.time()
+        touched_rows = self._count_touched_rows(cr)
+
+        time_limit = config.get('limit_time_real_cron', -1)
+        if time_limit is None or time_limit < 0:
+            time_limit = config.get('limit_time_real') or 0
+
+        progress = self.env['ir.cron.progress'].sudo()._get_progress(job['id'])
+        progress.write({'done': 0, 'remaining': 0})
+        cron = self.with_context(ir_cron_id=job['id'])
+        unfinished = False
+        while True:
+            done = progress.done
+            success = cron._callback(job['cron_name'], job['ir_actions_server_id'], job['id'])
+            if not success:
+                break
+            progress.invalidate_cache()
+            if not progress.remaining:
+                break
+            if progress.done <= done:
+                _logger.warning("Job `%s` reported %d remaining records, but did not process any.",
+                                job['cron_name'], progress.remaining)
+                break
+            if time_limit and time.time() - start_time > time_limit / 2:
+                unfinished = True
+                break
+            _logger.info("Job `%s` processed %d records, %d remaining.",
+                         job['cron_name'], progress.done, progress.remaining)
+            cr.commit()
+
+        run = {
+            'cron_id': job['id'],
+            'start_date': start_date,
+            'duration': time.time() - start_time,
+            'rows_touched': touched_rows(),
+            'state': 'success' if success else 'failure',
+        }
+        return run, unfinished
+
+    @api.model
+    def _notify_progress(self, *, done, remaining):
+        """ Report the progress of a batched job. To be called by a cron
+        callback that processes ``done`` records and leaves ``remaining``
+        records for subsequent calls. The scheduler then commits and calls it
+        again in a new transaction until ``remaining`` is zero.
+
+        This has no effect when the callback is not run by the scheduler.
+        """
+        cron_id = self.env.context.get('ir_cron_id')
+        if not cron_id:
+            return
+        progress = self.env['ir.cron.progress'].sudo()._get_progress(cron_id)
+        progress.write({'done': progress.done + done, 'remaining': remaining})
+
+    @classmethod
+    def _count_touched_rows(cls, cr):
+        """ Start counting the rows inserted, updated or deleted through ``cr``,
+        and return a function that gives that number. The transactions
+        committed meanwhile are taken into account, rolled back ones are not.
+        """
+        committed = [0]
+
+        def touched():
+            cr.execute("""SELECT COALESCE(SUM(n_tup_ins + n_tup_upd + n_tup_del), 0)
+                          FROM pg_stat_xact_user_tables""")
+            return cr.fetchone()[0]
+
+        def precommit():
+            committed[0] += touched()
+            # hooks are run once, watch the next transaction as well
+            cr.postcommit.add(lambda: cr.precommit.add(precommit))
+
+        cr.precommit.add(precommit)
+        return lambda: committed[0] + touched()
 
     @classmethod
     def _process_job(cls, job_cr, job, cron_cr):
@@ -141,11 +251,17 @@ class ir_cron(models.Model):
                 numbercall = job['numbercall']
 
                 ok = False
+                runs = []
                 while nextcall < now and numbercall:
+                    if not ok or job['doall']:
+                        run, unfinished = cron._run_callback(job)
+                        runs.append(run)
+                        if unfinished:
+                            # the job ran out of time before processing all its
+                            # batches, keep it due to continue at the next poll
+                            break
                     if numbercall > 0:
                         numbercall -= 1
-                    if not ok or job['doall']:
-                        cron._callback(job['cron_name'], job['ir_actions_server_id'], job['id'])
                     if numbercall:
                         nextcall += _intervalTypes[job['interval_type']](job['interval_number'])
                     ok = True
@@ -158,6 +274,7 @@ class ir_cron(models.Model):
                     fields.Datetime.to_string(now.astimezone(pytz.UTC)),
                     job['id']
                 ))
+                api.Environment(cron_cr, SUPERUSER_ID, {})['ir.cron.run'].create(runs)
                 cron.flush()
                 cron.invalidate_cache()
 
@@ -211,53 +328,76 @@ class ir_cron(models.Model):
                 else:
                     raise BadModuleState()
 
-            for job in jobs:
-                lock_cr = db.cursor()
-                try:
-                    # Try to grab an exclusive lock on the job row from within the task transaction
-                    # Restrict to the same conditions as for the search since the job may have already
-                    # been run by an other thread when cron is running in multi thread
-                    lock_cr.execute("""SELECT *
-                                       FROM ir_cron
-                                       WHERE numbercall != 0
-                                          AND active
-                                          AND nextcall <= (now() at time zone 'UTC')
-                                          AND id=%s
-                                       FOR UPDATE NOWAIT""",
-                                   (job['id'],), log_exceptions=False)
-
-                    locked_job = lock_cr.fetchone()
-                    if not locked_job:
-                        _logger.debug("Job `%s` already executed by another process/thread. skipping it", job['cron_name'])
-                        continue
-                    # Got the lock on the job row, run its code
-                    _logger.info('Starting job `%s`.', job['cron_name'])
-                    job_cr = db.cursor()
-                    try:
-                        registry = odoo.registry(db_name)
-                        registry[cls._name]._process_job(job_cr, job, lock_cr)
-                        _logger.info('Job `%s` done.', job['cron_name'])
-                    except Exception:
-                        _logger.exception('Unexpected exception while processing cron job %r', job)
-                    finally:
-                        job_cr.close()
-
-                except psycopg2.OperationalError as e:
-                    if e.pgcode == '55P03':
-                        # Class 55: Object not in prerequisite state; 55P03: lock_not_available
-                        _logger.debug('Another process/thread is already busy executing job `%s`, skipping it.', job['cron_name'])
-                        continue
-                    else:
-                        # Unexpected OperationalError
-                        raise
-                finally:
-                    # we're exiting due to an exception while acquiring the lock
-                    lock_cr.close()
+            # with a pool of workers, jobs are started by order of priority as
+            # soon as a worker is available, and every worker uses two
+            # database connections at a time
+            workers = int(config.get('cron_job_workers') or 0)
+            if workers > 1 and len(jobs) > 1:
+                with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='odoo.cron.job') as executor:
+                    futures = [executor.submit(cls._run_job, db_name, job) for job in jobs]
+                for future in futures:
+                    future.result()
+            else:
+                for job in jobs:
+                    cls._run_job(db_name, job)
 
         finally:
             if hasattr(threading.current_thread(), 'dbname'):
                 del threading.current_thread().dbname
 
+    @classmethod
+    def _run_job(cls, db_name, job):
+        """ Try to lock the given job, and run it if the lock is acquired (if
+        it is not, it means the job is already being taken care of by another
+        thread).
+        """
+        db = odoo.sql_db.db_connect(db_name)
+        # worker threads need it too, for logging and the registry
+        threading.current_thread().dbname = db_name
+        lock_cr = db.cursor()
+        try:
+            # Try to grab an exclusive lock on the job row from within the task transaction
+            # Restrict to the same conditions as for the search since the job may have already
+            # been run by an other thread when cron is running in multi thread
+            # The lock still lets the job insert rows referencing it, like its
+            # progress (foreign keys take a KEY SHARE lock on the job row)
+            lock_cr.execute("""SELECT *
+                               FROM ir_cron
+                               WHERE numbercall != 0
+                                  AND active
+                                  AND nextcall <= (now() at time zone 'UTC')
+                                  AND id=%s
+                               FOR NO KEY UPDATE NOWAIT""",
+                           (job['id'],), log_exceptions=False)
+
+            locked_job = lock_cr.fetchone()
+            if not locked_job:
+                _logger.debug("Job `%s` already executed by another process/thread. skipping it", job['cron_name'])
+                return
+            # Got the lock on the job row, run its code
+            _logger.info('Starting job `%s`.', job['cron_name'])
+            job_cr = db.cursor()
+            try:
+                registry = odoo.registry(db_name)
+                registry[cls._name]._process_job(job_cr, job, lock_cr)
+                _logger.info('Job `%s` done.', job['cron_name'])
+            except Exception:
+                _logger.exception('Unexpected exception while processing cron job %r', job)
+            finally:
+                job_cr.close()
+
+        except psycopg2.OperationalError as e:
+            if e.pgcode == '55P03':
+                # Class 55: Object not in prerequisite state; 55P03: lock_not_available
+                _logger.debug('Another process/thread is already busy executing job `%s`, skipping it.', job['cron_name'])
+                return
+            else:
+                # Unexpected OperationalError
+                raise
+        finally:
+            # we're exiting due to an exception while acquiring the lock
+            lock_cr.close()
+
     @classmethod
     def _acquire_job(cls, db_name):
         """ Try to process all cron jobs.
@@ -322,3 +462,51 @@ class ir_cron(models.Model):
     def toggle(self, model, domain):
         active = bool(self.env[model].search_count(domain))
         return self.try_write({'active': active})
+
+
+class ir_cron_run(models.Model):
+    """ Execution statistics of scheduled actions, one record per call. """
+    _name = 'ir.cron.run'
+    _order = 'start_date desc, id desc'
+    _description = 'Scheduled Action Run'
+
+    cron_id = fields.Many2one('ir.cron', string='Scheduled Action', required=True, index=True, ondelete='cascade')
+    start_date = fields.Datetime(string='Start Date', required=True, readonly=True)
+    duration = fields.Float(string='Duration (s)', readonly=True, group_operator='avg',
+                            help="Time spent running the action, in seconds.")
+    rows_touched = fields.Integer(string='Rows Touched', readonly=True,
+                                  help="Number of rows inserted, updated or deleted by the action.")
+    state = fields.Selection([('success', 'Success'), ('failure', 'Failure')], string='Status',
+                             required=True, readonly=True)
+    failure_count = fields.Integer(string='Failures', compute='_compute_failure_count', store=True, readonly=True,
+                                   help="1 for failed runs, to sum failures when grouping.")
+
+    @api.depends('state')
+    def _compute_failure_count(self):
+        for run in self:
+            run.failure_count = 1 if run.state == 'failure' else 0
+
+    @api.autovacuum
+    def _gc_runs(self):
+        self.search([('start_date', '<', datetime.now() - RUN_RETENTION)]).unlink()
+
+
+class ir_cron_progress(models.Model):
+    """ Progress of batched scheduled actions, see ``ir.cron._notify_progress``.
+    The progress is written by the job itself, in the transaction of the batch
+    it has just processed, so that it is visible while the job is running.
+    """
+    _name = 'ir.cron.progress'
+    _description = 'Scheduled Action Progress'
+
+    cron_id = fields.Many2one('ir.cron', string='Scheduled Action', required=True, index=True, ondelete='cascade')
+    done = fields.Integer(string='Processed Records')
+    remaining = fields.Integer(string='Remaining Records')
+
+    _sql_constraints = [
+        ('cron_id_uniq', 'UNIQUE(cron_id)', 'A scheduled action has a single progress.'),
+    ]
+
+    def _get_progress(self, cron_id):
+        """ Return the progress of the given scheduled action, created if needed. """
+        return self.search([('cron_id', '=', cron_id)]) or self.create({'cron_id': cron_id})
@@ -16,6 +16,7 @@ import werkzeug.exceptions
 import werkzeug.routing
 import werkzeug.urls
 import werkzeug.utils
+import werkzeug.wsgi
 
 import odoo
 from odoo import api, http, models, tools, SUPERUSER_ID
@@ -27,6 +28,7 @@ from odoo.modules.module import get_resource_path, get_module_path
 
 from odoo.http import ALLOWED_DEBUG_MODES
 from odoo.tools.misc import str2bool
+from odoo.addons.base.models.ir_attachment import READ_CACHE_FILE_SIZE
 
 _logger = logging.getLogger(__name__)
 
@@ -150,17 +152,21 @@ class IrHttp(models.AbstractModel):
     @classmethod
     def _serve_attachment(cls):
         env = api.Environment(request.cr, SUPERUSER_ID, request.context)
-        attach = env['ir.attachment'].get_serve_attachment(request.httprequest.path, extra_fields=['name', 'checksum'])
+        # read the size of the content instead of the content itself, which is
+        # only loaded once we know it must be sent, and possibly streamed
+        attach = env['ir.attachment'].with_context(bin_size=True).get_serve_attachment(
+            request.httprequest.path, extra_fields=['name', 'checksum', 'store_fname', 'file_size'])
         if attach:
             wdate = attach[0]['__last_update']
-            datas = attach[0]['datas'] or b''
             name = attach[0]['name']
-            checksum = attach[0]['checksum'] or hashlib.sha512(datas).hexdigest()[:64]  # sha512/256
+            attachment = env['ir.attachment'].browse(attach[0]['id'])
 
-            if (not datas and name != request.httprequest.path and
+            if (not attach[0]['file_size'] and name != request.httprequest.path and
                     name.startswith(('http://', 'https://', '/'))):
                 return werkzeug.utils.redirect(name, 301)
 
+            checksum = attach[0]['checksum'] or hashlib.sha512(attachment.raw or b'').hexdigest()[:64]  # sha512/256
+
             response = werkzeug.wrappers.Response()
             response.last_modified = wdate
 
@@ -171,7 +177,16 @@ class IrHttp(models.AbstractModel):
                 return response
 
             response.mimetype = attach[0]['mimetype'] or 'application/octet-stream'
-            response.data = base64.b64decode(datas)
+            stream = None
+            if attach[0]['store_fname'] and attach[0]['file_size'] > READ_CACHE_FILE_SIZE:
+                stream = attachment._file_open(attach[0]['store_fname'])
+            if stream:
+                # let the WSGI server send the file by chunks (or with sendfile)
+                response.response = werkzeug.wsgi.wrap_file(request.httprequest.environ, stream)
+                response.direct_passthrough = True
+                response.content_length = attach[0]['file_size']
+            else:
+                response.data = attachment.raw or b''
             return response
 
     @classmethod
@@ -3,7 +3,9 @@
 import base64
 import hashlib
 import os
+import tempfile
 
+from odoo.addons.base.models import ir_attachment
 from odoo.exceptions import AccessError
 from odoo.tests.common import TransactionCase
 
@@ -136,3 +138,103 @@ class TestIrAttachment(TransactionCase):
         document = self.Attachment.create({'name': 'document', 'datas': self.blob1_b64})
         document.write({'datas': self.blob1_b64, 'mimetype': 'text/xml'})
         self.assertEqual(document.mimetype, 'text/xml', "XML mimetype should not be forced to text, for admin user")
+
+    def test_10_gc_checklist_resume(self):
+        """ The gc checklist is scanned from its checkpoint, and wraps around """
+        with tempfile.TemporaryDirectory() as filestore:
+            self.patch(type(self.Attachment), '_filestore', lambda self: filestore)
+            fnames = ['aa/aa1', 'aa/aa2', 'bb/bb1', 'cc/cc1', 'cc/cc2']
+            for fname in fnames:
+                self.Attachment._mark_for_gc(fname)
+
+            checklist = self.Attachment._gc_file_store_checklist()
+            self.assertEqual([fname for fname, _path in checklist], fnames)
+
+            checklist = self.Attachment._gc_file_store_checklist('bb/bb1')
+            self.assertEqual(
+                [fname for fname, _path in checklist],
+                ['cc/cc1', 'cc/cc2', 'aa/aa1', 'aa/aa2', 'bb/bb1'],
+            )
+
+            checklist = self.Attachment._gc_file_store_checklist('cc/cc1')
+            self.assertEqual(
+                [path for _fname, path in checklist][0],
+                os.path.join(filestore, 'checklist', 'cc', 'cc2'),
+            )
+
+    def test_11_read_cache(self):
+        """ Small files are read from the per-worker cache """
+        a2 = self.Attachment.create({'name': 'a2', 'raw': self.blob1})
+        full_path = self.Attachment._full_path(a2.store_fname)
+        ir_attachment._read_cache.pop(full_path)
+
+        self.assertEqual(self.Attachment._file_read(a2.store_fname), self.blob1)
+        self.assertEqual(ir_attachment._read_cache.get(full_path), self.blob1)
+
+        with self.Attachment._file_open(a2.store_fname) as stream:
+            self.assertEqual(stream.read(), self.blob1)
+
+    def test_12_read_cache_size(self):
+        cache = ir_attachment.ReadCache(10)
+        cache.set('a', b'aaaa')
+        cache.set('b', b'bbbb')
+        self.assertEqual(cache.get('a'), b'aaaa')
+        # 'b' is the least recently used entry, and gets evicted
+        cache.set('c', b'cccc')
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), b'aaaa')
+        self.assertEqual(cache.size, 8)
+        # entries larger than the cache are not kept
+        cache.set('d', b'd' * 11)
+        self.assertIsNone(cache.get('d'))
+        self.assertEqual(cache.size, 8)
+
+    def test_13_store_sharded(self):
+        self.env['ir.config_parameter'].set_param('ir_attachment.location', 'sharded')
+        a2 = self.Attachment.create({'name': 'a2', 'raw': self.blob1})
+        blob1_hash = hashlib.sha1(self.blob1).hexdigest()
+        self.assertEqual(a2.store_fname, '%s/%s/%s' % (blob1_hash[:2], blob1_hash[2:4], blob1_hash))
+        self.assertTrue(os.path.isfile(os.path.join(self.filestore, a2.store_fname)))
+        self.assertEqual(a2.raw, self.blob1)
+
+    def test_14_migrate_storage(self):
+        self.env['ir.config_parameter'].set_param('ir_attachment.location', 'db')
+        a1 = self.Attachment.create({'name': 'a1', 'raw': self.blob1})
+        a2 = self.Attachment.create({'name': 'a2', 'raw': self.blob2})
+        self.assertEqual(self.Attachment.search(self.Attachment._storage_domain('file') + [('id', 'in', (a1 + a2).ids)]), a1 + a2)
+
+        # the chunks are migrated in their own transaction
+        self.registry.enter_test_mode(self.cr)
+        self.addCleanup(self.registry.leave_test_mode)
+        self.env['ir.config_parameter'].set_param('ir_attachment.location', 'file')
+        domain = self.Attachment._storage_domain('file')
+        self.env['base'].flush()
+        self.assertEqual(self.Attachment._migrate_storage_chunk(domain, a1.ids), 1)
+
+        (a1 + a2).invalidate_cache()
+        self.assertEqual(a1.store_fname, self.blob1_fname)
+        self.assertFalse(a1.db_datas)
+        self.assertEqual(a1.raw, self.blob1)
+        self.assertFalse(a2.store_fname)
+        self.assertEqual(self.Attachment.search(domain + [('id', 'in', (a1 + a2).ids)]), a2)
+
+    def test_15_search_linked_record_permission(self):
+        Attachment = self.Attachment.with_user(self.env.ref('base.user_demo').id)
+        partners = self.env['res.partner'].create([{'name': 'visible'}, {'name': 'hidden'}])
+        visible = self.Attachment.create([
+            {'name': 'search_a1', 'res_model': 'res.partner', 'res_id': partners[0].id},
+            {'name': 'search_a3'},
+        ])
+        self.Attachment.create({'name': 'search_a2', 'res_model': 'res.partner', 'res_id': partners[1].id})
+
+        self.env['ir.rule'].create({
+            'name': 'test_rule', 'domain_force': "[('id', '!=', %s)]" % partners[1].id,
+            'model_id': self.env.ref('base.model_res_partner').id,
+        })
+
+        domain = [('name', '=like', 'search_a%')]
+        self.assertEqual(Attachment.search(domain), visible)
+        self.assertEqual(Attachment.search_count(domain), 2)
+        # the hidden attachment does not make the page shorter than the limit
+        self.assertEqual(Attachment.search(domain, order='name', limit=2), visible)
+        self.assertEqual(Attachment.search(domain, order='name', offset=1, limit=1), visible[1])
@@ -1,10 +1,12 @@
 # -*- coding: utf-8 -*-
 # Part of Odoo. See LICENSE file for full copyright and licensing details.
 
+from datetime import timedelta
 from unittest.mock import patch
 
 from odoo import fields
 from odoo.tests.common import TransactionCase
+from odoo.tools import mute_logger
 
 
 class TestIrCron(TransactionCase):
@@ -43,3 +45,50 @@ class TestIrCron(TransactionCase):
         self.assertEqual(fields.Datetime.to_string(self.cron.lastcall), '2020-10-22 08:00:00')
         self.assertEqual(self.test_partner.name, 'You have been CRONWNED')
         self.assertEqual(self.test_partner2.name, 'NotTestCronRecord')
+
+    def _process_cron(self, cron):
+        """ Run ``cron`` the way the scheduler does, with its own cursors. """
+        cron.nextcall = fields.Datetime.now() - timedelta(hours=1)
+        self.env['base'].flush()
+        self.cr.execute("SELECT * FROM ir_cron WHERE id=%s", [cron.id])
+        job = self.cr.dictfetchone()
+
+        self.registry.enter_test_mode(self.cr)
+        self.addCleanup(self.registry.leave_test_mode)
+        with self.registry.cursor() as job_cr, self.registry.cursor() as cron_cr:
+            self.registry['ir.cron']._process_job(job_cr, job, cron_cr)
+        self.env.invalidate_all()
+
+    def test_cron_run_stats(self):
+        self._process_cron(self.cron)
+
+        self.assertEqual(self.test_partner.name, 'You have been CRONWNED')
+        run = self.env['ir.cron.run'].search([('cron_id', '=', self.cron.id)])
+        self.assertEqual(len(run), 1)
+        self.assertEqual(run.state, 'success')
+        self.assertEqual(run.failure_count, 0)
+        self.assertGreaterEqual(run.rows_touched, 1)
+        self.assertGreaterEqual(run.duration, 0)
+
+    def test_cron_run_stats_failure(self):
+        self.cron.code = 'raise UserError("cron failure")'
+        with mute_logger('odoo.addons.base.models.ir_cron'):
+            self._process_cron(self.cron)
+
+        run = self.env['ir.cron.run'].search([('cron_id', '=', self.cron.id)])
+        self.assertEqual(run.state, 'failure')
+        self.assertEqual(run.failure_count, 1)
+
+    def test_cron_batches(self):
+        partners = self.env['res.partner'].create([{'name': 'TestCronBatch'}] * 3)
+        self.cron.code = """
+records = model.search([('name', '=', 'TestCronBatch')], limit=1)
+records.write({'name': 'TestCronBatchDone'})
+env['ir.cron']._notify_progress(done=len(records), remaining=model.search_count([('name', '=', 'TestCronBatch')]))
+"""
+        self._process_cron(self.cron)
+
+        self.assertEqual(set(partners.mapped('name')), {'TestCronBatchDone'})
+        self.assertEqual(self.cron.progress_done, 3)
+        self.assertEqual(self.cron.progress_remaining, 0)
+        self.assertEqual(len(self.env['ir.cron.run'].search([('cron_id', '=', self.cron.id)])), 1)
@@ -11,33 +11,61 @@ from dateutil.relativedelta import relativedelta
 import ast
 import timeit
 import logging
+from collections import defaultdict
 
 from odoo.osv.expression import get_unaccent_wrapper
 
 _logger = logging.getLogger(__name__)
 
+# The records written by the transactions still running during a scan are only
+# visible once committed, but with an older write_date: the date of the scan
+# from which the next incremental scan starts is set back by this delay so that
+# they are not missed.
+SCAN_SYNC_MARGIN = relativedelta(minutes=5)
+
 # Merge list of list based on their common element
 #   Input: [['a', 'b'], ['b', 'c'], ['d', 'e']]
-#   Output: [['a', 'b', 'c'], ['d', 'e']]
-# https://stackoverflow.com/a/9112588
+#   Output: [{'a', 'b', 'c'}, {'d', 'e'}]
+# The lists are merged with a disjoint-set forest (union-find), in quasi-linear time.
 def merge_common_lists(lsts):
-    sets = [set(lst) for lst in lsts if lst]
-    merged = True
-    while merged:
-        merged = False
-        results = []
-        while sets:
-            common, rest = sets[0], sets[1:]
-            sets = []
-            for x in rest:
-                if x.isdisjoint(common):
-                    sets.append(x)
-                else:
-                    merged = True
-                    common |= x
-            results.append(common)
-        sets = results
-    return sets
+    parent = {}
+    size = {}
+
+    def find(x):
+        root = x
+        while parent[root] != root:
+            root = parent[root]
+        # path compression
+        while parent[x] != root:
+            parent[x], x = root, parent[x]
+        return root
+
+    def union(x, y):
+        x, y = find(x), find(y)
+        if x == y:
+            return x
+        # union by size
+        if size[x] < size[y]:
+            x, y = y, x
+        parent[y] = x
+        size[x] += size[y]
+        return x
+
+    for lst in lsts:
+        if not lst:
+            continue
+        for x in lst:
+            if x not in parent:
+                parent[x] = x
+                size[x] = 1
+        root = lst[0]
+        for x in lst[1:]:
+            root = union(root, x)
+
+    sets = defaultdict(set)
+    for x in parent:
+        sets[find(x)].add(x)
+    return list(sets.values())
 
 
 class DataMergeModel(models.Model):
@@ -148,14 +176,17 @@ class DataMergeModel(models.Model):
         """
         Identify duplicate records for each active model and either notify the users or automatically merge the duplicates
         """
-        self.env['data_merge.model'].sudo().search([]).find_duplicates(batch_commits=True)
+        self.env['data_merge.rule'].sudo().search([('match_mode', '=', 'similarity')])._create_trigram_index()
+        self.env['data_merge.model'].sudo().search([]).find_duplicates(batch_commits=True, incremental=True)
         self._notify_new_duplicates()
 
-    def find_duplicates(self, batch_commits=False):
+    def find_duplicates(self, batch_commits=False, incremental=False):
         """
         Search for duplicate records and create the data_merge.group along with its data_merge.record
 
         :param bool batch_commits: If set, will automatically commit every X records
+        :param bool incremental: If set, only look for the duplicates of the records written since the last
+            scan of the rules (and of the records matching them), instead of scanning all the records
         """
 
         # YTI CLEAN: Use add_join from the Query object maybe ?
@@ -163,12 +194,12 @@ class DataMergeModel(models.Model):
             join, join_data = '', ()
 
             # Related non-stored field
-            if rule.field_id.related and not rule.field_id.store:
+            if field_id.related and not field_id.store:
                 IrField = self.env['ir.model.fields']._get(res_model_name, field_id.related.split('.')[0])
                 rel_table = IrField.relation.replace('.', '_')
                 join_data = (rel_table, IrField.relation_field, table, env[IrField.relation]._rec_name)
             # Many2one
-            elif rule.field_id.relation:
+            elif field_id.relation:
                 rel_table = field_id.relation.replace('.', '_')
                 join_data = (table, field_id.name, rel_table, env[field_id.relation]._rec_name)
 
@@ -181,59 +212,129 @@ class DataMergeModel(models.Model):
 
             return (field_name, join)
 
-        unaccent = get_unaccent_wrapper(self.env.cr)
-        self.flush()
-        for dm_model in self:
-            t1 = timeit.default_timer()
-            ids = []
-            for rule in dm_model.rule_ids:
-                table = self.env[dm_model.res_model_name]._table
-
-                field_name, join = field_join(rule.field_id, table, dm_model.res_model_name, self.env)
-
-                if rule.match_mode == 'accent':
-                    field_name = unaccent(field_name)
-
-                domain = ast.literal_eval(dm_model.domain or '[]')
-                tables, where_clause, where_clause_params = self.env[dm_model.res_model_name]._where_calc(domain).get_sql()
-                where_clause = where_clause and ('AND %s' % where_clause) or ''
-
-                group_by = ''
-                if 'company_id' in self.env[dm_model.res_model_name]._fields and not dm_model.mix_by_company:
-                    group_by = ', %s.company_id' % table
-
-                # Get all the rows matching the rule defined
-                # (e.g. exact match of the name) having at least 2 records
-                # Each row contains the matched value and an array of matching records:
-                #   | value matched | {array of record IDs matching the field}
-                query = """
-                    SELECT
-                        %(field)s as group_field_name,
-                        array_agg(
-                            %(model_table)s.id order by %(model_table)s.id asc
-                        )
+        def find_rows(dm_model, rule, condition=None, condition_params=()):
+            """ Return the arrays of record IDs matching the rule. If a condition on the records is given,
+            only the values of the records satisfying it are considered. """
+            if rule.match_mode == 'similarity':
+                return dm_model._find_similar_rows(rule, condition, condition_params)
+
+            table = self.env[dm_model.res_model_name]._table
+
+            field_name, join = field_join(rule.field_id, table, dm_model.res_model_name, self.env)
+
+            if rule.match_mode == 'accent':
+                field_name = unaccent(field_name)
+
+            domain = ast.literal_eval(dm_model.domain or '[]')
+            tables, where_clause, where_clause_params = self.env[dm_model.res_model_name]._where_calc(domain).get_sql()
+            where_clause = where_clause and ('AND %s' % where_clause) or ''
+
+            group_by = ''
+            if 'company_id' in self.env[dm_model.res_model_name]._fields and not dm_model.mix_by_company:
+                group_by = ', %s.company_id' % table
+
+            condition_clause = ''
+            params = list(where_clause_params)
+            if condition:
+                condition_clause = """AND %(field)s IN (
+                    SELECT %(field)s
                     FROM %(tables)s
                         %(join)s
-                        WHERE length(%(field)s) > 0 %(where_clause)s
-                    GROUP BY group_field_name %(group_by)s
-                        HAVING COUNT(%(field)s) > 1""" % {
+                        WHERE %(condition)s %(where_clause)s)""" % {
                             'field': field_name,
-                            'model_table': table,
                             'tables': tables,
                             'join': join,
+                            'condition': condition,
                             'where_clause': where_clause,
-                            'group_by': group_by,
                         }
+                params += list(condition_params) + list(where_clause_params)
+
+            # Get all the rows matching the rule defined
+            # (e.g. exact match of the name) having at least 2 records
+            # Each row contains the matched value and an array of matching records:
+            #   | value matched | {array of record IDs matching the field}
+            query = """
+                SELECT
+                    %(field)s as group_field_name,
+                    array_agg(
+                        %(model_table)s.id order by %(model_table)s.id asc
+                    )
+                FROM %(tables)s
+                    %(join)s
+                    WHERE length(%(field)s) > 0 %(where_clause)s %(condition_clause)s
+                GROUP BY group_field_name %(group_by)s
+                    HAVING COUNT(%(field)s) > 1""" % {
+                        'field': field_name,
+                        'model_table': table,
+                        'tables': tables,
+                        'join': join,
+                        'where_clause': where_clause,
+                        'condition_clause': condition_clause,
+                        'group_by': group_by,
+                    }
+
+            try:
+                self._cr.execute(query, params)
+            except ProgrammingError:
+                # YTI TODO: Explain why this is valid to suppose that the extentions
+                # are missing
+                raise UserError('Missing required PostgreSQL extension: unaccent')
+
+            return [row[1] for row in self._cr.fetchall()]
 
-                try:
-                    self._cr.execute(query, where_clause_params)
-                except ProgrammingError:
-                    # YTI TODO: Explain why this is valid to suppose that the extentions
-                    # are missing
-                    raise UserError('Missing required PostgreSQL extension: unaccent')
+        unaccent = get_unaccent_wrapper(self.env.cr)
+        self.flush()
+        for dm_model in self:
+            t1 = timeit.default_timer()
+            scan_datetime = fields.Datetime.now() - SCAN_SYNC_MARGIN
+            table = self.env[dm_model.res_model_name]._table
+            rules = dm_model.rule_ids
 
-                rows = self._cr.fetchall()
-                ids = ids + [row[1] for row in rows]
+            # The incremental scan starts from the records written since the oldest scan of the rules,
+            # a rule that has never been applied requiring a full scan.
+            last_scan_datetime = incremental and self.env[dm_model.res_model_name]._log_access \
+                and rules and all(rules.mapped('last_scan_datetime')) and min(rules.mapped('last_scan_datetime'))
+
+            ids = []
+            # the successive scans of an incremental scan may find the same rows again
+            found_rows = set()
+            rule_durations = defaultdict(float)
+            rule_matches = defaultdict(set)
+
+            def scan(condition=None, condition_params=()):
+                new_ids = set()
+                for rule in rules:
+                    t = timeit.default_timer()
+                    rows = find_rows(dm_model, rule, condition, condition_params)
+                    rule_durations[rule] += timeit.default_timer() - t
+                    for row in rows:
+                        rule_matches[rule].update(row)
+                        new_ids.update(row)
+                        if tuple(row) not in found_rows:
+                            found_rows.add(tuple(row))
+                            ids.append(row)
+                return new_ids
+
+            if last_scan_datetime:
+                # The duplicates of the written records may themselves match other records, through the
+                # other rules: scan again from the newly matched records until no new record is found.
+                frontier = scan('%s.write_date >= %%s' % table, [last_scan_datetime])
+                scanned_ids = set()
+                while frontier:
+                    scanned_ids |= frontier
+                    frontier = scan('%s.id IN %%s' % table, [tuple(frontier)]) - scanned_ids
+            else:
+                scan()
+
+            for rule in rules:
+                _logger.info('Rule %s (%s): %s records matched in %.2fs (%s scan)',
+                             rule.id, rule.field_id.name, len(rule_matches[rule]), rule_durations[rule],
+                             'incremental' if last_scan_datetime else 'full')
+                rule.write({
+                    'last_scan_datetime': scan_datetime,
+                    'last_scan_duration': rule_durations[rule],
+                    'last_scan_match_count': len(rule_matches[rule]),
+                })
 
             # Fetches the IDs of all the records who already matched (and are not merged),
             # as well as the discarded ones.
@@ -244,7 +345,12 @@ class DataMergeModel(models.Model):
                 FROM data_merge_record
                 WHERE model_id = %s
                 GROUP BY group_id""", [dm_model.id])
-            done_groups_res_ids = [set(x[0]) for x in self._cr.fetchall()]
+            # Index the existing groups by res_id: a group containing another one contains any of its records
+            done_groups_res_ids = defaultdict(list)
+            for res_ids in self._cr.fetchall():
+                done_group = frozenset(res_ids[0])
+                for res_id in done_group:
+                    done_groups_res_ids[res_id].append(done_group)
 
             _logger.info('Query identification done after %s' % str(timeit.default_timer() - t1))
             t1 = timeit.default_timer()
@@ -268,7 +374,7 @@ class DataMergeModel(models.Model):
                 #   The group with records A B C already exists:
                 #       1/ If group_to_create equals A B, do not create a new group
                 #       2/ If group_to_create equals A D, create the new group (A D is not a subset of A B C)
-                if any(group_to_create <= x for x in done_groups_res_ids):
+                if any(group_to_create <= x for x in done_groups_res_ids[next(iter(group_to_create))]):
                     continue
 
                 group = self.env['data_merge.group'].with_context(prefetch_fields=False).create({'model_id': dm_model.id})
@@ -291,6 +397,64 @@ class DataMergeModel(models.Model):
 
             _logger.info('Record creation done after %s' % str(timeit.default_timer() - t1))
 
+    def _find_similar_rows(self, rule, condition=None, condition_params=()):
+        """
+        Return the arrays of IDs of the records having a similar value for the field of the rule,
+        according to the trigram similarity of pg_trgm.
+
+        Each record is only compared to the records sharing enough trigrams with it, found with the
+        trigram index of the field once the scheduled deduplication has built it (see
+        data_merge.rule._create_trigram_index), and with the records
+        of its company unless the model mixes the companies. If a condition on the records is given,
+        only the records satisfying it are compared to the others.
+        """
+        self.ensure_one()
+        Model = self.env[self.res_model_name]
+        table = Model._table
+
+        domain = ast.literal_eval(self.domain or '[]')
+        tables, where_clause, where_clause_params = Model._where_calc(domain).get_sql()
+        where_clause = where_clause and ('AND %s' % where_clause) or ''
+
+        company_select = same_company = ''
+        if 'company_id' in Model._fields and not self.mix_by_company:
+            company_select = ', %s.company_id' % table
+            same_company = 'AND other.company_id IS NOT DISTINCT FROM candidate.company_id'
+
+        # the similarity operator uses the threshold of the transaction
+        self._cr.execute("SELECT set_config('pg_trgm.similarity_threshold', %s, true)",
+                         [str(rule.similarity_threshold / 100.0)])
+        query = """
+            WITH eligible AS (
+                SELECT %(model_table)s.id
+                FROM %(tables)s
+                WHERE length(%(field)s) > 0 %(where_clause)s
+            ), candidate AS (
+                SELECT %(model_table)s.id, %(field)s AS value %(company_select)s
+                FROM %(tables)s
+                WHERE length(%(field)s) > 0 %(where_clause)s %(condition_clause)s
+            )
+            SELECT candidate.id, array_agg(other.id ORDER BY other.id ASC)
+            FROM candidate
+                JOIN %(model_table)s other ON other."%(column)s" %(similar)s candidate.value
+                WHERE other.id != candidate.id
+                AND other.id IN (SELECT id FROM eligible)
+                %(same_company)s
+            GROUP BY candidate.id""" % {
+                'model_table': table,
+                'tables': tables,
+                'field': '%s."%s"' % (table, rule.field_id.name),
+                'column': rule.field_id.name,
+                'where_clause': where_clause,
+                'condition_clause': condition and ('AND %s' % condition) or '',
+                'company_select': company_select,
+                'same_company': same_company,
+                'similar': '%%',  # the % operator of pg_trgm, escaped for the query parameters
+            }
+        self._cr.execute(query, list(where_clause_params) + list(where_clause_params) + list(condition_params))
+        # a similar pair is found from both of its records: the rows are sorted to be the same
+        return [sorted([record_id] + other_ids) for record_id, other_ids in self._cr.fetchall()]
+
     ##############
     ### Overrides
     ##############
@@ -304,6 +468,9 @@ class DataMergeModel(models.Model):
     def write(self, vals):
         if 'active' in vals and not vals['active']:
             self.env['data_merge.group'].search([('model_id', 'in', self.ids)]).unlink()
+        if any(field in vals for field in ('res_model_id', 'domain', 'mix_by_company', 'active')):
+            # The records to deduplicate changed: the next scan can't be incremental
+            self.rule_ids.write({'last_scan_datetime': False})
 
         return super(DataMergeModel, self).write(vals)
 
@@ -1,7 +1,15 @@
 # -*- coding: utf-8 -*-
 # Part of Odoo. See LICENSE file for full copyright and licensing details.
 
-from odoo import _, models, fields, api
+import logging
+
+import psycopg2
+
+from odoo import _, models, fields, api, tools
+from odoo.exceptions import ValidationError
+
+_logger = logging.getLogger(__name__)
+
 
 class DataMergeRule(models.Model):
     _name = 'data_merge.rule'
@@ -16,10 +24,20 @@ class DataMergeRule(models.Model):
     match_mode = fields.Selection(
         lambda self: self._available_match_modes(),
         default='exact', string='Merge If', required=True)
+    similarity_threshold = fields.Integer(string='Similarity Threshold', default=80,
+        help='Minimum similarity percentage of the values (similarity match only). The values are indexed '
+             'by the next scheduled deduplication.')
     sequence = fields.Integer(string='Sequence', default=1)
 
+    ### Statistics of the last scan
+    last_scan_datetime = fields.Datetime('Last Scan', readonly=True, copy=False,
+        help='Only the records written since the last scan are considered by the scheduled deduplication')
+    last_scan_duration = fields.Float('Last Scan Duration (s)', readonly=True, copy=False)
+    last_scan_match_count = fields.Integer('Last Scan Matched Records', readonly=True, copy=False)
+
     _sql_constraints = [
         ('uniq_model_id_field_id', 'unique(model_id, field_id)', 'A field can only appear once!'),
+        ('check_similarity_threshold', 'CHECK(similarity_threshold > 0 AND similarity_threshold <= 100)', 'The similarity threshold should be between 1 and 100'),
     ]
 
     def _available_match_modes(self):
@@ -27,4 +45,46 @@ class DataMergeRule(models.Model):
         # can't conditionally set demo data...
         if self.env.context.get('install_mode') or self.env.registry.has_unaccent:
             modes.append(('accent', _("Case/Accent Insensitive Match")))
+        if self.env.context.get('install_mode') or self._has_trigram():
+            modes.append(('similarity', _("Similarity Match")))
         return modes
+
+    @tools.ormcache()
+    def _has_trigram(self):
+        self.env.cr.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        return bool(self.env.cr.fetchone())
+
+    @api.constrains('match_mode', 'field_id')
+    def _check_similarity_field(self):
+        for rule in self:
+            if rule.match_mode == 'similarity' and (
+                    rule.field_id.ttype not in ('char', 'text') or rule.field_id.related or not rule.field_id.store):
+                raise ValidationError(_('The similarity match is only available for the text fields of the model.'))
+
+    def _create_trigram_index(self):
+        """ Index the fields of the similarity rules with their trigrams, so that the similar values can be
+        found without comparing all the records with each other. The index is built concurrently, outside of
+        the current transaction, so that the writes on the table are not blocked while it is built, which may
+        take a while on large tables: it is done by the scheduled deduplication rather than when the rules are
+        saved. """
+        for rule in self.filtered(lambda r: r.match_mode == 'similarity'):
+            table = self.env[rule.res_model_id.model]._table
+            index_name = ('%s_%s_trgm_idx' % (table, rule.field_id.name))[:63]
+            if tools.index_exists(self.env.cr, index_name):
+                continue
+            with self.env.registry.cursor() as cr:
+                # CREATE INDEX CONCURRENTLY can't run inside a transaction
+                cr.autocommit(True)
+                try:
+                    cr.execute('CREATE INDEX CONCURRENTLY "%s" ON "%s" USING gin ("%s" gin_trgm_ops)' % (
+                        index_name, table, rule.field_id.name))
+                except psycopg2.Error:
+                    _logger.exception("Failed to create the trigram index %s", index_name)
+                    # a failed concurrent build leaves an invalid index behind
+                    cr.execute('DROP INDEX CONCURRENTLY IF EXISTS "%s"' % index_name)
+
+    def write(self, vals):
+        if 'field_id' in vals or 'match_mode' in vals:
+            # The rule matches other records: the next scan can't be incremental
+            vals['last_scan_datetime'] = False
+        return super(DataMergeRule, self).write(vals)
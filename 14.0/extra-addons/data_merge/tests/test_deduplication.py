@@ -1,6 +1,13 @@
 # -*- coding: utf-8 -*-
 # Part of Odoo. See LICENSE file for full copyright and licensing details.
 
+import unittest
+from datetime import timedelta
+
+from odoo import fields
+from odoo.exceptions import ValidationError
+from odoo.addons.data_merge.models.data_merge_model import merge_common_lists
+
 from . import test_common
 
 class TestDeduplication(test_common.TestCommon):
@@ -76,6 +83,108 @@ class TestDeduplication(test_common.TestCommon):
         self.assertEqual(self.MyModel.records_to_merge_count, 7, '7 records should have been found')
         self.assertEqual(self.DMGroup.search_count([('model_id', '=', self.MyModel.id)]), 2, '2 groups should have been created')
 
+    def test_merge_common_lists(self):
+        groups = merge_common_lists([[1, 2], [3, 4], [], [5, 6], [2, 3], [7], [6, 5]])
+        self.assertEqual(sorted(sorted(group) for group in groups), [[1, 2, 3, 4], [5, 6], [7]])
+
+    def test_deduplication_incremental(self):
+        self._create_rule('x_name', 'exact')
+        self._create_rule('x_email', 'exact')
+
+        self._create_record('x_dm_test_model', x_name='toto', x_email='toto@example.com')
+        self._create_record('x_dm_test_model', x_name='toto', x_email='real_toto@example.com')
+        self._create_record('x_dm_test_model', x_name='bob', x_email='bob@example.com')
+        self._create_record('x_dm_test_model', x_name='titi', x_email='bob@example.com')
+        self.MyModel.find_duplicates(incremental=True)
+        self.MyModel._compute_records_to_merge_count()
+
+        self.assertEqual(self.MyModel.records_to_merge_count, 4, 'The first scan should consider all the records')
+        self.assertEqual(self.MyModel.rule_ids.mapped('last_scan_match_count'), [2, 2])
+
+        # the records were written before the last scan
+        self.DMGroup.search([('model_id', '=', self.MyModel.id)]).unlink()
+        self.env['x_dm_test_model'].flush()
+        self.env.cr.execute("UPDATE x_dm_test_model SET write_date = (now() at time zone 'UTC') - interval '2 hours'")
+        self.MyModel.rule_ids.write({'last_scan_datetime': fields.Datetime.now() - timedelta(hours=1)})
+        self.MyModel.find_duplicates(incremental=True)
+        self.MyModel._compute_records_to_merge_count()
+
+        self.assertEqual(self.MyModel.records_to_merge_count, 0, 'No record was written since the last scan')
+
+        # the new record matches a record of each group, which are grouped with their own duplicates
+        self._create_record('x_dm_test_model', x_name='titi', x_email='real_toto@example.com')
+        self.MyModel.rule_ids.write({'last_scan_datetime': fields.Datetime.now() - timedelta(hours=1)})
+        self.MyModel.find_duplicates(incremental=True)
+        self.MyModel._compute_records_to_merge_count()
+
+        self.assertEqual(self.MyModel.records_to_merge_count, 5, '5 records should have been found')
+        self.assertEqual(self.DMGroup.search_count([('model_id', '=', self.MyModel.id)]), 1, '1 group should have been created')
+
+    def test_deduplication_incremental_no_merge_lists(self):
+        self.env['ir.config_parameter'].set_param('data_merge.merge_lists', 'False')
+        self._create_rule('x_name', 'exact')
+
+        self._create_record('x_dm_test_model', x_name='toto')
+        self._create_record('x_dm_test_model', x_name='toto')
+        self.MyModel.rule_ids.write({'last_scan_datetime': fields.Datetime.now() - timedelta(hours=1)})
+        self.MyModel.find_duplicates(incremental=True)
+
+        self.assertEqual(self.DMGroup.search_count([('model_id', '=', self.MyModel.id)]), 1,
+                         'The rows found again from the matched records should not create another group')
+        self.assertLess(self.MyModel.rule_ids.last_scan_datetime, fields.Datetime.now(),
+                        'The next incremental scan should start before this one')
+
+    def test_similarity_field(self):
+        if not self.DMRule._has_trigram():
+            raise unittest.SkipTest("Similarity rules require the pg_trgm extension")
+        with self.assertRaises(ValidationError):
+            self.DMRule.create({
+                'model_id': self.MyModel.id,
+                'field_id': self.env['ir.model.fields']._get('x_dm_test_model', 'display_name').id,
+                'match_mode': 'similarity',
+            })
+
+    def test_deduplication_similarity(self):
+        if not self.DMRule._has_trigram():
+            raise unittest.SkipTest("Similarity rules require the pg_trgm extension")
+        self.DMRule.create({
+            'model_id': self.MyModel.id,
+            'field_id': self.env['ir.model.fields']._get('x_dm_test_model', 'x_name').id,
+            'match_mode': 'similarity',
+            'similarity_threshold': 80,
+        })
+
+        self._create_record('x_dm_test_model', x_name='ACME Inc')
+        self._create_record('x_dm_test_model', x_name='Globex Corporation')
+        self.MyModel.find_duplicates()
+        self.MyModel._compute_records_to_merge_count()
+
+        self.assertEqual(self.MyModel.records_to_merge_count, 0, '0 record should have been found')
+
+        self._create_record('x_dm_test_model', x_name='ACME, Inc.')
+        self.MyModel.find_duplicates()
+        self.MyModel._compute_records_to_merge_count()
+
+        self.assertEqual(self.MyModel.records_to_merge_count, 2, '2 records should have been found')
+
+    def test_deduplication_similarity_no_merge_lists(self):
+        if not self.DMRule._has_trigram():
+            raise unittest.SkipTest("Similarity rules require the pg_trgm extension")
+        self.env['ir.config_parameter'].set_param('data_merge.merge_lists', 'False')
+        self.DMRule.create({
+            'model_id': self.MyModel.id,
+            'field_id': self.env['ir.model.fields']._get('x_dm_test_model', 'x_name').id,
+            'match_mode': 'similarity',
+            'similarity_threshold': 80,
+        })
+
+        self._create_record('x_dm_test_model', x_name='ACME Inc')
+        self._create_record('x_dm_test_model', x_name='ACME, Inc.')
+        self.MyModel.find_duplicates()
+
+        self.assertEqual(self.DMGroup.search_count([('model_id', '=', self.MyModel.id)]), 1,
+                         'A similar pair should only create one group')
+
     def test_record_references(self):
         self._create_rule('x_name', 'exact')
 
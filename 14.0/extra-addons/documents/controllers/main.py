@@ -5,6 +5,7 @@ import zipfile
 import io
 import json
 import logging
+import mimetypes
 import os
 from contextlib import ExitStack
 
@@ -17,6 +18,30 @@ from odoo.addons.web.controllers.main import Binary
 
 logger = logging.getLogger(__name__)
 
+# size of the chunks read from the filestore when streaming a zip
+ZIP_CHUNK_SIZE = 64 * 1024
+
+
+class _ZipStream(object):
+    """ Unseekable file object in which a zip is written while it is streamed:
+    the bytes written since the last call to ``pop`` are returned by it.
+    """
+
+    def __init__(self):
+        self._buffer = io.BytesIO()
+
+    def write(self, data):
+        return self._buffer.write(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
+
 
 class ShareRoute(http.Controller):
 
@@ -73,35 +98,82 @@ class ShareRoute(http.Controller):
 
         return response
 
+    def _get_zip_entries(self, documents):
+        """ Return the files to write in the zip of the given documents, as a
+        list of ``(filename, path, content, size)`` where ``path`` is the
+        location of the file in the filestore, or ``content`` its raw bytes
+        when it is stored in the database.
+
+        Everything that needs the database is read here, as the zip is only
+        written once the response is sent, after the cursor of the request is
+        closed.
+        """
+        entries = []
+        for document in documents:
+            if document.type != 'binary' or not document.attachment_id:
+                continue
+            attachment = document.attachment_id.sudo()
+            filename = document.name
+            default_filename = not filename
+            if default_filename:
+                filename = "%s-%s-%s" % (document._name, document.id, 'datas')
+            if not os.path.splitext(filename)[1] or default_filename:
+                extension = mimetypes.guess_extension(attachment.mimetype or 'application/octet-stream')
+                if extension:
+                    filename += extension
+            if attachment.store_fname:
+                entries.append((filename, attachment._full_path(attachment.store_fname), None, attachment.file_size))
+            else:
+                entries.append((filename, None, attachment.raw or b'', attachment.file_size))
+        return entries
+
+    def _generate_zip(self, entries):
+        """ Write the zip of the given entries (see ``_get_zip_entries``) and
+        yield its bytes as they are produced. The files of the filestore are
+        read by chunks, so that the memory used does not depend on their size.
+        """
+        stream = _ZipStream()
+        try:
+            with zipfile.ZipFile(stream, 'w', compression=zipfile.ZIP_DEFLATED) as doc_zip:
+                for filename, path, content, size in entries:
+                    # deflate may slightly grow incompressible files
+                    force_zip64 = (size or 0) * 1.01 + 1024 > zipfile.ZIP64_LIMIT
+                    with doc_zip.open(filename, 'w', force_zip64=force_zip64) as entry:
+                        if path is None:
+                            entry.write(content)
+                        else:
+                            try:
+                                with open(path, 'rb') as f:
+                                    for chunk in iter(lambda: f.read(ZIP_CHUNK_SIZE), b''):
+                                        entry.write(chunk)
+                                        yield stream.pop()
+                            except (IOError, OSError):
+                                logger.info("_generate_zip reading %s", path, exc_info=True)
+                    yield stream.pop()
+        except zipfile.BadZipfile:
+            logger.exception("BadZipfile exception")
+        yield stream.pop()
+
     def _make_zip(self, name, documents):
         """returns zip files for the Document Inspector and the portal.
 
+        The zip is streamed: its entries are written while the response is
+        sent, without building the whole archive in memory.
+
         :param name: the name to give to the zip file.
         :param documents: files (documents.document) to be zipped.
         :return: a http response to download a zip file.
         """
-        stream = io.BytesIO()
-        try:
-            with zipfile.ZipFile(stream, 'w') as doc_zip:
-                for document in documents:
-                    if document.type != 'binary':
-                        continue
-                    status, content, filename, mimetype, filehash = request.env['ir.http']._binary_record_content(
-                        document, field='datas', filename=None, filename_field='name',
-                        default_mimetype='application/octet-stream')
-                    doc_zip.writestr(filename, base64.b64decode(content),
-                                     compress_type=zipfile.ZIP_DEFLATED)
-        except zipfile.BadZipfile:
-            logger.exception("BadZipfile exception")
-
-        content = stream.getvalue()
+        entries = self._get_zip_entries(documents)
         headers = [
             ('Content-Type', 'zip'),
             ('X-Content-Type-Options', 'nosniff'),
-            ('Content-Length', len(content)),
             ('Content-Disposition', content_disposition(name))
         ]
-        return request.make_response(content, headers)
+        response = request.make_response(self._generate_zip(entries), headers)
+        # let the WSGI server send the chunks as they are yielded
+        response.direct_passthrough = True
+        return response
 
     # Download & upload routes #####################################################################
 
@@ -1,6 +1,9 @@
 # -*- coding: utf-8 -*-
 from odoo.tests.common import TransactionCase, new_test_user
+from odoo.addons.documents.controllers.main import ShareRoute
 import base64
+import io
+import zipfile
 
 GIF = b"R0lGODdhAQABAIAAAP///////ywAAAAAAQABAAACAkQBADs="
 TEXT = base64.b64encode(bytes("TEST", 'utf-8'))
@@ -435,3 +438,20 @@ class TestCaseDocuments(TransactionCase):
         self.assertEqual(attachment_document.owner_id.id, self.doc_user.id, 'Should assign owner from share')
         self.assertEqual(attachment_document.partner_id.id, partner.id, 'Should assign partner from share')
         self.assertEqual(attachment_document.tag_ids.ids, [self.tag_b.id], 'Should assign tags from share')
+
+    def test_generate_zip(self):
+        document_url = self.env['documents.document'].create({
+            'type': 'url',
+            'url': 'https://www.odoo.com',
+            'folder_id': self.folder_b.id,
+        })
+        documents = self.document_gif | self.document_txt | document_url
+        controller = ShareRoute()
+        entries = controller._get_zip_entries(documents)
+        self.assertEqual([entry[0] for entry in entries], ['file.gif', 'file.txt'],
+                         "only the binary documents should be zipped")
+        content = b''.join(controller._generate_zip(entries))
+        with zipfile.ZipFile(io.BytesIO(content)) as doc_zip:
+            self.assertIsNone(doc_zip.testzip())
+            self.assertEqual(doc_zip.read('file.gif'), base64.b64decode(GIF))
+            self.assertEqual(doc_zip.read('file.txt'), base64.b64decode(TEXT))
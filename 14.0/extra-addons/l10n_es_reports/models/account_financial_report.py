@@ -84,8 +84,9 @@ This feature is only supported/useful in spanish MOD347 report.""")
             options_list = self._get_options_with_threshold(options_list)
         return super()._compute_amls_results(options_list, sign=sign)
 
-    def _compute_sum(self, options_list):
+    def _get_options_list_sum(self, options_list):
         # OVERRIDE to filter out lines that are under the threshold given by the 'l10n_es_mod347_threshold' field.
+        options_list = super()._get_options_list_sum(options_list)
         if self.l10n_es_mod347_threshold:
             options_list = self._get_options_with_threshold(options_list)
-        return super()._compute_sum(options_list)
+        return options_list
@@ -319,16 +319,14 @@ class MarketingActivity(models.Model):
         traces = self.env['marketing.trace'].search(trace_domain)
 
         # organize traces by activity
-        trace_to_activities = dict()
+        trace_ids_by_activity = dict()
         for trace in traces:
-            if trace.activity_id not in trace_to_activities:
-                trace_to_activities[trace.activity_id] = trace
-            else:
-                trace_to_activities[trace.activity_id] |= trace
+            trace_ids_by_activity.setdefault(trace.activity_id, []).append(trace.id)
 
         # execute activity on their traces
         BATCH_SIZE = 500  # same batch size as the MailComposer
-        for activity, traces in trace_to_activities.items():
+        for activity, trace_ids in trace_ids_by_activity.items():
+            traces = self.env['marketing.trace'].browse(trace_ids)
             for traces_batch in (traces[i:i + BATCH_SIZE] for i in range(0, len(traces), BATCH_SIZE)):
                 activity.execute_on_traces(traces_batch)
                 if auto_commit:
@@ -354,9 +352,11 @@ class MarketingActivity(models.Model):
         if self.domain:
             rec_domain = expression.AND([literal_eval(self.campaign_id.domain), literal_eval(self.domain)])
         else:
-            rec_domain = literal_eval(self.campaign_id.filter)
+            rec_domain = literal_eval(self.campaign_id.domain)
         if rec_domain:
-            rec_valid = self.env[self.model_name].search(rec_domain)
+            # only search among the records of the traces, not the whole campaign
+            rec_valid = self.env[self.model_name].search(
+                expression.AND([rec_domain, [('id', 'in', list(set(traces.mapped('res_id'))))]]))
             rec_ids_domain = set(rec_valid.ids)
 
             traces_allowed = traces.filtered(lambda trace: trace.res_id in rec_ids_domain or trace.is_test)
@@ -467,7 +467,7 @@ class MarketingActivity(models.Model):
     def _generate_children_traces(self, traces):
         """Generate child traces for child activities and compute their schedule date except for mail_open,
         mail_click, mail_reply, mail_bounce which are computed when processing the mail event """
-        child_traces = self.env['marketing.trace']
+        child_traces_values = []
         for activity in self.child_ids:
             activity_offset = relativedelta(**{activity.interval_type: activity.interval_number})
 
@@ -479,9 +479,9 @@ class MarketingActivity(models.Model):
                 }
                 if activity.trigger_type in ['activity', 'mail_not_open', 'mail_not_click', 'mail_not_reply']:
                     vals['schedule_date'] = Datetime.from_string(trace.schedule_date) + activity_offset
-                child_traces |= child_traces.create(vals)
+                child_traces_values.append(vals)
 
-        return child_traces
+        return self.env['marketing.trace'].create(child_traces_values)
 
     def action_view_sent(self):
         return self._action_view_documents_filtered('sent')
@@ -243,69 +243,145 @@ class MarketingCampaign(models.Model):
     def sync_participants(self):
         """ Creates new participants, taking into account already-existing ones
         as well as campaign filter and unique field. """
-        def _uniquify_list(seq):
-            seen = set()
-            return [x for x in seq if x not in seen and not seen.add(x)]
-
         participants = self.env['marketing.participant']
         # auto-commit except in testing mode
         auto_commit = not getattr(threading.currentThread(), 'testing', False)
+        BATCH_SIZE = 1000
         for campaign in self.filtered(lambda c: c.marketing_activity_ids):
             now = Datetime.now()
             if not campaign.last_sync_date:
                 campaign.last_sync_date = now
 
-            RecordModel = self.env[campaign.model_name]
-
-            # Fetch existing participants
-            participants_data = participants.search_read([('campaign_id', '=', campaign.id)], ['res_id'])
-            existing_rec_ids = _uniquify_list([live_participant['res_id'] for live_participant in participants_data])
-
-            record_domain = literal_eval(campaign.domain or "[]")
-            db_rec_ids = _uniquify_list(RecordModel.search(record_domain).ids)
-            to_create = [rid for rid in db_rec_ids if rid not in existing_rec_ids]  # keep ordered IDs
-            to_remove = set(existing_rec_ids) - set(db_rec_ids)
-            if campaign.unique_field_id and campaign.unique_field_id.name != 'id':
-                without_duplicates = []
-                existing_records = RecordModel.with_context(prefetch_fields=False).browse(existing_rec_ids).exists()
-                # Split the read in batch of 1000 to avoid the prefetch
-                # crawling the cache for the next 1000 records to fetch
-                unique_field_vals = {rec[campaign.unique_field_id.name]
-                                        for index in range(0, len(existing_records), 1000)
-                                        for rec in existing_records[index:index+1000]}
-
-                for rec in RecordModel.with_context(prefetch_fields=False).browse(to_create):
-                    field_val = rec[campaign.unique_field_id.name]
-                    # we exclude the empty recordset with the first condition
-                    if (not campaign.unique_field_id.relation or field_val) and field_val not in unique_field_vals:
-                        without_duplicates.append(rec.id)
-                        unique_field_vals.add(field_val)
-                to_create = without_duplicates
-
-            BATCH_SIZE = 100
-            for index, rec_id in enumerate(to_create, start=1):
-                participants |= participants.create({
+            self.env['marketing.participant'].flush(['campaign_id', 'res_id', 'state'])
+            to_create, to_remove = campaign._get_participants_diff()
+
+            for index in range(0, len(to_create), BATCH_SIZE):
+                participants |= participants.create([{
                     'campaign_id': campaign.id,
                     'res_id': rec_id,
-                })
-                if not index % BATCH_SIZE and auto_commit:
+                } for rec_id in to_create[index:index + BATCH_SIZE]])
+                if auto_commit:
                     self.env.cr.commit()
 
-            if to_remove:
-                participants_to_unlink = participants.search([
-                    ('res_id', 'in', list(to_remove)),
-                    ('campaign_id', '=', campaign.id),
-                    ('state', '!=', 'unlinked'),
-                ])
-                for index in range(0, len(participants_to_unlink), 1000):
-                    participants_to_unlink[index:index+1000].action_set_unlink()
-                    # Commit only every 100 operation to avoid committing to often
-                    # this mean every 10k record. It should be ok, it takes 1sec second to process 10k
-                    if not index % (BATCH_SIZE * 100):
-                        self.env.cr.commit()
+            participants_to_unlink = participants.browse(to_remove)
+            for index in range(0, len(participants_to_unlink), BATCH_SIZE):
+                participants_to_unlink[index:index + BATCH_SIZE].action_set_unlink()
+                # Commit only every 100 batches to avoid committing too often:
+                # it takes about a second to process 10k records
+                if not index % (BATCH_SIZE * 100) and auto_commit:
+                    self.env.cr.commit()
 
         return participants
 
+    def _get_participants_diff(self):
+        """ Compare the records matching the filter of the campaign with its
+        participants.
+
+        :return: a pair ``(to_create, to_remove)`` where ``to_create`` are the
+            ids of the records without participant, keeping the first record
+            of each value of the unique field that is not used by a record
+            that already participates, and ``to_remove`` are the ids of the
+            participants whose record does not match the filter anymore
+        """
+        self.ensure_one()
+        RecordModel = self.env[self.model_name]
+        RecordModel.check_access_rights('read')
+        RecordModel.flush()
+        query = RecordModel._where_calc(literal_eval(self.domain or "[]"))
+        RecordModel._apply_ir_rules(query, 'read')
+        from_clause, where_clause, where_params = query.get_sql()
+
+        unique_field = self.unique_field_id and RecordModel._fields.get(self.unique_field_id.name)
+        if unique_field and unique_field.name != 'id' and not unique_field.store:
+            # the values of the unique field can not be grouped in SQL
+            return self._get_participants_diff_unstored(from_clause, where_clause, where_params)
+
+        value = 'NULL'
+        if unique_field and unique_field.name != 'id':
+            value = '"%s"."%s"' % (RecordModel._table, unique_field.name)
+            if unique_field.type == 'integer':
+                value = 'COALESCE(%s, 0)' % value
+        records_query = 'SELECT "{table}".id AS id, {value} AS value FROM {from_clause} WHERE {where_clause}'.format(
+            table=RecordModel._table, value=value, from_clause=from_clause, where_clause=where_clause or 'TRUE')
+
+        self.env.cr.execute("""
+            WITH records AS ({records_query})
+            SELECT p.id
+            FROM marketing_participant p
+            WHERE p.campaign_id = %s
+              AND p.state != 'unlinked'
+              AND NOT EXISTS (SELECT 1 FROM records r WHERE r.id = p.res_id)
+        """.format(records_query=records_query), where_params + [self.id])
+        to_remove = [row[0] for row in self.env.cr.fetchall()]
+
+        if value == 'NULL':
+            # without unique field, every record is kept
+            self.env.cr.execute("""
+                WITH records AS ({records_query})
+                SELECT r.id
+                FROM records r
+                WHERE NOT EXISTS (SELECT 1 FROM marketing_participant p WHERE p.campaign_id = %s AND p.res_id = r.id)
+                ORDER BY r.id
+            """.format(records_query=records_query), where_params + [self.id])
+        else:
+            # keep the first new record of each value, unless the value is
+            # already the one of a participating record; the empty many2one
+            # values are never kept
+            self.env.cr.execute("""
+                WITH records AS ({records_query}),
+                existing_values AS (
+                    SELECT DISTINCT {value} AS value
+                    FROM "{table}"
+                    JOIN marketing_participant p ON p.res_id = "{table}".id AND p.campaign_id = %s
+                ),
+                new_records AS (
+                    SELECT DISTINCT ON (r.value) r.id
+                    FROM records r
+                    WHERE NOT EXISTS (SELECT 1 FROM marketing_participant p WHERE p.campaign_id = %s AND p.res_id = r.id)
+                      AND NOT EXISTS (SELECT 1 FROM existing_values e WHERE e.value = r.value)
+                      AND (r.value IS NOT NULL OR (
+                          NOT %s AND NOT EXISTS (SELECT 1 FROM existing_values e WHERE e.value IS NULL)
+                      ))
+                    ORDER BY r.value, r.id
+                )
+                SELECT id FROM new_records ORDER BY id
+            """.format(records_query=records_query, table=RecordModel._table, value=value),
+                where_params + [self.id, self.id, unique_field.type == 'many2one'])
+        to_create = [row[0] for row in self.env.cr.fetchall()]
+        return to_create, to_remove
+
+    def _get_participants_diff_unstored(self, from_clause, where_clause, where_params):
+        """ Same as ``_get_participants_diff``, for a unique field that is not
+        stored: its values are read by batches. """
+        RecordModel = self.env[self.model_name].with_context(prefetch_fields=False)
+        field_name = self.unique_field_id.name
+        self.env.cr.execute('SELECT "%s".id FROM %s WHERE %s ORDER BY "%s".id' % (
+            RecordModel._table, from_clause, where_clause or 'TRUE', RecordModel._table), where_params)
+        db_rec_ids = [row[0] for row in self.env.cr.fetchall()]
+        self.env.cr.execute('SELECT id, res_id, state FROM marketing_participant WHERE campaign_id = %s', [self.id])
+        participants_data = self.env.cr.fetchall()
+        existing_rec_ids = {res_id for __, res_id, __ in participants_data}
+        db_rec_ids_set = set(db_rec_ids)
+        to_remove = [pid for pid, res_id, state in participants_data
+                     if state != 'unlinked' and res_id not in db_rec_ids_set]
+
+        def read_values(ids):
+            # Split the read in batch of 1000 to avoid the prefetch
+            # crawling the cache for the next 1000 records to fetch
+            for index in range(0, len(ids), 1000):
+                for rec in RecordModel.browse(ids[index:index + 1000]):
+                    yield rec, rec[field_name]
+
+        existing_records = RecordModel.browse(list(existing_rec_ids)).exists()
+        unique_field_vals = {val for __, val in read_values(existing_records.ids)}
+        to_create = []
+        for rec, field_val in read_values([rid for rid in db_rec_ids if rid not in existing_rec_ids]):
+            # we exclude the empty recordset with the first condition
+            if (not self.unique_field_id.relation or field_val) and field_val not in unique_field_vals:
+                to_create.append(rec.id)
+                unique_field_vals.add(field_val)
+        return to_create, to_remove
+
     def execute_activities(self):
         for campaign in self:
             campaign.marketing_activity_ids.execute()
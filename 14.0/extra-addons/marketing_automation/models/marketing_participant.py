@@ -81,19 +81,26 @@ class MarketingParticipant(models.Model):
         ])
         (self - existing_traces.mapped('participant_id')).write({'state': 'completed'})
 
-    @api.model
-    def create(self, values):
-        res = super(MarketingParticipant, self).create(values)
-        # prepare first traces related to begin activities
-        primary_activities = res.campaign_id.marketing_activity_ids.filtered(lambda act: act.trigger_type == 'begin')
+    @api.model_create_multi
+    def create(self, vals_list):
+        participants = super(MarketingParticipant, self).create(vals_list)
+        # prepare first traces related to begin activities, created at once
         now = Datetime.now()
-        trace_ids = [
-            (0, 0, {
+        trace_values = []
+        for campaign in participants.campaign_id:
+            primary_activities = campaign.marketing_activity_ids.filtered(lambda act: act.trigger_type == 'begin')
+            schedule_dates = [
+                (activity, now + relativedelta(**{activity.interval_type: activity.interval_number}))
+                for activity in primary_activities
+            ]
+            trace_values += [{
+                'participant_id': participant.id,
                 'activity_id': activity.id,
-                'schedule_date': now + relativedelta(**{activity.interval_type: activity.interval_number}),
-            }) for activity in primary_activities]
-        res.write({'trace_ids': trace_ids})
-        return res
+                'schedule_date': schedule_date,
+            } for participant in participants if participant.campaign_id == campaign
+              for activity, schedule_date in schedule_dates]
+        self.env['marketing.trace'].create(trace_values)
+        return participants
 
     def action_set_completed(self):
         ''' Manually mark as a completed and cancel every scheduled trace '''
@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 # Part of Odoo. See LICENSE file for full copyright and licensing details.
 from ast import literal_eval
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
 from datetime import date, datetime, timedelta, time
 from dateutil.relativedelta import relativedelta
 from dateutil.rrule import rrule, DAILY
@@ -17,6 +19,8 @@ from odoo.tools import format_time
 from odoo.tools import DEFAULT_SERVER_DATETIME_FORMAT
 from odoo.tools.misc import format_date, format_datetime
 
+from odoo.addons.resource.models.resource import Intervals, timezone_datetime
+
 _logger = logging.getLogger(__name__)
 
 
@@ -105,6 +109,13 @@ class Planning(models.Model):
         ('check_allocated_hours_positive', 'CHECK(allocated_hours >= 0)', 'You cannot have negative shift'),
     ]
 
+    def init(self):
+        # Used to find the overlapping shifts of the employees
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS planning_slot_employee_id_start_datetime_idx
+            ON planning_slot (employee_id, start_datetime)
+        """)
+
     @api.depends('repeat_until')
     def _compute_confirm_delete(self):
         for slot in self:
@@ -167,13 +178,16 @@ class Planning(models.Model):
 
     @api.depends('start_datetime', 'end_datetime', 'employee_id.resource_calendar_id', 'allocated_hours')
     def _compute_allocated_percentage(self):
+        work_days_data = None
         for slot in self:
             if slot.start_datetime and slot.end_datetime and slot.start_datetime != slot.end_datetime:
                 if slot.allocation_type == 'planning':
                     slot.allocated_percentage = 100 * slot.allocated_hours / slot._get_slot_duration()
                 else:
                     if slot.employee_id:
-                        work_hours = slot.employee_id._get_work_days_data_batch(slot.start_datetime, slot.end_datetime, compute_leaves=True)[slot.employee_id.id]['hours']
+                        if work_days_data is None:
+                            work_days_data = self._get_work_days_data_batch()
+                        work_hours = work_days_data[slot]['hours']
                         slot.allocated_percentage = 100 * slot.allocated_hours / work_hours if work_hours else 100
                     else:
                         slot.allocated_percentage = 100
@@ -198,32 +212,84 @@ class Planning(models.Model):
 
     @api.depends('start_datetime', 'end_datetime', 'employee_id')
     def _compute_working_days_count(self):
+        work_days_data = self._get_work_days_data_batch()
         for slot in self:
-            if slot.employee_id:
-                slot.working_days_count = ceil(slot.employee_id._get_work_days_data_batch(
-                    slot.start_datetime, slot.end_datetime, compute_leaves=True
-                )[slot.employee_id.id]['days'])
-            else:
-                slot.working_days_count = 0
+            slot.working_days_count = ceil(work_days_data[slot]['days'])
 
     @api.depends('start_datetime', 'end_datetime', 'employee_id')
     def _compute_overlap_slot_count(self):
-        if self.ids:
-            self.flush(['start_datetime', 'end_datetime', 'employee_id'])
-            query = """
-                SELECT S1.id,count(*) FROM
-                    planning_slot S1, planning_slot S2
-                WHERE
-                    S1.start_datetime < S2.end_datetime and S1.end_datetime > S2.start_datetime and S1.id <> S2.id and S1.employee_id = S2.employee_id
-                    and S1.id in %s
-                GROUP BY S1.id;
-            """
-            self.env.cr.execute(query, (tuple(self.ids),))
-            overlap_mapping = dict(self.env.cr.fetchall())
-            for slot in self:
-                slot.overlap_slot_count = overlap_mapping.get(slot.id, 0)
-        else:
-            self.overlap_slot_count = 0
+        slots = self.filtered(lambda s: s.id and s.employee_id)
+        self.overlap_slot_count = 0
+        if not slots:
+            return
+        self.flush(['start_datetime', 'end_datetime', 'employee_id'])
+        # Read the shifts of the employees over the whole period once. The shifts overlapping a shift
+        # are the ones starting before its end, minus the ones ending before its start (which all
+        # start before its end), minus itself: with both bounds sorted, two bisections per shift.
+        self.env.cr.execute("""
+            SELECT employee_id, start_datetime, end_datetime
+              FROM planning_slot
+             WHERE employee_id IN %s
+               AND start_datetime < %s
+               AND end_datetime > %s
+        """, (tuple(slots.employee_id.ids), max(slots.mapped('end_datetime')), min(slots.mapped('start_datetime'))))
+        starts = defaultdict(list)
+        ends = defaultdict(list)
+        for employee_id, start_datetime, end_datetime in self.env.cr.fetchall():
+            starts[employee_id].append(start_datetime)
+            ends[employee_id].append(end_datetime)
+        for employee_id in starts:
+            starts[employee_id].sort()
+            ends[employee_id].sort()
+        for slot in slots:
+            employee_id = slot.employee_id.id
+            slot.overlap_slot_count = bisect_left(starts[employee_id], slot.end_datetime) \
+                - bisect_right(ends[employee_id], slot.start_datetime) - 1
+
+    def _get_work_days_data_batch(self):
+        """ Compute the working days and hours of the shifts, as
+        `hr.employee._get_work_days_data_batch` does for a single period.
+
+        The attendances and leaves are computed once per calendar for all the
+        employees working with it and over periods gathering the shifts close in
+        time, then restricted to each shift.
+
+        :returns: dict {slot: {'days': float, 'hours': float}}
+        """
+        result = {}
+        slots_per_calendar = defaultdict(list)
+        for slot in self:
+            calendar = slot.employee_id.resource_calendar_id
+            if calendar and slot.start_datetime and slot.end_datetime:
+                slots_per_calendar[calendar].append(slot)
+            else:
+                result[slot] = {'days': 0, 'hours': 0}
+
+        for calendar, slots in slots_per_calendar.items():
+            # gather the shifts in periods: a period ends when there is more than a day without shift
+            periods = []
+            for slot in sorted(slots, key=lambda s: s.start_datetime):
+                if periods and slot.start_datetime <= periods[-1][1] + timedelta(days=1):
+                    periods[-1][1] = max(periods[-1][1], slot.end_datetime)
+                    periods[-1][2].append(slot)
+                else:
+                    periods.append([slot.start_datetime, slot.end_datetime, [slot]])
+
+            for start, end, period_slots in periods:
+                start, end = timezone_datetime(start), timezone_datetime(end)
+                resources = self.concat(*period_slots).employee_id.resource_id
+                day_total = calendar._get_resources_day_total(start, end, resources)
+                intervals = calendar._work_intervals_batch(start, end, resources)
+                for slot in period_slots:
+                    resource = slot.employee_id.resource_id
+                    tz = pytz.timezone(resource.tz or calendar.tz)
+                    slot_intervals = intervals[resource.id] & Intervals([(
+                        timezone_datetime(slot.start_datetime).astimezone(tz),
+                        timezone_datetime(slot.end_datetime).astimezone(tz),
+                        self.env['resource.calendar.attendance'],
+                    )])
+                    result[slot] = calendar._get_days_data(slot_intervals, day_total[resource.id])
+        return result
 
     def _get_slot_duration(self):
         """Return the slot (effective) duration expressed in hours.
@@ -679,13 +745,26 @@ class Planning(models.Model):
         :param start: origin date in UTC timezone, but without timezone info (a naive date)
         :return resulting date in the UTC timezone (a naive date)
         """
+        return next(self._iter_delta_with_dst(start, delta))
+
+    def _iter_delta_with_dst(self, start, delta):
+        """
+        Generate start + delta, start + 2 * delta, ... adjusted like `_add_delta_with_dst`: the deltas are added
+        in the local timezone, which is only fetched once.
+
+        :param start: origin date in UTC timezone, but without timezone info (a naive date)
+        :return iterator of resulting dates in the UTC timezone (naive dates)
+        """
         try:
             tz = pytz.timezone(self._get_tz())
         except pytz.UnknownTimeZoneError:
             tz = pytz.UTC
         start = start.replace(tzinfo=pytz.utc).astimezone(tz).replace(tzinfo=None)
-        result = start + delta
-        return tz.localize(result).astimezone(pytz.utc).replace(tzinfo=None)
+        step = 1
+        while True:
+            result = start + delta * step
+            yield tz.localize(result).astimezone(pytz.utc).replace(tzinfo=None)
+            step += 1
 
     def _name_get_fields(self):
         """ List of fields that can be displayed in the name_get """
@@ -1,8 +1,10 @@
 # -*- coding: utf-8 -*-
 # Part of Odoo. See LICENSE file for full copyright and licensing details.
 from datetime import datetime
+from itertools import takewhile
 
 from odoo import api, fields, models, _
+from odoo.osv import expression
 from odoo.tools import get_timedelta
 from odoo.exceptions import ValidationError
 
@@ -43,11 +45,10 @@ class PlanningRecurrency(models.Model):
     def _cron_schedule_next(self):
         companies = self.env['res.company'].search([])
         now = fields.Datetime.now()
-        stop_datetime = None
+        domains = []
         for company in companies:
             delta = get_timedelta(company.planning_generation_interval, 'month')
-
-            recurrencies = self.search([
+            domains.append([
                 '&',
                 '&',
                 ('company_id', '=', company.id),
@@ -56,47 +57,74 @@ class PlanningRecurrency(models.Model):
                 ('repeat_until', '=', False),
                 ('repeat_until', '>', now - delta),
             ])
-            recurrencies._repeat_slot(now + delta)
+        # the generation period of each recurrency is the one of its company
+        self.search(expression.OR(domains))._repeat_slot()
+
+    def _get_last_slots(self):
+        """ Return the last slot of each recurrency, in a single query.
+            :returns: dict {recurrency id: planning.slot record}
+        """
+        if not self:
+            return {}
+        PlanningSlot = self.env['planning.slot']
+        PlanningSlot.flush(['recurrency_id', 'start_datetime'])
+        self.env.cr.execute("""
+            SELECT DISTINCT ON (recurrency_id) recurrency_id, id
+              FROM planning_slot
+             WHERE recurrency_id IN %s
+          ORDER BY recurrency_id, start_datetime DESC, id DESC
+        """, [tuple(self.ids)])
+        return {recurrency_id: PlanningSlot.browse(slot_id) for recurrency_id, slot_id in self.env.cr.fetchall()}
 
     def _repeat_slot(self, stop_datetime=False):
         PlanningSlot = self.env['planning.slot']
-        for recurrency in self:
-            slot = PlanningSlot.search([('recurrency_id', '=', recurrency.id)], limit=1, order='start_datetime DESC')
-
-            if slot:
-                # find the end of the recurrence
-                recurrence_end_dt = False
-                if recurrency.repeat_type == 'until':
-                    recurrence_end_dt = recurrency.repeat_until
-
-                # find end of generation period (either the end of recurrence (if this one ends before the cron period), or the given `stop_datetime` (usually the cron period))
-                if not stop_datetime:
-                    stop_datetime = fields.Datetime.now() + get_timedelta(recurrency.company_id.planning_generation_interval, 'month')
-                range_limit = min([dt for dt in [recurrence_end_dt, stop_datetime] if dt])
-
-                # generate recurring slots
-                recurrency_delta = get_timedelta(recurrency.repeat_interval, 'week')
-                next_start = PlanningSlot._add_delta_with_dst(slot.start_datetime, recurrency_delta)
-
-                slot_values_list = []
-                while next_start < range_limit:
-                    slot_values = slot.copy_data({
-                        'start_datetime': next_start,
-                        'end_datetime': next_start + (slot.end_datetime - slot.start_datetime),
-                        'recurrency_id': recurrency.id,
-                        'company_id': recurrency.company_id.id,
-                        'repeat': True,
-                        'is_published': False
-                    })[0]
-                    slot_values_list.append(slot_values)
-                    next_start = PlanningSlot._add_delta_with_dst(next_start, recurrency_delta)
-
-                if slot_values_list:
-                    PlanningSlot.create(slot_values_list)
-                    recurrency.write({'last_generated_end_datetime': slot_values_list[-1]['start_datetime']})
+        last_slots = self._get_last_slots()
+        now = fields.Datetime.now()
 
-            else:
-                recurrency.unlink()
+        empty_recurrencies = self.browse()
+        slot_values_list = []
+        last_generated_starts = {}
+        for recurrency in self:
+            slot = last_slots.get(recurrency.id)
+            if not slot:
+                empty_recurrencies |= recurrency
+                continue
+
+            # find the end of the recurrence
+            recurrence_end_dt = False
+            if recurrency.repeat_type == 'until':
+                recurrence_end_dt = recurrency.repeat_until
+
+            # find end of generation period (either the end of recurrence (if this one ends before the cron period), or the given `stop_datetime` (usually the cron period))
+            generation_end_dt = stop_datetime or now + get_timedelta(recurrency.company_id.planning_generation_interval, 'month')
+            range_limit = min([dt for dt in [recurrence_end_dt, generation_end_dt] if dt])
+
+            # generate recurring slots, all sharing the values of the last one
+            recurrency_delta = get_timedelta(recurrency.repeat_interval, 'week')
+            duration = slot.end_datetime - slot.start_datetime
+            next_starts = list(takewhile(
+                lambda start: start < range_limit,
+                slot._iter_delta_with_dst(slot.start_datetime, recurrency_delta),
+            ))
+            if not next_starts:
+                continue
+            slot_values = slot.copy_data({
+                'recurrency_id': recurrency.id,
+                'company_id': recurrency.company_id.id,
+                'repeat': True,
+                'is_published': False
+            })[0]
+            slot_values_list += [
+                dict(slot_values, start_datetime=next_start, end_datetime=next_start + duration)
+                for next_start in next_starts
+            ]
+            last_generated_starts[recurrency] = next_starts[-1]
+
+        if slot_values_list:
+            PlanningSlot.create(slot_values_list)
+            for recurrency, last_generated_start in last_generated_starts.items():
+                recurrency.last_generated_end_datetime = last_generated_start
+        empty_recurrencies.unlink()
 
     def _delete_slot(self, start_datetime):
         slots = self.env['planning.slot'].search([
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details
+import logging
+import time
+from datetime import datetime, timedelta
+from math import ceil
+
+from .common import TestCommonPlanning
+
+_logger = logging.getLogger(__name__)
+
+
+class TestPlanningPerformance(TestCommonPlanning):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.setUpEmployees()
+        cls.employees = cls.employee_joseph | cls.employee_bert | cls.employee_janice
+        # three weeks of shifts from 8 to 12 and from 11 to 15: each shift overlaps another one
+        cls.slots = cls.env['planning.slot'].create([{
+            'employee_id': employee.id,
+            'start_datetime': datetime(2019, 6, 3, 8, 0) + timedelta(days=day, hours=hours),
+            'end_datetime': datetime(2019, 6, 3, 12, 0) + timedelta(days=day, hours=hours),
+        } for employee in cls.employees for day in range(21) for hours in (0, 3)])
+        # the first two shifts of each employee
+        cls.first_slots = cls.slots.filtered(lambda s: s.start_datetime.date() == datetime(2019, 6, 3).date())
+
+    def _benchmark(self, slots, method):
+        """ Run the compute method on the shifts with an empty cache.
+        :returns: the number of queries
+        """
+        slots.invalidate_cache()
+        count = self.env.cr.sql_log_count
+        start = time.time()
+        getattr(slots, method)()
+        queries = self.env.cr.sql_log_count - count
+        _logger.info("%s on %d shifts: %d queries, %.3fs", method, len(slots), queries, time.time() - start)
+        return queries
+
+    def test_working_days_count(self):
+        work_days_data = self.slots._get_work_days_data_batch()
+        for slot in self.slots:
+            expected = slot.employee_id._get_work_days_data_batch(
+                slot.start_datetime, slot.end_datetime, compute_leaves=True
+            )[slot.employee_id.id]
+            self.assertEqual(slot.working_days_count, ceil(expected['days']))
+            self.assertAlmostEqual(work_days_data[slot]['hours'], expected['hours'])
+
+    def test_overlap_slot_count(self):
+        domains = self.slots._get_overlap_domain()
+        for slot in self.slots:
+            self.assertEqual(slot.overlap_slot_count, 1)
+            self.assertEqual(slot.overlap_slot_count, self.env['planning.slot'].search_count(domains[slot.id]) - 1)
+
+    def test_performance_working_days_count(self):
+        """ The number of queries does not depend on the number of shifts """
+        self.assertEqual(
+            self._benchmark(self.first_slots, '_compute_working_days_count'),
+            self._benchmark(self.slots, '_compute_working_days_count'),
+        )
+
+    def test_performance_overlap_slot_count(self):
+        """ The number of queries does not depend on the number of shifts """
+        self.assertEqual(
+            self._benchmark(self.first_slots, '_compute_overlap_slot_count'),
+            self._benchmark(self.slots, '_compute_overlap_slot_count'),
+        )
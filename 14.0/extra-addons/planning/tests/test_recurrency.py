@@ -1,7 +1,8 @@
 # -*- coding: utf-8 -*-
 # Part of Odoo. See LICENSE file for full copyright and licensing details
 
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
+from dateutil.relativedelta import relativedelta
 
 from .common import TestCommonPlanning
 
@@ -509,3 +510,32 @@ class TestRecurrencySlotGeneration(TestCommonPlanning):
             slots = self.get_by_employee(self.employee_bert).sorted('start_datetime')
             self.assertEqual('2020-10-25 00:30:00', str(slots[0].start_datetime))
             self.assertEqual('2020-11-01 01:30:00', str(slots[1].start_datetime))
+
+    def test_repeat_slot_batch(self):
+        """ Several recurrencies are repeated at once by the cron, each one from its own last slot """
+        employees = self.employee_joseph | self.employee_bert | self.employee_janice
+        with self._patch_now('2019-06-27 08:00:00'):
+            self.configure_recurrency_span(1)
+            slots = self.env['planning.slot'].create([{
+                'start_datetime': datetime(2019, 6, 27, 8, 0, 0),
+                'end_datetime': datetime(2019, 6, 27, 17, 0, 0),
+                'employee_id': employee.id,
+                'repeat': True,
+                'repeat_type': 'forever',
+                'repeat_interval': 1,
+            } for employee in employees])
+            self.assertEqual(len(slots.recurrency_id), 3)
+
+        with self._patch_now('2019-07-11 08:00:00'):
+            self.env['planning.recurrency']._cron_schedule_next()
+
+        for employee in employees:
+            employee_slots = self.get_by_employee(employee)
+            self.assertEqual(len(employee_slots), 7, 'the cron should have generated 2 more slots for each recurrency')
+            self.assertEqual(len(employee_slots.recurrency_id), 1)
+            start = datetime(2019, 6, 27, 8, 0, 0)
+            for slot in employee_slots:
+                self.assertEqual(slot.start_datetime, start)
+                self.assertEqual(slot.end_datetime - slot.start_datetime, timedelta(hours=9))
+                start = slot._add_delta_with_dst(start, relativedelta(weeks=1))
+            self.assertEqual(employee_slots.recurrency_id.last_generated_end_datetime, employee_slots[-1].start_datetime)
@@ -5,14 +5,14 @@ import datetime
 import traceback
 
 from ast import literal_eval
-from collections import Counter
+from collections import Counter, defaultdict
 from dateutil.relativedelta import relativedelta
 from uuid import uuid4
 
 from odoo import api, fields, models, _
 from odoo.exceptions import UserError, ValidationError
 from odoo.osv import expression
-from odoo.tools import format_date, float_compare
+from odoo.tools import format_date, float_compare, split_every
 from odoo.tools.float_utils import float_is_zero
 
 
@@ -27,6 +27,11 @@ INTERVAL_FACTOR = {
 
 PERIODS = {'daily': 'days', 'weekly': 'weeks', 'monthly': 'months', 'yearly': 'years'}
 
+# number of subscriptions whose KPIs are computed and written together
+KPI_BATCH_SIZE = 1000
+# number of subscriptions invoiced in the same transaction by the recurring invoicing
+INVOICE_BATCH_SIZE = 50
+
 class SaleSubscription(models.Model):
     _name = "sale.subscription"
     _description = "Subscription"
@@ -503,18 +508,87 @@ class SaleSubscription(models.Model):
             health = 'normal'
         return health
 
-    def _compute_kpi(self):
+    def _get_subscriptions_delta(self, dates):
+        """ Batched version of _get_subscription_delta, reading the last MRR change of every subscription before each
+        date with a single query.
+        :param dates: list of dates
+        :return: dict {(subscription_id, date): {'delta': ..., 'percentage': ...}}
+        """
+        if not self:
+            return {}
+        self.flush(['recurring_monthly'])
+        self.env['sale.subscription.log'].flush(['subscription_id', 'event_type', 'event_date', 'recurring_monthly'])
+        self.env.cr.execute('''
+            SELECT DISTINCT ON (log.subscription_id, cutoff.date)
+                log.subscription_id, cutoff.date, log.recurring_monthly
+            FROM sale_subscription_log log
+            JOIN unnest(%s::date[]) AS cutoff(date) ON log.event_date <= cutoff.date
+            WHERE log.subscription_id IN %s
+            AND log.event_type IN ('1_change', '0_creation')
+            ORDER BY log.subscription_id, cutoff.date, log.event_date DESC, log.id DESC
+        ''', [list(dates), tuple(self.ids)])
+        previous_mrr = {(subscription_id, date): mrr for subscription_id, date, mrr in self.env.cr.fetchall()}
+
+        result = {}
         for subscription in self:
-            delta_1month = subscription._get_subscription_delta(datetime.date.today() - relativedelta(months=1))
-            delta_3months = subscription._get_subscription_delta(datetime.date.today() - relativedelta(months=3))
-            health = subscription._get_subscription_health()
-            subscription.write({
-                'kpi_1month_mrr_delta': delta_1month['delta'],
-                'kpi_1month_mrr_percentage': delta_1month['percentage'],
-                'kpi_3months_mrr_delta': delta_3months['delta'],
-                'kpi_3months_mrr_percentage': delta_3months['percentage'],
-                'health': health,
-            })
+            for date in dates:
+                delta, percentage = False, False
+                if (subscription.id, date) in previous_mrr:
+                    mrr = previous_mrr[subscription.id, date]
+                    delta = subscription.recurring_monthly - mrr
+                    percentage = delta / mrr if mrr != 0 else 100
+                result[subscription.id, date] = {'delta': delta, 'percentage': percentage}
+        return result
+
+    def _get_subscriptions_health(self):
+        """ Batched version of _get_subscription_health, evaluating the health domains once per template.
+        :return: dict {subscription_id: health}
+        """
+        result = dict.fromkeys(self.ids, 'normal')
+        subscription_ids_by_template = defaultdict(list)
+        for subscription in self:
+            subscription_ids_by_template[subscription.template_id].append(subscription.id)
+        for template, subscription_ids in subscription_ids_by_template.items():
+            domain = [('id', 'in', subscription_ids)]
+            bad_ids = set()
+            if template.bad_health_domain != '[]':
+                bad_ids = set(self.search(domain + literal_eval(template.bad_health_domain)).ids)
+                result.update(dict.fromkeys(bad_ids, 'bad'))
+            remaining_ids = [subscription_id for subscription_id in subscription_ids if subscription_id not in bad_ids]
+            if template.good_health_domain != '[]' and remaining_ids:
+                good_ids = self.search([('id', 'in', remaining_ids)] + literal_eval(template.good_health_domain)).ids
+                result.update(dict.fromkeys(good_ids, 'done'))
+        return result
+
+    def _compute_kpi(self):
+        today = datetime.date.today()
+        date_1month = today - relativedelta(months=1)
+        date_3months = today - relativedelta(months=3)
+        for ids in split_every(KPI_BATCH_SIZE, self.ids):
+            subscriptions = self.browse(ids)
+            deltas = subscriptions._get_subscriptions_delta([date_1month, date_3months])
+            healths = subscriptions._get_subscriptions_health()
+
+            # Most subscriptions share the same KPIs (e.g. no MRR change), write them together.
+            ids_by_kpi = defaultdict(list)
+            for subscription_id in ids:
+                delta_1month = deltas[subscription_id, date_1month]
+                delta_3months = deltas[subscription_id, date_3months]
+                ids_by_kpi[(
+                    delta_1month['delta'],
+                    delta_1month['percentage'],
+                    delta_3months['delta'],
+                    delta_3months['percentage'],
+                    healths[subscription_id],
+                )].append(subscription_id)
+            for kpi, subscription_ids in ids_by_kpi.items():
+                self.browse(subscription_ids).write(dict(zip([
+                    'kpi_1month_mrr_delta',
+                    'kpi_1month_mrr_percentage',
+                    'kpi_3months_mrr_delta',
+                    'kpi_3months_mrr_percentage',
+                    'health',
+                ], kpi)))
 
     def _send_subscription_rating_mail(self, force_send=False):
         for subscription in self.filtered(lambda subscription: subscription.stage_id.rating_template_id):
@@ -863,8 +937,6 @@ class SaleSubscription(models.Model):
         cr = self.env.cr
         invoices = self.env['account.move']
         current_date = datetime.date.today()
-        imd_res = self.env['ir.model.data']
-        template_res = self.env['mail.template']
         if len(self) > 0:
             subscriptions = self
         else:
@@ -876,141 +948,186 @@ class SaleSubscription(models.Model):
             sub_data = subscriptions.read(fields=['id', 'company_id'])
             for company_id in set(data['company_id'][0] for data in sub_data):
                 sub_ids = [s['id'] for s in sub_data if s['company_id'][0] == company_id]
-                subs = self.with_company(company_id).with_context(company_id=company_id).browse(sub_ids)
                 Invoice = self.env['account.move'].with_context(type='out_invoice', company_id=company_id).with_company(company_id)
-                for subscription in subs:
-                    subscription = subscription[0]  # Trick to not prefetch other subscriptions, as the cache is currently invalidated at each iteration
+                # The subscriptions of a batch are prefetched together and committed together, instead of one by one.
+                for batch_ids in split_every(INVOICE_BATCH_SIZE, sub_ids):
+                    subs = self.with_company(company_id).with_context(company_id=company_id).browse(batch_ids)
                     if automatic and auto_commit:
                         cr.commit()
 
                     # if we reach the end date of the subscription then we close it and avoid to charge it
-                    if automatic and subscription.date and subscription.date <= current_date:
-                        subscription.set_close()
-                        continue
+                    if automatic:
+                        subs_to_close = subs.filtered(lambda sub: sub.date and sub.date <= current_date)
+                        subs_to_close.set_close()
+                        subs -= subs_to_close
+                        # the payments below roll back their failures, which must not undo these closings
+                        if subs_to_close and auto_commit:
+                            cr.commit()
 
                     # payment + invoice (only by cron)
-                    if subscription.template_id.payment_mode in ['validate_send_payment', 'success_payment'] and subscription.recurring_total and automatic:
-                        try:
-                            payment_token = subscription.payment_token_id
-                            tx = None
-                            if payment_token:
-                                invoice_values = subscription.with_context(lang=subscription.partner_id.lang)._prepare_invoice()
-                                new_invoice = Invoice.create(invoice_values)
-                                if subscription.analytic_account_id or subscription.tag_ids:
-                                    for line in new_invoice.invoice_line_ids:
-                                        if subscription.analytic_account_id:
-                                            line.analytic_account_id = subscription.analytic_account_id
-                                        if subscription.tag_ids:
-                                            line.analytic_tag_ids = subscription.tag_ids
-                                new_invoice.message_post_with_view(
-                                    'mail.message_origin_link',
-                                    values={'self': new_invoice, 'origin': subscription},
-                                    subtype_id=self.env.ref('mail.mt_note').id)
-                                tx = subscription._do_payment(payment_token, new_invoice, two_steps_sec=False)[0]
-                                # commit change as soon as we try the payment so we have a trace somewhere
-                                if auto_commit:
-                                    cr.commit()
-                                if tx.renewal_allowed:
-                                    subscription.send_success_mail(tx, new_invoice)
-                                    msg_body = _('Automatic payment succeeded. Payment reference: <a href=# data-oe-model=payment.transaction data-oe-id=%d>%s</a>; Amount: %s. Invoice <a href=# data-oe-model=account.move data-oe-id=%d>View Invoice</a>.') % (tx.id, tx.reference, tx.amount, new_invoice.id)
-                                    subscription.message_post(body=msg_body)
-                                    if subscription.template_id.payment_mode == 'validate_send_payment':
-                                        subscription.validate_and_send_invoice(new_invoice)
-                                    else:
-                                        # success_payment
-                                        new_invoice._post(False)
-                                    if auto_commit:
-                                        cr.commit()
-                                else:
-                                    _logger.error('Fail to create recurring invoice for subscription %s', subscription.code)
-                                    if auto_commit:
-                                        cr.rollback()
-                                    new_invoice.unlink()
-                            if tx is None or not tx.renewal_allowed:
-                                amount = subscription.recurring_total
-                                date_close = (
-                                    subscription.recurring_next_date +
-                                    relativedelta(days=subscription.template_id.auto_close_limit or
-                                                  15)
-                                )
-                                close_subscription = current_date >= date_close
-                                email_context = self.env.context.copy()
-                                email_context.update({
-                                    'payment_token': subscription.payment_token_id and subscription.payment_token_id.name,
-                                    'renewed': False,
-                                    'total_amount': amount,
-                                    'email_to': subscription.partner_id.email,
-                                    'code': subscription.code,
-                                    'currency': subscription.pricelist_id.currency_id.name,
-                                    'date_end': subscription.date,
-                                    'date_close': date_close
-                                })
-                                if close_subscription:
-                                    model, template_id = imd_res.get_object_reference('sale_subscription', 'email_payment_close')
-                                    template = template_res.browse(template_id)
-                                    template.with_context(email_context).send_mail(subscription.id)
-                                    _logger.debug("Sending Subscription Closure Mail to %s for subscription %s and closing subscription", subscription.partner_id.email, subscription.id)
-                                    msg_body = _('Automatic payment failed after multiple attempts. Subscription closed automatically.')
-                                    subscription.message_post(body=msg_body)
-                                    subscription.set_close()
-                                else:
-                                    model, template_id = imd_res.get_object_reference('sale_subscription', 'email_payment_reminder')
-                                    msg_body = _('Automatic payment failed. Subscription set to "To Renew".')
-                                    if (datetime.date.today() - subscription.recurring_next_date).days in [0, 3, 7, 14]:
-                                        template = template_res.browse(template_id)
-                                        template.with_context(email_context).send_mail(subscription.id)
-                                        _logger.debug("Sending Payment Failure Mail to %s for subscription %s and setting subscription to pending", subscription.partner_id.email, subscription.id)
-                                        msg_body += _(' E-mail sent to customer.')
-                                    subscription.message_post(body=msg_body)
-                                    subscription.set_to_renew()
-                            if auto_commit:
-                                cr.commit()
-                        except Exception:
-                            if auto_commit:
-                                cr.rollback()
-                            # we assume that the payment is run only once a day
-                            traceback_message = traceback.format_exc()
-                            _logger.error(traceback_message)
-                            last_tx = self.env['payment.transaction'].search([('reference', 'like', 'SUBSCRIPTION-%s-%s' % (subscription.id, datetime.date.today().strftime('%y%m%d')))], limit=1)
-                            error_message = "Error during renewal of subscription %s (%s)" % (subscription.code, 'Payment recorded: %s' % last_tx.reference if last_tx and last_tx.state == 'done' else 'No payment recorded.')
-                            _logger.error(error_message)
+                    subs_to_pay = subs.filtered(
+                        lambda sub: sub.template_id.payment_mode in ['validate_send_payment', 'success_payment']
+                        and sub.recurring_total and automatic)
+                    for subscription in subs_to_pay:
+                        subscription._recurring_invoice_payment(Invoice, auto_commit)
 
                     # invoice only
-                    elif subscription.template_id.payment_mode in ['draft_invoice', 'manual', 'validate_send']:
-                        try:
-                            # We don't allow to create invoice past the end date of the contract.
-                            # The subscription must be renewed in that case
-                            if subscription.date and subscription.recurring_next_date >= subscription.date:
-                                return
-                            else:
-                                invoice_values = subscription.with_context(lang=subscription.partner_id.lang)._prepare_invoice()
-                                new_invoice = Invoice.create(invoice_values)
-                                if subscription.analytic_account_id or subscription.tag_ids:
-                                    for line in new_invoice.invoice_line_ids:
-                                        if subscription.analytic_account_id:
-                                            line.analytic_account_id = subscription.analytic_account_id
-                                        if subscription.tag_ids:
-                                            line.analytic_tag_ids = subscription.tag_ids
-                                new_invoice.message_post_with_view(
-                                    'mail.message_origin_link',
-                                    values={'self': new_invoice, 'origin': subscription},
-                                    subtype_id=self.env.ref('mail.mt_note').id)
-                                invoices += new_invoice
-                                # When `recurring_next_date` is updated by cron or by `Generate Invoice` action button,
-                                # write() will skip resetting `recurring_invoice_day` value based on this context value
-                                subscription.with_context(skip_update_recurring_invoice_day=True).increment_period()
-                                if subscription.template_id.payment_mode == 'validate_send':
-                                    subscription.validate_and_send_invoice(new_invoice)
-                                if automatic and auto_commit:
-                                    cr.commit()
-                        except Exception:
-                            if automatic and auto_commit:
+                    subs_to_invoice = subs.filtered(
+                        lambda sub: sub.template_id.payment_mode in ['draft_invoice', 'manual', 'validate_send'])
+                    # We don't allow to create invoice past the end date of the contract.
+                    # The subscription must be renewed in that case
+                    subs_to_invoice = subs_to_invoice.filtered(
+                        lambda sub: not sub.date or sub.recurring_next_date < sub.date)
+                    if not subs_to_invoice:
+                        continue
+                    try:
+                        invoices += subs_to_invoice._recurring_create_invoice_batch(Invoice)
+                        if automatic and auto_commit:
+                            cr.commit()
+                    except Exception:
+                        if not (automatic and auto_commit):
+                            raise
+                        cr.rollback()
+                        # Retry the subscriptions of the batch one by one, so that a single failing subscription does
+                        # not prevent the others from being invoiced.
+                        for subscription in subs_to_invoice:
+                            try:
+                                invoices += subscription._recurring_create_invoice_batch(Invoice)
+                                cr.commit()
+                            except Exception:
                                 cr.rollback()
                                 _logger.exception('Fail to create recurring invoice for subscription %s', subscription.code)
-                            else:
-                                raise
         return invoices
 
+    def _recurring_create_invoice_batch(self, Invoice):
+        """ Create and, depending on the payment mode of their template, validate and send the recurring invoices of
+        the subscriptions, then increment their invoicing period.
+
+        :param Invoice: the account.move model in the company of the subscriptions
+        :returns: the created invoices
+        """
+        invoice_values = [
+            subscription.with_context(lang=subscription.partner_id.lang)._prepare_invoice()
+            for subscription in self
+        ]
+        new_invoices = Invoice.create(invoice_values)
+        for subscription, new_invoice in zip(self, new_invoices):
+            subscription._recurring_invoice_set_analytic(new_invoice)
+            new_invoice.message_post_with_view(
+                'mail.message_origin_link',
+                values={'self': new_invoice, 'origin': subscription},
+                subtype_id=self.env.ref('mail.mt_note').id)
+        # When `recurring_next_date` is updated by cron or by `Generate Invoice` action button,
+        # write() will skip resetting `recurring_invoice_day` value based on this context value
+        self.with_context(skip_update_recurring_invoice_day=True).increment_period()
+        for subscription, new_invoice in zip(self, new_invoices):
+            if subscription.template_id.payment_mode == 'validate_send':
+                subscription.validate_and_send_invoice(new_invoice)
+        return new_invoices
+
+    def _recurring_invoice_set_analytic(self, invoice):
+        self.ensure_one()
+        values = {}
+        if self.analytic_account_id:
+            values['analytic_account_id'] = self.analytic_account_id.id
+        if self.tag_ids:
+            values['analytic_tag_ids'] = [(6, 0, self.tag_ids.ids)]
+        if values:
+            invoice.invoice_line_ids.write(values)
+
+    def _recurring_invoice_payment(self, Invoice, auto_commit):
+        """ Create the recurring invoice of the subscription and charge it using its payment token. On success, the
+        invoice is validated and the subscription renewed, otherwise the customer is reminded and the subscription is
+        set to renew, or closed after too many failed attempts.
+
+        :param Invoice: the account.move model in the company of the subscription
+        """
+        self.ensure_one()
+        subscription = self
+        cr = self.env.cr
+        current_date = datetime.date.today()
+        imd_res = self.env['ir.model.data']
+        template_res = self.env['mail.template']
+        try:
+            payment_token = subscription.payment_token_id
+            tx = None
+            if payment_token:
+                invoice_values = subscription.with_context(lang=subscription.partner_id.lang)._prepare_invoice()
+                new_invoice = Invoice.create(invoice_values)
+                subscription._recurring_invoice_set_analytic(new_invoice)
+                new_invoice.message_post_with_view(
+                    'mail.message_origin_link',
+                    values={'self': new_invoice, 'origin': subscription},
+                    subtype_id=self.env.ref('mail.mt_note').id)
+                tx = subscription._do_payment(payment_token, new_invoice, two_steps_sec=False)[0]
+                # commit change as soon as we try the payment so we have a trace somewhere
+                if auto_commit:
+                    cr.commit()
+                if tx.renewal_allowed:
+                    subscription.send_success_mail(tx, new_invoice)
+                    msg_body = _('Automatic payment succeeded. Payment reference: <a href=# data-oe-model=payment.transaction data-oe-id=%d>%s</a>; Amount: %s. Invoice <a href=# data-oe-model=account.move data-oe-id=%d>View Invoice</a>.') % (tx.id, tx.reference, tx.amount, new_invoice.id)
+                    subscription.message_post(body=msg_body)
+                    if subscription.template_id.payment_mode == 'validate_send_payment':
+                        subscription.validate_and_send_invoice(new_invoice)
+                    else:
+                        # success_payment
+                        new_invoice._post(False)
+                    if auto_commit:
+                        cr.commit()
+                else:
+                    _logger.error('Fail to create recurring invoice for subscription %s', subscription.code)
+                    if auto_commit:
+                        cr.rollback()
+                    new_invoice.unlink()
+            if tx is None or not tx.renewal_allowed:
+                amount = subscription.recurring_total
+                date_close = (
+                    subscription.recurring_next_date +
+                    relativedelta(days=subscription.template_id.auto_close_limit or
+                                  15)
+                )
+                close_subscription = current_date >= date_close
+                email_context = self.env.context.copy()
+                email_context.update({
+                    'payment_token': subscription.payment_token_id and subscription.payment_token_id.name,
+                    'renewed': False,
+                    'total_amount': amount,
+                    'email_to': subscription.partner_id.email,
+                    'code': subscription.code,
+                    'currency': subscription.pricelist_id.currency_id.name,
+                    'date_end': subscription.date,
+                    'date_close': date_close
+                })
+                if close_subscription:
+                    model, template_id = imd_res.get_object_reference('sale_subscription', 'email_payment_close')
+                    template = template_res.browse(template_id)
+                    template.with_context(email_context).send_mail(subscription.id)
+                    _logger.debug("Sending Subscription Closure Mail to %s for subscription %s and closing subscription", subscription.partner_id.email, subscription.id)
+                    msg_body = _('Automatic payment failed after multiple attempts. Subscription closed automatically.')
+                    subscription.message_post(body=msg_body)
+                    subscription.set_close()
+                else:
+                    model, template_id = imd_res.get_object_reference('sale_subscription', 'email_payment_reminder')
+                    msg_body = _('Automatic payment failed. Subscription set to "To Renew".')
+                    if (datetime.date.today() - subscription.recurring_next_date).days in [0, 3, 7, 14]:
+                        template = template_res.browse(template_id)
+                        template.with_context(email_context).send_mail(subscription.id)
+                        _logger.debug("Sending Payment Failure Mail to %s for subscription %s and setting subscription to pending", subscription.partner_id.email, subscription.id)
+                        msg_body += _(' E-mail sent to customer.')
+                    subscription.message_post(body=msg_body)
+                    subscription.set_to_renew()
+            if auto_commit:
+                cr.commit()
+        except Exception:
+            if auto_commit:
+                cr.rollback()
+            # we assume that the payment is run only once a day
+            traceback_message = traceback.format_exc()
+            _logger.error(traceback_message)
+            last_tx = self.env['payment.transaction'].search([('reference', 'like', 'SUBSCRIPTION-%s-%s' % (subscription.id, datetime.date.today().strftime('%y%m%d')))], limit=1)
+            error_message = "Error during renewal of subscription %s (%s)" % (subscription.code, 'Payment recorded: %s' % last_tx.reference if last_tx and last_tx.state == 'done' else 'No payment recorded.')
+            _logger.error(error_message)
+
     def send_success_mail(self, tx, invoice):
         imd_res = self.env['ir.model.data']
         template_res = self.env['mail.template']
@@ -509,3 +509,70 @@ class TestSubscription(TestSubscriptionCommon):
         self.assertRecordValues(subscription.subscription_log_ids[-1],
                                 [{'recurring_monthly': 10.0, 'amount_signed': -110}])
 
+
+    def test_19_compute_kpi_batch(self):
+        """ The KPIs computed for several subscriptions at once must be the same as computed one by one """
+        self.subscription_tmpl.write({
+            'good_health_domain': "[('recurring_monthly', '>=', 120.0)]",
+            'bad_health_domain': "[('recurring_monthly', '<=', 80.0)]",
+        })
+        self.subscription_tmpl_2.write({
+            'bad_health_domain': "[('recurring_monthly', '<=', 100.0)]",
+        })
+        subscriptions = self.env['sale.subscription']
+        for template, mrr in [(self.subscription_tmpl, 80.0), (self.subscription_tmpl, 120.0), (self.subscription_tmpl, 100.0),
+                              (self.subscription_tmpl_2, 80.0), (self.subscription_tmpl_2, 120.0)]:
+            subscription = self.env['sale.subscription'].create({
+                'name': 'TestSubscription',
+                'partner_id': self.user_portal.partner_id.id,
+                'pricelist_id': self.company_data['default_pricelist'].id,
+                'template_id': template.id,
+            })
+            subscription.recurring_monthly = mrr
+            subscription.start_subscription()
+            subscriptions |= subscription
+
+        date_log = datetime.date.today() - relativedelta(weeks=6)
+        for subscription, mrr in zip(subscriptions[:2], [100.0, 0.0]):
+            self.env['sale.subscription.log'].sudo().create({
+                'event_type': '1_change',
+                'event_date': date_log,
+                'subscription_id': subscription.id,
+                'recurring_monthly': mrr,
+                'amount_signed': mrr,
+                'currency_id': subscription.currency_id.id,
+                'category': subscription.stage_category,
+                'user_id': subscription.user_id.id,
+                'team_id': subscription.team_id.id,
+            })
+
+        subscriptions._compute_kpi()
+        self.assertEqual(subscriptions.mapped('health'), ['bad', 'done', 'normal', 'bad', 'normal'])
+        for subscription in subscriptions:
+            delta_1month = subscription._get_subscription_delta(datetime.date.today() - relativedelta(months=1))
+            delta_3months = subscription._get_subscription_delta(datetime.date.today() - relativedelta(months=3))
+            self.assertRecordValues(subscription, [{
+                'kpi_1month_mrr_delta': delta_1month['delta'] or 0.0,
+                'kpi_1month_mrr_percentage': delta_1month['percentage'] or 0.0,
+                'kpi_3months_mrr_delta': delta_3months['delta'] or 0.0,
+                'kpi_3months_mrr_percentage': delta_3months['percentage'] or 0.0,
+                'health': subscription._get_subscription_health(),
+            }])
+
+    def test_20_recurring_create_invoice_batch(self):
+        """ Several subscriptions are invoiced together, each one getting its own invoice """
+        self.sale_order_3.analytic_account_id = self.account_1
+        self.sale_order.action_confirm()
+        self.sale_order_3.action_confirm()
+        subscriptions = (self.sale_order | self.sale_order_3).order_line.mapped('subscription_id')
+        self.assertGreater(len(subscriptions), 1)
+        next_dates = subscriptions.mapped('recurring_next_date')
+
+        invoices = subscriptions._recurring_create_invoice()
+        self.assertEqual(len(invoices), len(subscriptions))
+        for subscription, next_date in zip(subscriptions, next_dates):
+            invoice = invoices.filtered(lambda inv: inv.invoice_origin == subscription.code)
+            self.assertEqual(invoice.invoice_line_ids.subscription_id, subscription)
+            self.assertEqual(len(invoice.invoice_line_ids), len(subscription.recurring_invoice_line_ids))
+            self.assertEqual(invoice.invoice_line_ids.analytic_account_id, subscription.analytic_account_id)
+            self.assertGreater(subscription.recurring_next_date, next_date)
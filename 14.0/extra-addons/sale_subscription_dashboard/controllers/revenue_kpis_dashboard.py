@@ -7,7 +7,8 @@ from datetime import timedelta
 from math import floor
 from odoo import http, _, fields
 from odoo.http import request
-from .stat_types import STAT_TYPES, FORECAST_STAT_TYPES, compute_mrr_growth_values
+from .stat_types import STAT_TYPES, FORECAST_STAT_TYPES, compute_mrr_growth_values, compute_mrr_growth_values_series, \
+    compute_stat_series
 
 
 class RevenueKPIsDashboard(http.Controller):
@@ -155,16 +156,17 @@ class RevenueKPIsDashboard(http.Controller):
         end_date = fields.Date.from_string(end_date)
         delta = end_date - start_date
 
-        ticks = self._get_pruned_tick_values(range(delta.days + 1), points_limit)
+        step = self._get_tick_step(delta.days + 1, points_limit)
+        values = compute_mrr_growth_values_series(start_date, end_date, step, filters)
 
         results = defaultdict(list)
 
         # This is rolling month calculation
-        for i in ticks:
+        for i in range(0, delta.days + 1, step):
             date = start_date + timedelta(days=i)
             date_splitted = str(date).split(' ')[0]
 
-            computed_values = compute_mrr_growth_values(date, date, filters)
+            computed_values = values[date]
 
             for k in ['new_mrr', 'churned_mrr', 'expansion_mrr', 'down_mrr', 'net_new_mrr']:
                 results[k].append({
@@ -194,13 +196,13 @@ class RevenueKPIsDashboard(http.Controller):
         end_date = fields.Date.from_string(end_date)
         delta = end_date - start_date
 
-        ticks = self._get_pruned_tick_values(range(delta.days + 1), points_limit)
+        step = self._get_tick_step(delta.days + 1, points_limit)
+        values = compute_stat_series(stat_type, start_date, end_date, step, filters)
 
         results = []
-        for i in ticks:
-            # METHOD NON-OPTIMIZED (could optimize it using SQL with generate_series)
+        for i in range(0, delta.days + 1, step):
             date = start_date + timedelta(days=i)
-            value = self.compute_stat(stat_type, date, date, filters)
+            value = values.get(date, 0)
 
             # format of results could be changed (we no longer use nvd3)
             results.append({
@@ -241,9 +243,14 @@ class RevenueKPIsDashboard(http.Controller):
         if nb_desired_ticks == 0:
             return ticks
 
-        nb_values = len(ticks)
-        keep_one_of = max(1, floor(nb_values / float(nb_desired_ticks)))
+        keep_one_of = self._get_tick_step(len(ticks), nb_desired_ticks)
 
         ticks = [x for x in ticks if x % keep_one_of == 0]
 
         return ticks
+
+    def _get_tick_step(self, nb_values, nb_desired_ticks):
+        """ Returns the number of days between two ticks of a graph, one tick being kept out of this number. """
+        if nb_desired_ticks == 0:
+            return 1
+        return max(1, floor(nb_values / float(nb_desired_ticks)))
@@ -1,11 +1,18 @@
 # -*- coding: utf-8 -*-
 # Part of Odoo. See LICENSE file for full copyright and licensing details.
 
+import threading
+import time
+from collections import defaultdict, OrderedDict
 from dateutil.relativedelta import relativedelta
 from odoo.http import request
 from odoo import _lt
 
-from datetime import datetime
+from datetime import datetime, timedelta
+
+# number of seconds the series of the graphs are kept in the per-worker cache, and maximum number of series kept
+SERIES_CACHE_TTL = 60
+SERIES_CACHE_SIZE = 256
 
 
 def currency_normalisation(sql_result, sum_name):
@@ -86,6 +93,31 @@ def _build_sql_query(fields, tables, conditions, query_args, filters, groupby=No
     return base_query, query_args
 
 
+def _add_log_filters(tables, conditions, query_args, filters):
+    """ Same as the filters of _build_sql_query, for a request on sale_subscription_log instead of account_move_line.
+    The sale_subscription and sale_subscription_template tables are expected to be part of the request.
+    """
+    if filters.get('template_ids'):
+        conditions.append("sale_subscription.template_id IN %(template_ids)s")
+        query_args['template_ids'] = tuple(filters.get('template_ids'))
+
+    if filters.get('sale_team_ids'):
+        conditions.append("sale_subscription_log.team_id IN %(team_ids)s")
+        conditions.append("sale_subscription.team_id IN %(team_ids)s")
+        query_args['team_ids'] = tuple(filters.get('sale_team_ids'))
+
+    if filters.get('tag_ids'):
+        tables.append("account_analytic_tag_sale_subscription_rel")
+        conditions.append("sale_subscription.id = account_analytic_tag_sale_subscription_rel.sale_subscription_id")
+        conditions.append("account_analytic_tag_sale_subscription_rel.account_analytic_tag_id IN %(tag_ids)s")
+        query_args['tag_ids'] = tuple(filters.get('tag_ids'))
+
+    if filters.get('company_ids'):
+        conditions.append("sale_subscription_log.company_id IN %(company_ids)s")
+        conditions.append("sale_subscription.company_id IN %(company_ids)s")
+        query_args['company_ids'] = tuple(filters.get('company_ids'))
+
+
 def compute_net_revenue(start_date, end_date, filters):
     fields = ['account_move_line.price_subtotal,account_move_line.currency_id,account_move_line.company_currency_id']
     tables = ['account_move_line', 'account_move']
@@ -314,24 +346,7 @@ def compute_mrr_growth_values(start_date, end_date, filters):
     ]
 
     query_args = {'date': end_date}
-    if filters.get('template_ids'):
-        conditions.append("sale_subscription.template_id IN %(template_ids)s")
-        query_args['template_ids'] = tuple(filters.get('template_ids'))
-
-    if filters.get('sale_team_ids'):
-        conditions.append("sale_subscription_log.team_id IN %(team_ids)s")
-        conditions.append("sale_subscription.team_id IN %(team_ids)s")
-        query_args['team_ids'] = tuple(filters.get('sale_team_ids'))
-
-    if filters.get('tag_ids'):
-        tables.append("sale_subscription")
-        conditions.append("sale_subscription.tag_ids = IN %(tag_ids)s)")
-        query_args['tag_ids'] = tuple(filters.get('tag_ids'))
-
-    if filters.get('company_ids'):
-        conditions.append("sale_subscription_log.company_id IN %(company_ids)s")
-        conditions.append("sale_subscription.company_id IN %(company_ids)s")
-        query_args['company_ids'] = tuple(filters.get('company_ids'))
+    _add_log_filters(tables, conditions, query_args, filters)
 
     # Filters are empty in the following call because we took care above
     sql_results = _execute_sql_query(fields, tables, conditions, query_args, {})
@@ -375,6 +390,343 @@ def compute_mrr_growth_values(start_date, end_date, filters):
         'net_new_mrr': net_new_mrr,
     }
 
+# Series
+##############################
+# The graphs of the dashboard show the value of a stat at every ``step`` days between two dates, i.e.
+# ``compute(date, date, filters)`` for each of these dates. Instead of running the requests of the stat once per date,
+# the following functions evaluate them for the whole series at once: the dates are generated by the 'series' table
+# and the results are grouped by date. They return a dict {date: value} holding every date of the series.
+
+SERIES_QUERY = """
+    series AS (
+        SELECT generate_series(%(series_start_date)s::date, %(series_end_date)s::date, %(series_step)s * interval '1 day')::date AS date
+    )
+"""
+
+# Subscriptions having an invoice line covering each date of the series (active) or the month before (was_active).
+# Like the NOT EXISTS sub-requests of the stats above, any invoice line is taken into account, whatever the filters.
+SUBSCRIPTION_STATUS_QUERY = """
+    subscription_status AS (
+        SELECT
+            series.date,
+            ail.subscription_id,
+            BOOL_OR(series.date BETWEEN ail.subscription_start_date AND ail.subscription_end_date) AS active,
+            BOOL_OR((series.date - interval '1 months')::date BETWEEN ail.subscription_start_date AND ail.subscription_end_date) AS was_active
+        FROM series
+        JOIN account_move_line ail ON ail.subscription_start_date <= series.date
+            AND ail.subscription_end_date >= (series.date - interval '1 months')::date
+        WHERE ail.subscription_id IS NOT NULL
+        GROUP BY series.date, ail.subscription_id
+    )
+"""
+
+
+def _execute_series_query(fields, tables, conditions, query_args, filters, series, groupby, subscription_status=False):
+    """ Same as _execute_sql_query, for a request evaluated at every date of the series.
+    :params series: tuple (start_date, end_date, step) of the dates to generate in the 'series' table
+    :params subscription_status: make the 'subscription_status' table available to the request
+    """
+    start_date, end_date, step = series
+    query_args = dict(query_args, series_start_date=start_date, series_end_date=end_date, series_step=step)
+    query, args = _build_sql_query(fields, tables + ['series'], conditions, query_args, filters, groupby=groupby)
+    with_queries = [SERIES_QUERY] + ([SUBSCRIPTION_STATUS_QUERY] if subscription_status else [])
+    request.cr.execute('WITH %s %s' % (', '.join(with_queries), query), args)
+    return request.cr.dictfetchall()
+
+
+def _series_normalisation(sql_result, sum_name):
+    """ Same as currency_normalisation, for the results of a series request grouped by date and currencies. """
+    rows_by_date = defaultdict(list)
+    for row in sql_result:
+        rows_by_date[row['date']].append(row)
+    return defaultdict(int, {
+        date: currency_normalisation(rows, sum_name)
+        for date, rows in rows_by_date.items()
+    })
+
+
+def _compute_revenue_series(series, filters, conditions):
+    fields = ['series.date', 'account_move_line.currency_id', 'account_move_line.company_currency_id',
+              'SUM(account_move_line.price_subtotal) AS price_subtotal']
+    tables = ['account_move_line', 'account_move']
+    conditions = [
+        "account_move.invoice_date = series.date",
+        "account_move_line.move_id = account_move.id",
+        "account_move.move_type IN ('out_invoice', 'out_refund')",
+        "account_move.state NOT IN ('draft', 'cancel')",
+    ] + conditions
+
+    sql_results = _execute_series_query(
+        fields, tables, conditions, {}, filters, series,
+        'series.date, account_move_line.currency_id, account_move_line.company_currency_id')
+    return _series_normalisation(sql_results, 'price_subtotal')
+
+
+def _compute_mrr_series(series, filters, date_expr='series.date'):
+    fields = ['series.date', 'account_move_line.currency_id', 'account_move_line.company_currency_id',
+              'SUM(account_move_line.subscription_mrr) AS subscription_mrr']
+    tables = ['account_move_line', 'account_move']
+    conditions = [
+        "%s BETWEEN account_move_line.subscription_start_date AND account_move_line.subscription_end_date" % date_expr,
+        "account_move.id = account_move_line.move_id",
+        "account_move.move_type IN ('out_invoice', 'out_refund')",
+        "account_move.state NOT IN ('draft', 'cancel')"
+    ]
+
+    sql_results = _execute_series_query(
+        fields, tables, conditions, {}, filters, series,
+        'series.date, account_move_line.currency_id, account_move_line.company_currency_id')
+    return _series_normalisation(sql_results, 'subscription_mrr')
+
+
+def _compute_count_series(series, filters, count_expr):
+    fields = ['series.date', 'COUNT(DISTINCT %s) AS sum' % count_expr]
+    tables = ['account_move_line', 'account_move']
+    conditions = [
+        "series.date BETWEEN account_move_line.subscription_start_date AND account_move_line.subscription_end_date",
+        "account_move.id = account_move_line.move_id",
+        "account_move.move_type IN ('out_invoice', 'out_refund')",
+        "account_move.state NOT IN ('draft', 'cancel')",
+    ]
+
+    sql_results = _execute_series_query(fields, tables, conditions, {}, filters, series, 'series.date')
+    return defaultdict(int, {row['date']: row['sum'] or 0 for row in sql_results})
+
+
+def compute_net_revenue_series(series, filters):
+    return _compute_revenue_series(series, filters, [])
+
+
+def compute_nrr_series(series, filters):
+    return _compute_revenue_series(series, filters, [
+        "account_move_line.subscription_start_date IS NULL",
+        "account_move_line.exclude_from_invoice_tab = false",
+    ])
+
+
+def compute_mrr_series(series, filters):
+    return _compute_mrr_series(series, filters)
+
+
+def compute_nb_contracts_series(series, filters):
+    return _compute_count_series(series, filters, 'account_move_line.subscription_id')
+
+
+def compute_arpu_series(series, filters):
+    mrr = compute_mrr_series(series, filters)
+    nb_customers = compute_nb_contracts_series(series, filters)
+    return defaultdict(int, {
+        date: int(0 if not nb_customers[date] else mrr[date]/float(nb_customers[date]))
+        for date in mrr
+    })
+
+
+def compute_arr_series(series, filters):
+    mrr = compute_mrr_series(series, filters)
+    return defaultdict(int, {date: int(12*value) for date, value in mrr.items()})
+
+
+def compute_ltv_series(series, filters):
+    mrr = compute_mrr_series(series, filters)
+    # compute_ltv counts the lines without subscription as one customer
+    nb_customers = _compute_count_series(series, filters, 'COALESCE(account_move_line.subscription_id, 0)')
+    logo_churn = compute_logo_churn_series(series, filters)
+    result = defaultdict(int)
+    for date, sum_mrr in mrr.items():
+        avg_mrr_per_customer = sum_mrr/nb_customers[date] if nb_customers[date] else 0
+        result[date] = int(0 if logo_churn[date] == 0 else avg_mrr_per_customer/float(logo_churn[date]))
+    return result
+
+
+def compute_logo_churn_series(series, filters):
+    fields = [
+        'series.date',
+        'COUNT(DISTINCT account_move_line.subscription_id) AS active',
+        'COUNT(DISTINCT account_move_line.subscription_id) FILTER (WHERE NOT subscription_status.active) AS resigned',
+    ]
+    tables = ['account_move_line', 'account_move', 'subscription_status']
+    conditions = [
+        "(series.date - interval '1 months')::date BETWEEN account_move_line.subscription_start_date AND account_move_line.subscription_end_date",
+        "account_move.id = account_move_line.move_id",
+        "account_move.move_type IN ('out_invoice', 'out_refund')",
+        "account_move.state NOT IN ('draft', 'cancel')",
+        "account_move_line.subscription_id IS NOT NULL",
+        "subscription_status.date = series.date",
+        "subscription_status.subscription_id = account_move_line.subscription_id",
+    ]
+
+    sql_results = _execute_series_query(
+        fields, tables, conditions, {}, filters, series, 'series.date', subscription_status=True)
+    return defaultdict(int, {
+        row['date']: 0 if not row['active'] else 100*row['resigned']/float(row['active'])
+        for row in sql_results
+    })
+
+
+def compute_revenue_churn_series(series, filters):
+    fields = ['series.date', 'account_move_line.currency_id', 'account_move_line.company_currency_id',
+              'SUM(account_move_line.subscription_mrr) AS subscription_mrr']
+    tables = ['account_move_line', 'account_move', 'subscription_status']
+    conditions = [
+        "(series.date - interval '1 months')::date BETWEEN account_move_line.subscription_start_date AND account_move_line.subscription_end_date",
+        "account_move.id = account_move_line.move_id",
+        "account_move.move_type IN ('out_invoice', 'out_refund')",
+        "account_move.state NOT IN ('draft', 'cancel')",
+        "account_move_line.subscription_id IS NOT NULL",
+        "subscription_status.date = series.date",
+        "subscription_status.subscription_id = account_move_line.subscription_id",
+        "NOT subscription_status.active",
+    ]
+
+    sql_results = _execute_series_query(
+        fields, tables, conditions, {}, filters, series,
+        'series.date, account_move_line.currency_id, account_move_line.company_currency_id',
+        subscription_status=True)
+    churned_mrr = _series_normalisation(sql_results, 'subscription_mrr')
+    previous_month_mrr = _compute_mrr_series(series, filters, date_expr="(series.date - interval '1 months')::date")
+    return defaultdict(int, {
+        date: 0 if previous_month_mrr[date] == 0 else 100*churned_mrr[date]/float(previous_month_mrr[date])
+        for date in previous_month_mrr
+    })
+
+
+def compute_mrr_growth_series(series, filters):
+    """ Same as compute_mrr_growth_values, for every date of the series.
+    :returns: a dict {date: values} where values is the dict returned by compute_mrr_growth_values
+    """
+    # 1. NEW & CHURNED
+    fields = [
+        'series.date', 'account_move_line.currency_id', 'account_move_line.company_currency_id',
+        """COALESCE(SUM(account_move_line.subscription_mrr) FILTER (
+            WHERE series.date BETWEEN account_move_line.subscription_start_date AND account_move_line.subscription_end_date
+            AND NOT subscription_status.was_active
+        ), 0) AS new_mrr""",
+        """COALESCE(SUM(account_move_line.subscription_mrr) FILTER (
+            WHERE (series.date - interval '1 months')::date BETWEEN account_move_line.subscription_start_date AND account_move_line.subscription_end_date
+            AND NOT subscription_status.active
+        ), 0) AS churned_mrr""",
+    ]
+    tables = ['account_move_line', 'account_move', 'subscription_status']
+    conditions = [
+        "account_move.id = account_move_line.move_id",
+        "account_move.move_type IN ('out_invoice', 'out_refund')",
+        "account_move.state NOT IN ('draft', 'cancel')",
+        "account_move_line.subscription_id IS NOT NULL",
+        "subscription_status.date = series.date",
+        "subscription_status.subscription_id = account_move_line.subscription_id",
+        """(series.date BETWEEN account_move_line.subscription_start_date AND account_move_line.subscription_end_date
+            OR (series.date - interval '1 months')::date BETWEEN account_move_line.subscription_start_date AND account_move_line.subscription_end_date)""",
+    ]
+
+    sql_results = _execute_series_query(
+        fields, tables, conditions, {}, filters, series,
+        'series.date, account_move_line.currency_id, account_move_line.company_currency_id',
+        subscription_status=True)
+    new_mrr = _series_normalisation(sql_results, 'new_mrr')
+    # The churned MRR is not converted, as in compute_mrr_growth_values.
+    churned_mrr = defaultdict(int)
+    for row in sql_results:
+        churned_mrr[row['date']] += row['churned_mrr']
+
+    # 2. DOWN & EXPANSION
+    fields = [
+        'series.date',
+        'COALESCE(SUM(sale_subscription_log.amount_company_currency) FILTER (WHERE sale_subscription_log.amount_company_currency > 0), 0) AS expansion_mrr',
+        'COALESCE(-SUM(sale_subscription_log.amount_company_currency) FILTER (WHERE sale_subscription_log.amount_company_currency < 0), 0) AS down_mrr',
+    ]
+    tables = ['sale_subscription_log', 'sale_subscription_template', 'sale_subscription']
+    conditions = [
+        "sale_subscription_log.event_type = '1_change'",
+        "sale_subscription_template.id = sale_subscription.template_id",
+        "sale_subscription.id = sale_subscription_log.subscription_id",
+        "sale_subscription_log.event_date >= series.date",
+    ]
+    query_args = {}
+    _add_log_filters(tables, conditions, query_args, filters)
+
+    # Filters are empty in the following call because we took care above
+    sql_results = _execute_series_query(fields, tables, conditions, query_args, {}, series, 'series.date')
+    log_results = {row['date']: row for row in sql_results}
+
+    start_date, end_date, step = series
+    result = {}
+    date = start_date
+    while date <= end_date:
+        expansion_mrr = log_results[date]['expansion_mrr'] if date in log_results else 0
+        down_mrr = log_results[date]['down_mrr'] if date in log_results else 0
+        result[date] = {
+            'new_mrr': new_mrr[date],
+            'churned_mrr': -churned_mrr[date],
+            'expansion_mrr': expansion_mrr,
+            'down_mrr': -down_mrr,
+            'net_new_mrr': new_mrr[date] - churned_mrr[date] + expansion_mrr - down_mrr,
+        }
+        date += timedelta(days=step)
+    return result
+
+
+class SeriesCache(object):
+    """ Thread-safe cache of the computed series, whose entries expire after a short delay.
+
+    The dashboard requests the same graphs again and again while the user navigates between the stats and
+    changes the filters, the series are recomputed only once their entry has expired.
+    """
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expiration, value = entry
+            if expiration < time.monotonic():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_series_cache = SeriesCache(SERIES_CACHE_TTL, SERIES_CACHE_SIZE)
+
+
+def _get_cached_series(name, compute, start_date, end_date, step, filters):
+    filters_key = tuple(sorted(
+        (key, tuple(value) if isinstance(value, list) else value)
+        for key, value in filters.items()
+    ))
+    key = (request.cr.dbname, request.env.company.id, name, start_date, end_date, step, filters_key)
+    result = _series_cache.get(key)
+    if result is None:
+        result = compute((start_date, end_date, step), filters)
+        _series_cache.set(key, result)
+    return result
+
+
+def compute_stat_series(stat_type, start_date, end_date, step, filters):
+    """ Returns the values of the stat at every ``step`` days from start_date to end_date, as a dict {date: value}. """
+    return _get_cached_series(stat_type, STAT_TYPES[stat_type]['compute_series'], start_date, end_date, step, filters)
+
+
+def compute_mrr_growth_values_series(start_date, end_date, step, filters):
+    """ Returns the values of compute_mrr_growth_values at every ``step`` days from start_date to end_date, as a dict
+    {date: values}.
+    """
+    return _get_cached_series('mrr_growth', compute_mrr_growth_series, start_date, end_date, step, filters)
+
 
 STAT_TYPES = {
     'mrr': {
@@ -385,7 +737,8 @@ STAT_TYPES = {
         'prior': 1,
         'type': 'last',
         'add_symbol': 'currency',
-        'compute': compute_mrr
+        'compute': compute_mrr,
+        'compute_series': compute_mrr_series,
     },
     'net_revenue': {
         'name': _lt('Net Revenue'),
@@ -395,7 +748,8 @@ STAT_TYPES = {
         'prior': 2,
         'type': 'sum',
         'add_symbol': 'currency',
-        'compute': compute_net_revenue
+        'compute': compute_net_revenue,
+        'compute_series': compute_net_revenue_series,
     },
     'nrr': {
         'name': _lt('Non-Recurring Revenue'),
@@ -405,7 +759,8 @@ STAT_TYPES = {
         'prior': 3,
         'type': 'sum',
         'add_symbol': 'currency',
-        'compute': compute_nrr
+        'compute': compute_nrr,
+        'compute_series': compute_nrr_series,
     },
     'arpu': {
         'name': _lt('Revenue per Subscription'),
@@ -415,7 +770,8 @@ STAT_TYPES = {
         'prior': 4,
         'type': 'last',
         'add_symbol': 'currency',
-        'compute': compute_arpu
+        'compute': compute_arpu,
+        'compute_series': compute_arpu_series,
     },
     'arr': {
         'name': _lt('Annual Run-Rate'),
@@ -425,7 +781,8 @@ STAT_TYPES = {
         'prior': 5,
         'type': 'last',
         'add_symbol': 'currency',
-        'compute': compute_arr
+        'compute': compute_arr,
+        'compute_series': compute_arr_series,
     },
     'ltv': {
         'name': _lt('Lifetime Value'),
@@ -435,7 +792,8 @@ STAT_TYPES = {
         'prior': 6,
         'type': 'last',
         'add_symbol': 'currency',
-        'compute': compute_ltv
+        'compute': compute_ltv,
+        'compute_series': compute_ltv_series,
     },
     'logo_churn': {
         'name': _lt('Customer Churn'),
@@ -445,7 +803,8 @@ STAT_TYPES = {
         'prior': 7,
         'type': 'last',
         'add_symbol': '%',
-        'compute': compute_logo_churn
+        'compute': compute_logo_churn,
+        'compute_series': compute_logo_churn_series,
     },
     'revenue_churn': {
         'name': _lt('Revenue Churn'),
@@ -455,7 +814,8 @@ STAT_TYPES = {
         'prior': 8,
         'type': 'last',
         'add_symbol': '%',
-        'compute': compute_revenue_churn
+        'compute': compute_revenue_churn,
+        'compute_series': compute_revenue_churn_series,
     },
     'nb_contracts': {
         'name': _lt('# Subscriptions'),
@@ -465,7 +825,8 @@ STAT_TYPES = {
         'prior': 9,
         'type': 'last',
         'add_symbol': '',
-        'compute': compute_nb_contracts
+        'compute': compute_nb_contracts,
+        'compute_series': compute_nb_contracts_series,
     },
 }
 
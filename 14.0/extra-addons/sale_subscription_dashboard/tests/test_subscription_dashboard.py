@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+from datetime import date, timedelta
+from unittest.mock import Mock, patch
+
+from odoo.addons.sale_subscription.tests.common_sale_subscription import TestSubscriptionCommon
+from odoo.addons.sale_subscription_dashboard.controllers import stat_types
+from odoo.tests import tagged
+
+
+@tagged('-at_install', 'post_install')
+class TestSubscriptionDashboard(TestSubscriptionCommon):
+
+    @classmethod
+    def setUpClass(cls, chart_template_ref=None):
+        super().setUpClass(chart_template_ref=chart_template_ref)
+
+        Subscription = cls.env['sale.subscription'].with_context(mail_create_nolog=True, mail_create_nosubscribe=True)
+        cls.subscription_churned = Subscription.create({
+            'name': 'TestSubscriptionChurned',
+            'partner_id': cls.partner_a.id,
+            'pricelist_id': cls.company_data['default_pricelist'].id,
+            'template_id': cls.subscription_tmpl.id,
+        })
+        cls.subscription_foreign = Subscription.create({
+            'name': 'TestSubscriptionForeign',
+            'partner_id': cls.partner_b.id,
+            'pricelist_id': cls.company_data['default_pricelist'].id,
+            'template_id': cls.subscription_tmpl_2.id,
+        })
+
+        def line_vals(price_unit, subscription=None, start_date=None, end_date=None):
+            return (0, 0, {
+                'product_id': cls.product_a.id,
+                'price_unit': price_unit,
+                'tax_ids': [],
+                'subscription_id': subscription and subscription.id,
+                'subscription_start_date': start_date,
+                'subscription_end_date': end_date,
+            })
+
+        cls.env['account.move'].create([{
+            'move_type': 'out_invoice',
+            'partner_id': cls.user_portal.partner_id.id,
+            'invoice_date': '2021-01-01',
+            'invoice_line_ids': [
+                # yearly subscription
+                line_vals(1200.0, cls.subscription, '2021-01-01', '2021-12-31'),
+                # subscription churned in February
+                line_vals(50.0, cls.subscription_churned, '2021-01-01', '2021-01-31'),
+                # line without subscription, not part of the MRR
+                line_vals(30.0),
+            ],
+        }, {
+            'move_type': 'out_invoice',
+            'partner_id': cls.partner_b.id,
+            'currency_id': cls.currency_data['currency'].id,
+            'invoice_date': '2021-01-08',
+            # subscription churned in April, invoiced in another currency
+            'invoice_line_ids': [line_vals(600.0, cls.subscription_foreign, '2021-01-01', '2021-03-31')],
+        }, {
+            'move_type': 'out_invoice',
+            'partner_id': cls.partner_a.id,
+            'invoice_date': '2021-02-05',
+            # subscription period without subscription, counted as a customer by compute_ltv
+            'invoice_line_ids': [line_vals(80.0, None, '2021-02-01', '2021-02-28')],
+        }]).action_post()
+
+    def test_stat_series(self):
+        """ The series of a stat hold the value of the stat computed on its own at each date. """
+        start_date, end_date, step = date(2021, 1, 1), date(2021, 5, 14), 7
+        filters = {}
+        with patch.object(stat_types, 'request', Mock(env=self.env, cr=self.env.cr)):
+            for stat_type, stat in stat_types.STAT_TYPES.items():
+                series = stat['compute_series']((start_date, end_date, step), filters)
+                current_date = start_date
+                while current_date <= end_date:
+                    self.assertAlmostEqual(
+                        series[current_date], stat['compute'](current_date, current_date, filters),
+                        msg='%s at %s' % (stat_type, current_date))
+                    current_date += timedelta(days=step)
+
+            series = stat_types.compute_mrr_growth_series((start_date, end_date, step), filters)
+            current_date = start_date
+            while current_date <= end_date:
+                values = stat_types.compute_mrr_growth_values(current_date, current_date, filters)
+                for key, value in values.items():
+                    self.assertAlmostEqual(series[current_date][key], value, msg='%s at %s' % (key, current_date))
+                current_date += timedelta(days=step)
+
+    def test_stat_series_values(self):
+        """ The series are not trivially equal to the stats, i.e. the invoices of the test are taken into account. """
+        series = (date(2021, 1, 1), date(2021, 5, 14), 7)
+        with patch.object(stat_types, 'request', Mock(env=self.env, cr=self.env.cr)):
+            mrr = stat_types.compute_mrr_series(series, {})
+            nb_contracts = stat_types.compute_nb_contracts_series(series, {})
+            logo_churn = stat_types.compute_logo_churn_series(series, {})
+            nrr = stat_types.compute_nrr_series(series, {})
+            ltv = stat_types.compute_ltv_series(series, {})
+
+        # 100 + 50 + 600 / 3 months in the foreign currency, at the rate 2.0 of the test currency
+        self.assertAlmostEqual(mrr[date(2021, 1, 8)], 250.0)
+        self.assertEqual(nb_contracts[date(2021, 1, 8)], 3)
+        # the period invoiced without subscription is part of the MRR
+        self.assertAlmostEqual(mrr[date(2021, 2, 5)], 280.0)
+        self.assertAlmostEqual(logo_churn[date(2021, 2, 5)], 100 / 3.0)
+        self.assertAlmostEqual(logo_churn[date(2021, 4, 2)], 50.0)
+        self.assertAlmostEqual(nrr[date(2021, 1, 1)], 30.0)
+        self.assertFalse(nrr[date(2021, 1, 8)])
+        self.assertTrue(ltv[date(2021, 2, 5)])
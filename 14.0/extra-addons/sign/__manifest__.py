@@ -16,6 +16,7 @@ Let your customers follow the signature process easily.
         'security/security.xml',
         'security/ir.model.access.csv',
         'data/sign_data.xml',
+        'data/sign_cron.xml',
         'views/sign_template_views_mobile.xml',
         'wizard/sign_send_request_views.xml',
         'wizard/sign_template_share_views.xml',
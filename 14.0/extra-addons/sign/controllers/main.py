@@ -137,6 +137,10 @@ class Sign(http.Controller):
             document = sign_request.template_id.attachment_id.datas
         elif download_type == "completed":
             document = sign_request.completed_document
+            if not document and sign_request.state == 'signed' and not sign_request.check_is_encrypted():
+                # the completed document is not generated by the cron yet
+                sign_request.generate_completed_document()
+                document = sign_request.completed_document
             if not document: # if the document is completed but the document is encrypted
                 return http.redirect_with_hash('/sign/password/%(request_id)s/%(access_token)s' % {'request_id': id, 'access_token': token})
 
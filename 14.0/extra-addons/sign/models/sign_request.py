@@ -3,9 +3,11 @@
 
 import base64
 import io
+import logging
 import os
 import time
 import uuid
+from datetime import timedelta
 
 from PyPDF2 import PdfFileReader, PdfFileWriter
 from reportlab.lib.utils import ImageReader
@@ -23,8 +25,14 @@ from odoo import api, fields, models, http, _
 from odoo.tools import DEFAULT_SERVER_DATE_FORMAT, formataddr, config, get_lang
 from odoo.exceptions import UserError
 
+_logger = logging.getLogger(__name__)
+
 TTFSearchPath.append(os.path.join(config["root_path"], "..", "addons", "web", "static", "src", "fonts", "sign"))
 
+# Number of times the cron tries to send a completed document before giving up,
+# waiting one more hour after each failure.
+COMPLETED_DOCUMENT_MAX_ATTEMPTS = 5
+
 
 def _fix_image_transparency(image):
     """ Modify image transparency to minimize issue of grey bar artefact.
@@ -68,6 +76,15 @@ class SignRequest(models.Model):
     ], default='sent', tracking=True, group_expand='_expand_states')
 
     completed_document = fields.Binary(readonly=True, string="Completed Document", attachment=True)
+    completed_document_pending = fields.Boolean(
+        readonly=True, copy=False,
+        help="The completed document is still to be generated and sent to the signers.")
+    completed_document_attempts = fields.Integer(
+        readonly=True, copy=False,
+        help="Number of failed attempts to generate and send the completed document.")
+    completed_document_retry_date = fields.Datetime(
+        readonly=True, copy=False,
+        help="The completed document is sent again after this date, after a failed attempt.")
 
     nb_wait = fields.Integer(string="Sent Requests", compute="_compute_count", store=True)
     nb_closed = fields.Integer(string="Completed Signatures", compute="_compute_count", store=True)
@@ -241,17 +258,65 @@ class SignRequest(models.Model):
     def action_signed(self):
         self.write({'state': 'signed'})
         self.env.cr.commit()
-        if not self.check_is_encrypted():
-            # if the file is encrypted, we must wait that the document is decrypted
-            self.send_completed_document()
+        # if the file is encrypted, we must wait that the document is decrypted
+        to_complete = self.filtered(lambda r: not r.check_is_encrypted())
+        if to_complete:
+            # the completed document is generated and sent by a cron, so that
+            # the last signer does not wait for it
+            to_complete.write({'completed_document_pending': True})
+            self.env.ref('sign.ir_cron_send_completed_documents').sudo().try_write({'nextcall': fields.Datetime.now()})
+
+    @api.model
+    def _cron_send_completed_documents(self):
+        """ Generate and send the completed documents of the fully signed
+        requests, one request per call. A failed request is tried again later,
+        up to ``COMPLETED_DOCUMENT_MAX_ATTEMPTS`` times. """
+        now = fields.Datetime.now()
+        domain = [
+            ('completed_document_pending', '=', True), ('state', '=', 'signed'),
+            '|', ('completed_document_retry_date', '=', False), ('completed_document_retry_date', '<=', now),
+        ]
+        sign_requests = self.search(domain, limit=1)
+        for sign_request in sign_requests:
+            try:
+                with self.env.cr.savepoint():
+                    sign_request.send_completed_document()
+            except Exception:
+                attempts = sign_request.completed_document_attempts + 1
+                if attempts < COMPLETED_DOCUMENT_MAX_ATTEMPTS:
+                    _logger.warning("Failed to send the completed document of the signature request %s, "
+                                    "attempt %s", sign_request.id, attempts, exc_info=True)
+                    sign_request.write({
+                        'completed_document_attempts': attempts,
+                        'completed_document_retry_date': now + timedelta(hours=attempts),
+                    })
+                    continue
+                _logger.exception("Failed to send the completed document of the signature request %s", sign_request.id)
+                sign_request.message_post(body=_("The completed document could not be sent to the signers."))
+            sign_request.write({
+                'completed_document_pending': False,
+                'completed_document_attempts': 0,
+                'completed_document_retry_date': False,
+            })
+        self.env['ir.cron']._notify_progress(done=len(sign_requests), remaining=self.search_count(domain))
+
+    def _open_template_document(self):
+        """ Return a binary file object on the document of the template, read
+        from the filestore when possible. The caller is responsible for
+        closing it. """
+        self.ensure_one()
+        attachment = self.template_id.attachment_id.sudo()
+        stream = attachment.store_fname and attachment._file_open(attachment.store_fname)
+        return stream or io.BytesIO(attachment.raw or b'')
 
     def check_is_encrypted(self):
         self.ensure_one()
         if not self.template_id.sign_item_ids:
             return False
 
-        old_pdf = PdfFileReader(io.BytesIO(base64.b64decode(self.template_id.attachment_id.datas)), strict=False, overwriteWarnings=False)
-        return old_pdf.isEncrypted
+        with self._open_template_document() as stream:
+            old_pdf = PdfFileReader(stream, strict=False, overwriteWarnings=False)
+            return old_pdf.isEncrypted
 
     def action_canceled(self):
         self.write({'completed_document': None, 'access_token': self._default_access_token(), 'state': 'canceled'})
@@ -327,7 +392,7 @@ class SignRequest(models.Model):
         base_url = self.env['ir.config_parameter'].sudo().get_param('web.base.url')
         attachment = self.env['ir.attachment'].create({
             'name': "%s.pdf" % self.reference,
-            'datas': self.completed_document,
+            'raw': self._get_completed_document_attachment().raw,
             'type': 'binary',
             'res_model': self._name,
             'res_id': self.id,
@@ -419,114 +484,152 @@ class SignRequest(models.Model):
     def _get_normal_font_size(self):
         return 0.015
 
+    def _get_completed_document_attachment(self):
+        self.ensure_one()
+        return self.env['ir.attachment'].sudo().search([
+            ('res_model', '=', self._name),
+            ('res_field', '=', 'completed_document'),
+            ('res_id', '=', self.id),
+        ], limit=1)
+
+    def _set_completed_document(self, content):
+        """ Store the raw bytes of the completed document, without encoding
+        them in base64 as writing on the binary field would do. """
+        self.ensure_one()
+        attachment = self._get_completed_document_attachment()
+        if attachment:
+            attachment.write({'raw': content})
+        else:
+            self.env['ir.attachment'].sudo().create({
+                'name': 'completed_document',
+                'res_model': self._name,
+                'res_field': 'completed_document',
+                'res_id': self.id,
+                'type': 'binary',
+                'raw': content,
+            })
+        self.invalidate_cache(['completed_document'], self.ids)
+
+    def _get_items_by_page(self):
+        """ Return the items of the template having a value for the request,
+        as a dict ``{page: [(item, value)]}``. The values are read at once. """
+        self.ensure_one()
+        item_values = {}
+        for item_value in self.env['sign.request.item.value'].search([('sign_request_id', '=', self.id)]):
+            if item_value.sign_item_id.id not in item_values:
+                item_values[item_value.sign_item_id.id] = item_value.value
+        items_by_page = {}
+        for item in self.template_id.sign_item_ids:
+            value = item_values.get(item.id)
+            if value:
+                items_by_page.setdefault(item.page, []).append((item, value))
+        return items_by_page
+
     def generate_completed_document(self, password=""):
         self.ensure_one()
         if not self.template_id.sign_item_ids:
-            self.completed_document = self.template_id.attachment_id.datas
+            self._set_completed_document(self.template_id.attachment_id.sudo().raw)
             return
 
-        old_pdf = PdfFileReader(io.BytesIO(base64.b64decode(self.template_id.attachment_id.datas)), strict=False, overwriteWarnings=False)
-
-        isEncrypted = old_pdf.isEncrypted
-        if isEncrypted and not old_pdf.decrypt(password):
-            # password is not correct
-            return
-
-        font = self._get_font()
-        normalFontSize = self._get_normal_font_size()
-
-        packet = io.BytesIO()
-        can = canvas.Canvas(packet)
-        itemsByPage = self.template_id.sign_item_ids.getByPage()
-        SignItemValue = self.env['sign.request.item.value']
-        for p in range(0, old_pdf.getNumPages()):
-            page = old_pdf.getPage(p)
-            # Absolute values are taken as it depends on the MediaBox template PDF metadata, they may be negative
-            width = float(abs(page.mediaBox.getWidth()))
-            height = float(abs(page.mediaBox.getHeight()))
-
-            # Set page orientation (either 0, 90, 180 or 270)
-            rotation = page.get('/Rotate')
-            if rotation:
-                can.rotate(rotation)
-                # Translate system so that elements are placed correctly
-                # despite of the orientation
-                if rotation == 90:
-                    width, height = height, width
-                    can.translate(0, -height)
-                elif rotation == 180:
-                    can.translate(-width, -height)
-                elif rotation == 270:
-                    width, height = height, width
-                    can.translate(-width, 0)
-
-            items = itemsByPage[p + 1] if p + 1 in itemsByPage else []
-            for item in items:
-                value = SignItemValue.search([('sign_item_id', '=', item.id), ('sign_request_id', '=', self.id)], limit=1)
-                if not value or not value.value:
-                    continue
-
-                value = value.value
-
-                if item.type_id.item_type == "text":
-                    can.setFont(font, height*item.height*0.8)
-                    can.drawString(width*item.posX, height*(1-item.posY-item.height*0.9), value)
-
-                elif item.type_id.item_type == "selection":
-                    content = []
-                    for option in item.option_ids:
-                        if option.id != int(value):
-                            content.append("<strike>%s</strike>" % (option.value))
-                        else:
-                            content.append(option.value)
-                    font_size = height * normalFontSize * 0.8
-                    can.setFont(font, font_size)
-                    text = " / ".join(content)
-                    string_width = stringWidth(text.replace("<strike>", "").replace("</strike>", ""), font, font_size)
-                    p = Paragraph(text, getSampleStyleSheet()["Normal"])
-                    w, h = p.wrap(width, height)
-                    posX = width * (item.posX + item.width * 0.5) - string_width // 2
-                    posY = height * (1 - item.posY - item.height * 0.5) - h // 2
-                    p.drawOn(can, posX, posY)
-
-                elif item.type_id.item_type == "textarea":
-                    can.setFont(font, height*normalFontSize*0.8)
-                    lines = value.split('\n')
-                    y = (1-item.posY)
-                    for line in lines:
-                        y -= normalFontSize*0.9
-                        can.drawString(width*item.posX, height*y, line)
-                        y -= normalFontSize*0.1
-
-                elif item.type_id.item_type == "checkbox":
-                    can.setFont(font, height*item.height*0.8)
-                    value = 'X' if value == 'on' else ''
-                    can.drawString(width*item.posX, height*(1-item.posY-item.height*0.9), value)
-
-                elif item.type_id.item_type == "signature" or item.type_id.item_type == "initial":
-                    image_reader = ImageReader(io.BytesIO(base64.b64decode(value[value.find(',')+1:])))
-                    _fix_image_transparency(image_reader._image)
-                    can.drawImage(image_reader, width*item.posX, height*(1-item.posY-item.height), width*item.width, height*item.height, 'auto', True)
-
-            can.showPage()
-
-        can.save()
-
-        item_pdf = PdfFileReader(packet, overwriteWarnings=False)
-        new_pdf = PdfFileWriter()
-
-        for p in range(0, old_pdf.getNumPages()):
-            page = old_pdf.getPage(p)
-            page.mergePage(item_pdf.getPage(p))
-            new_pdf.addPage(page)
-
-        if isEncrypted:
-            new_pdf.encrypt(password)
-
-        output = io.BytesIO()
-        new_pdf.write(output)
-        self.completed_document = base64.b64encode(output.getvalue())
-        output.close()
+        with self._open_template_document() as stream:
+            old_pdf = PdfFileReader(stream, strict=False, overwriteWarnings=False)
+
+            isEncrypted = old_pdf.isEncrypted
+            if isEncrypted and not old_pdf.decrypt(password):
+                # password is not correct
+                return
+
+            font = self._get_font()
+            normalFontSize = self._get_normal_font_size()
+
+            # the items are drawn on an overlay having one page for each page
+            # of the document that has item values, the other pages are kept
+            packet = io.BytesIO()
+            can = canvas.Canvas(packet)
+            itemsByPage = self._get_items_by_page()
+            overlay_pages = [p for p in range(0, old_pdf.getNumPages()) if p + 1 in itemsByPage]
+            for p in overlay_pages:
+                page = old_pdf.getPage(p)
+                # Absolute values are taken as it depends on the MediaBox template PDF metadata, they may be negative
+                width = float(abs(page.mediaBox.getWidth()))
+                height = float(abs(page.mediaBox.getHeight()))
+
+                # Set page orientation (either 0, 90, 180 or 270)
+                rotation = page.get('/Rotate')
+                if rotation:
+                    can.rotate(rotation)
+                    # Translate system so that elements are placed correctly
+                    # despite of the orientation
+                    if rotation == 90:
+                        width, height = height, width
+                        can.translate(0, -height)
+                    elif rotation == 180:
+                        can.translate(-width, -height)
+                    elif rotation == 270:
+                        width, height = height, width
+                        can.translate(-width, 0)
+
+                for item, value in itemsByPage[p + 1]:
+                    if item.type_id.item_type == "text":
+                        can.setFont(font, height*item.height*0.8)
+                        can.drawString(width*item.posX, height*(1-item.posY-item.height*0.9), value)
+
+                    elif item.type_id.item_type == "selection":
+                        content = []
+                        for option in item.option_ids:
+                            if option.id != int(value):
+                                content.append("<strike>%s</strike>" % (option.value))
+                            else:
+                                content.append(option.value)
+                        font_size = height * normalFontSize * 0.8
+                        can.setFont(font, font_size)
+                        text = " / ".join(content)
+                        string_width = stringWidth(text.replace("<strike>", "").replace("</strike>", ""), font, font_size)
+                        paragraph = Paragraph(text, getSampleStyleSheet()["Normal"])
+                        w, h = paragraph.wrap(width, height)
+                        posX = width * (item.posX + item.width * 0.5) - string_width // 2
+                        posY = height * (1 - item.posY - item.height * 0.5) - h // 2
+                        paragraph.drawOn(can, posX, posY)
+
+                    elif item.type_id.item_type == "textarea":
+                        can.setFont(font, height*normalFontSize*0.8)
+                        lines = value.split('\n')
+                        y = (1-item.posY)
+                        for line in lines:
+                            y -= normalFontSize*0.9
+                            can.drawString(width*item.posX, height*y, line)
+                            y -= normalFontSize*0.1
+
+                    elif item.type_id.item_type == "checkbox":
+                        can.setFont(font, height*item.height*0.8)
+                        value = 'X' if value == 'on' else ''
+                        can.drawString(width*item.posX, height*(1-item.posY-item.height*0.9), value)
+
+                    elif item.type_id.item_type == "signature" or item.type_id.item_type == "initial":
+                        image_reader = ImageReader(io.BytesIO(base64.b64decode(value[value.find(',')+1:])))
+                        _fix_image_transparency(image_reader._image)
+                        can.drawImage(image_reader, width*item.posX, height*(1-item.posY-item.height), width*item.width, height*item.height, 'auto', True)
+
+                can.showPage()
+
+            can.save()
+
+            item_pdf = PdfFileReader(packet, overwriteWarnings=False)
+            overlay_index = {p: index for index, p in enumerate(overlay_pages)}
+            new_pdf = PdfFileWriter()
+
+            for p in range(0, old_pdf.getNumPages()):
+                page = old_pdf.getPage(p)
+                if p in overlay_index:
+                    page.mergePage(item_pdf.getPage(overlay_index[p]))
+                new_pdf.addPage(page)
+
+            if isEncrypted:
+                new_pdf.encrypt(password)
+
+            with io.BytesIO() as output:
+                new_pdf.write(output)
+                self._set_completed_document(output.getvalue())
 
     @api.model
     def _message_send_mail(self, body, notif_template_xmlid, message_values, notif_values, mail_values, force_send=False, **kwargs):
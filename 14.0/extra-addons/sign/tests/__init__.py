@@ -3,3 +3,4 @@
 
 # import tests
 from . import test_ui
+from . import test_sign_request
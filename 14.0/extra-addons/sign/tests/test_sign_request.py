@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+import base64
+import io
+from unittest.mock import patch
+
+from PyPDF2 import PdfFileReader
+from reportlab.pdfgen import canvas
+
+from odoo.tests.common import TransactionCase
+from odoo.tools import mute_logger
+
+
+class TestSignRequest(TransactionCase):
+
+    def setUp(self):
+        super(TestSignRequest, self).setUp()
+        self.env.user.email = 'bot@example.com'
+        packet = io.BytesIO()
+        can = canvas.Canvas(packet)
+        for page in range(3):
+            can.drawString(100, 100, "Page %s" % (page + 1))
+            can.showPage()
+        can.save()
+        attachment = self.env['ir.attachment'].create({
+            'name': 'contract.pdf',
+            'raw': packet.getvalue(),
+        })
+        text_type = self.env.ref('sign.sign_item_type_text')
+        self.role = self.env['sign.item.role'].create({'name': 'Signer'})
+        self.template = self.env['sign.template'].create({
+            'attachment_id': attachment.id,
+            'sign_item_ids': [(0, 0, {
+                'type_id': text_type.id,
+                'responsible_id': self.role.id,
+                'page': 2,
+                'posX': 0.1,
+                'posY': 0.1 * index,
+                'width': 0.2,
+                'height': 0.015,
+            }) for index in range(1, 4)],
+        })
+        self.partner = self.env['res.partner'].create({'name': 'Signer', 'email': 'signer@example.com'})
+        self.sign_request = self.env['sign.request'].create({
+            'template_id': self.template.id,
+            'reference': 'contract.pdf',
+            'request_item_ids': [(0, 0, {'partner_id': self.partner.id, 'role_id': self.role.id})],
+        })
+        items = self.template.sign_item_ids
+        self.env['sign.request.item.value'].create([{
+            'sign_request_item_id': self.sign_request.request_item_ids.id,
+            'sign_item_id': item.id,
+            'value': 'Value %s' % item.id,
+        } for item in items[:2]])
+
+    def test_generate_completed_document(self):
+        self.sign_request.generate_completed_document()
+        pdf = PdfFileReader(io.BytesIO(base64.b64decode(self.sign_request.completed_document)))
+        self.assertEqual(pdf.getNumPages(), 3)
+        items = self.template.sign_item_ids
+        for page in (0, 2):
+            text = pdf.getPage(page).extractText()
+            self.assertIn("Page %s" % (page + 1), text)
+            self.assertNotIn("Value", text, "only the pages with items should be stamped")
+        text = pdf.getPage(1).extractText()
+        self.assertIn("Page 2", text)
+        self.assertIn("Value %s" % items[0].id, text)
+        self.assertIn("Value %s" % items[1].id, text)
+        self.assertNotIn("Value %s" % items[2].id, text)
+
+    def test_cron_send_completed_documents(self):
+        self.sign_request.write({'state': 'signed', 'completed_document_pending': True})
+        self.env['sign.request']._cron_send_completed_documents()
+        self.assertFalse(self.sign_request.completed_document_pending)
+        self.assertTrue(self.sign_request.completed_document)
+        attachments = self.env['ir.attachment'].search([
+            ('res_model', '=', 'sign.request'),
+            ('res_id', '=', self.sign_request.id),
+            ('name', '=', 'contract.pdf.pdf'),
+        ])
+        self.assertEqual(attachments.raw, base64.b64decode(self.sign_request.completed_document))
+
+    @mute_logger('odoo.addons.sign.models.sign_request')
+    def test_cron_send_completed_documents_failure(self):
+        self.sign_request.write({'state': 'signed', 'completed_document_pending': True})
+        SignRequest = self.env['sign.request']
+        with patch.object(type(SignRequest), 'send_completed_document', side_effect=OSError('mail server down')):
+            SignRequest._cron_send_completed_documents()
+            # the request is kept, and tried again later
+            self.assertTrue(self.sign_request.completed_document_pending)
+            self.assertEqual(self.sign_request.completed_document_attempts, 1)
+            self.assertTrue(self.sign_request.completed_document_retry_date)
+            SignRequest._cron_send_completed_documents()
+            self.assertEqual(self.sign_request.completed_document_attempts, 1)
+
+            self.sign_request.completed_document_retry_date = False
+            SignRequest._cron_send_completed_documents()
+            self.assertEqual(self.sign_request.completed_document_attempts, 2)
+
+        self.sign_request.completed_document_retry_date = False
+        SignRequest._cron_send_completed_documents()
+        self.assertFalse(self.sign_request.completed_document_pending)
+        self.assertFalse(self.sign_request.completed_document_attempts)
+        self.assertTrue(self.sign_request.completed_document)
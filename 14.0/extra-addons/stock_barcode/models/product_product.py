@@ -1,12 +1,116 @@
 # -*- coding: utf-8 -*-
 # Part of Odoo. See LICENSE file for full copyright and licensing details.
 
-from odoo import models, api
+from datetime import timedelta
+
+from odoo import fields, models, api
+
+# Number of products returned by a call to `get_barcode_catalog`.
+BARCODE_CATALOG_PAGE_SIZE = 5000
+# The changes of the transactions still running when a catalog is read are
+# only visible once committed, but with an older write_date: the watermark
+# given to the clients is set back by this delay so that they are not missed.
+BARCODE_CATALOG_SYNC_MARGIN = timedelta(minutes=5)
+# The fields of the rows of the catalog, in order.
+BARCODE_CATALOG_FIELDS = ['barcode', 'id', 'display_name', 'uom_id', 'uom_name', 'tracking', 'qty']
 
 
 class Product(models.Model):
     _inherit = 'product.product'
 
+    def unlink(self):
+        self._filter_barcoded()._reset_barcode_catalog()
+        return super().unlink()
+
+    def _filter_barcoded(self):
+        """ Return the products part of the barcode catalog, through their
+        barcode or the ones of their packagings. """
+        return self.filtered(lambda product: product.barcode or any(product.packaging_ids.mapped('barcode')))
+
+    def _reset_barcode_catalog(self):
+        """ Force the clients of the companies of the products to download the
+        whole barcode catalog on their next sync: the deleted records can not
+        be found by write_date.
+
+        The date is written in SQL, as writing the companies clears the caches
+        of every worker.
+        """
+        if not self:
+            return
+        query = "UPDATE res_company SET barcode_catalog_reset_date = %s"
+        params = [fields.Datetime.now()]
+        if all(product.company_id for product in self):
+            query += " WHERE id IN %s"
+            params.append(tuple(self.company_id.ids))
+        self.env.cr.execute(query, params)
+        self.env['res.company'].invalidate_cache(['barcode_catalog_reset_date'])
+
+    @api.model
+    def get_barcode_catalog(self, since=False, after_id=0, limit=None):
+        """ Return a page of the barcodes of the products and their packagings,
+        used by the barcode client action to find the scanned products.
+
+        The clients keep the catalog and only download the products modified
+        since their last sync. The rows are arrays of the values of
+        ``BARCODE_CATALOG_FIELDS``, ``qty`` being the quantity of the
+        packagings and ``None`` for the products.
+
+        :param since: the ``version`` returned by the last complete sync, to
+            get only the products modified since then
+        :param after_id: the ``after_id`` returned by the previous page
+        :param limit: the maximum number of products of the page
+        :return: a dict with the keys
+
+            * ``version``: the watermark to give as ``since`` to the next sync
+            * ``reset``: whether this is the whole catalog, replacing the one
+              of the client, rather than the changes since ``since``
+            * ``fields`` and ``records``: the rows of the page
+            * ``product_ids``: the products of the page, whose previous rows
+              must be removed by the client
+            * ``after_id``: the value of ``after_id`` to get the next page, or
+              ``False`` on the last page
+        """
+        limit = limit or BARCODE_CATALOG_PAGE_SIZE
+        version = fields.Datetime.to_string(fields.Datetime.now() - BARCODE_CATALOG_SYNC_MARGIN)
+        reset_dates = self.env.companies.sudo().mapped('barcode_catalog_reset_date')
+        reset = not since or any(reset_date and reset_date >= fields.Datetime.to_datetime(since) for reset_date in reset_dates)
+
+        Product = self
+        domain = [('id', '>', after_id or 0)]
+        if reset:
+            domain += ['|', '&', ('barcode', '!=', False), ('type', '!=', 'service'), ('packaging_ids.barcode', '!=', False)]
+        else:
+            # archived products are returned too, without rows, so that the
+            # clients remove them
+            Product = self.with_context(active_test=False)
+            domain += [
+                '|', '|',
+                ('write_date', '>=', since),
+                ('product_tmpl_id.write_date', '>=', since),
+                ('packaging_ids.write_date', '>=', since),
+            ]
+        products = Product.search(domain, order='id', limit=limit)
+
+        records = []
+        for product in products:
+            if not product.active:
+                continue
+            values = [product.id, product.display_name, product.uom_id.id, product.uom_id.name, product.tracking]
+            if product.barcode and product.type != 'service':
+                records.append([product.barcode] + values + [None])
+            for packaging in product.packaging_ids:
+                if packaging.barcode:
+                    records.append([packaging.barcode] + values + [packaging.qty])
+
+        return {
+            'version': version,
+            'reset': reset,
+            'fields': BARCODE_CATALOG_FIELDS,
+            'records': records,
+            'product_ids': products.ids,
+            'after_id': len(products) == limit and products[-1].id,
+        }
+
     @api.model
     def get_all_products_by_barcode(self):
         products = self.env['product.product'].search_read(
@@ -59,3 +163,35 @@ class Product(models.Model):
             )
             res['quant'] = quant[0]
         return res
+
+
+class ProductTemplate(models.Model):
+    _inherit = 'product.template'
+
+    def unlink(self):
+        self.with_context(active_test=False).product_variant_ids._filter_barcoded()._reset_barcode_catalog()
+        return super().unlink()
+
+
+class ProductPackaging(models.Model):
+    _inherit = 'product.packaging'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        if any(vals.get('barcode') for vals in vals_list):
+            self.clear_caches()  # invalidate the barcode map of the pickings
+        return super().create(vals_list)
+
+    def write(self, vals):
+        if 'barcode' in vals or (
+                any(field in vals for field in ('product_id', 'qty', 'company_id'))
+                and any(packaging.barcode for packaging in self)):
+            self.clear_caches()  # invalidate the barcode map of the pickings
+        return super().write(vals)
+
+    def unlink(self):
+        barcoded = self.filtered('barcode')
+        if barcoded:
+            self.clear_caches()  # invalidate the barcode map of the pickings
+            barcoded.product_id._reset_barcode_catalog()
+        return super().unlink()
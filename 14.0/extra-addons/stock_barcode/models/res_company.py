@@ -13,3 +13,7 @@ class Company(models.Model):
         ('azerty', "AZERTY Keyboard"),
         ('alphabetical', "Display Alphabetically"),
     ], string='Keyboard Layout', default='qwerty', required=True, help="Desired order for keyboard shortcuts to appear in.")
+    barcode_catalog_reset_date = fields.Datetime(
+        readonly=True, copy=False,
+        help="Last deletion of products or packagings having barcodes: the clients synced before download the whole "
+             "barcode catalog again.")
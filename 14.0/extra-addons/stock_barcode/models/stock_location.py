@@ -7,6 +7,30 @@ from odoo import models, api
 class Location(models.Model):
     _inherit = 'stock.location'
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        if any(vals.get('barcode') for vals in vals_list):
+            self.clear_caches()  # invalidate the barcode map of the pickings
+        return super().create(vals_list)
+
+    def write(self, vals):
+        if 'barcode' in vals or (
+                any(field in vals for field in ('location_id', 'active', 'company_id'))
+                and self._has_barcode_locations()):
+            self.clear_caches()  # invalidate the barcode map of the pickings
+        return super().write(vals)
+
+    def unlink(self):
+        if self._has_barcode_locations():
+            self.clear_caches()  # invalidate the barcode map of the pickings
+        return super().unlink()
+
+    def _has_barcode_locations(self):
+        """ Return whether these locations or their children have a barcode. """
+        return bool(self.ids) and bool(self.with_context(active_test=False).search_count([
+            ('id', 'child_of', self.ids), ('barcode', '!=', False),
+        ]))
+
     @api.model
     def get_all_locations_by_barcode(self):
         locations = self.env['stock.location'].search_read(
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-from odoo import models, fields, api, _
+from odoo import models, fields, api, tools, _
 from odoo.exceptions import UserError
 from odoo.tools.float_utils import float_compare, float_round
 
@@ -318,37 +318,102 @@ class StockPicking(models.Model):
             'result_package_id',
             'dummy_id',
         ]
-    def on_barcode_scanned(self, barcode):
-        if not self.env.company.nomenclature_id:
-            # Logic for products
+    @api.model
+    @tools.ormcache('company_id')
+    def _get_barcode_map(self, company_id):
+        """ Return the packagings and the locations of the company by barcode,
+        as a dict ``{barcode: {type: [(id, metadata)]}}`` where the metadata
+        of a 'packaging' is its product and its quantity, and the metadata of
+        a 'location' is its parent path.
+
+        The map is cached, and the cache is cleared when the barcodes of these
+        records are modified. The products and the packages are too many, or
+        created too often, to be cached and are searched by barcode instead.
+        """
+        company_domain = [('company_id', 'in', [False, company_id])]
+        barcode_map = {}
+        packagings = self.env['product.packaging'].sudo().search(
+            company_domain + [('barcode', '!=', False), ('product_id', '!=', False)])
+        for packaging in packagings.read(['barcode', 'product_id', 'qty'], load=False):
+            barcode_map.setdefault(packaging['barcode'], {}).setdefault('packaging', [
+                (packaging['id'], (packaging['product_id'], packaging['qty']))
+            ])
+        locations = self.env['stock.location'].sudo().search(company_domain + [('barcode', '!=', False)])
+        for location in locations.read(['barcode', 'parent_path'], load=False):
+            barcode_map.setdefault(location['barcode'], {}).setdefault('location', [
+                (location['id'], location['parent_path'])
+            ])
+        return barcode_map
+
+    def _get_barcode_records(self, barcode, record_type):
+        """ Return the records of the given type ('product', 'packaging',
+        'package' or 'location') matching the given barcode, as a list of
+        ``(id, metadata)``. """
+        if record_type in ('packaging', 'location'):
+            records = self._get_barcode_map(self.env.company.id).get(barcode, {}).get(record_type)
+            if records or record_type == 'packaging':
+                return records or []
+            location = self.env['stock.location'].search([('name', '=', barcode)], limit=1)
+            return [(location.id, location.parent_path)] if location else []
+        if record_type == 'product':
             product = self.env['product.product'].search(['|', ('barcode', '=', barcode), ('default_code', '=', barcode)], limit=1)
-            if product:
-                if self._check_product(product):
-                    return
+            return [(product.id, None)] if product else []
+        packages = self.env['stock.quant.package'].search([('name', '=', barcode)])
+        return [(package.id, None) for package in packages]
+
+    def _is_child_location(self, parent_path, location):
+        """ Return whether the location of the given parent path is the given
+        location or one of its children. """
+        return bool(parent_path and location and parent_path.startswith(location.parent_path))
+
+    def _check_barcode_product(self, barcode, qty=1.0):
+        for product_id, __ in self._get_barcode_records(barcode, 'product'):
+            if self._check_product(self.env['product.product'].browse(product_id), qty):
+                return True
+        return False
 
-            product_packaging = self.env['product.packaging'].search([('barcode', '=', barcode)], limit=1)
-            if product_packaging.product_id:
-                if self._check_product(product_packaging.product_id,product_packaging.qty):
-                    return
+    def _check_barcode_packaging(self, barcode):
+        for __, (product_id, qty) in self._get_barcode_records(barcode, 'packaging'):
+            if self._check_product(self.env['product.product'].browse(product_id), qty):
+                return True
+        return False
 
-            # Logic for packages in source location
-            if self.move_line_ids:
-                package_source = self.env['stock.quant.package'].search([('name', '=', barcode), ('location_id', 'child_of', self.location_id.id)], limit=1)
-                if package_source:
-                    if self._check_source_package(package_source):
-                        return
-
-            # Logic for packages in destination location
-            package = self.env['stock.quant.package'].search([('name', '=', barcode), '|', ('location_id', '=', False), ('location_id','child_of', self.location_dest_id.id)], limit=1)
-            if package:
-                if self._check_destination_package(package):
-                    return
+    def _check_barcode_package(self, barcode):
+        packages = self.env['stock.quant.package'].browse(
+            [package_id for package_id, __ in self._get_barcode_records(barcode, 'package')])
+        # Logic for packages in source location
+        if self.move_line_ids:
+            package_source = packages.filtered(
+                lambda p: self._is_child_location(p.location_id.parent_path, self.location_id))[:1]
+            if package_source:
+                if self._check_source_package(package_source):
+                    return True
+        # Logic for packages in destination location
+        package = packages.filtered(
+            lambda p: not p.location_id or self._is_child_location(p.location_id.parent_path, self.location_dest_id))[:1]
+        if package:
+            if self._check_destination_package(package):
+                return True
+        return False
 
-            # Logic only for destination location
-            location = self.env['stock.location'].search(['|', ('name', '=', barcode), ('barcode', '=', barcode)], limit=1)
-            if location and location.search_count([('id', '=', location.id), ('id', 'child_of', self.location_dest_id.ids)]):
-                if self._check_destination_location(location):
-                    return
+    def _check_barcode_location(self, barcode):
+        # Logic only for destination location
+        for location_id, parent_path in self._get_barcode_records(barcode, 'location'):
+            if self._is_child_location(parent_path, self.location_dest_id):
+                if self._check_destination_location(self.env['stock.location'].browse(location_id)):
+                    return True
+        return False
+
+    def on_barcode_scanned(self, barcode):
+        if not self.env.company.nomenclature_id:
+            if self._check_barcode_product(barcode):
+                return
+            if self._check_barcode_packaging(barcode):
+                return
+            if self._check_barcode_package(barcode):
+                return
+            if self._check_barcode_location(barcode):
+                return
         else:
             parsed_result = self.env.company.nomenclature_id.parse_barcode(barcode)
             if parsed_result['type'] in ['weight', 'product']:
@@ -358,33 +423,20 @@ class StockPicking(models.Model):
                 else: #product
                     product_barcode = parsed_result['code']
                     qty = 1.0
-                product = self.env['product.product'].search(['|', ('barcode', '=', product_barcode), ('default_code', '=', product_barcode)], limit=1)
-                if product:
-                    if self._check_product(product, qty):
-                        return
+                if self._check_barcode_product(product_barcode, qty):
+                    return
 
             if parsed_result['type'] == 'package':
-                if self.move_line_ids:
-                    package_source = self.env['stock.quant.package'].search([('name', '=', parsed_result['code']), ('location_id', 'child_of', self.location_id.id)], limit=1)
-                    if package_source:
-                        if self._check_source_package(package_source):
-                            return
-                package = self.env['stock.quant.package'].search([('name', '=', parsed_result['code']), '|', ('location_id', '=', False), ('location_id','child_of', self.location_dest_id.id)], limit=1)
-                if package:
-                    if self._check_destination_package(package):
-                        return
+                if self._check_barcode_package(parsed_result['code']):
+                    return
 
             if parsed_result['type'] == 'location':
-                location = self.env['stock.location'].search(['|', ('name', '=', parsed_result['code']), ('barcode', '=', parsed_result['code'])], limit=1)
-                if location and location.search_count([('id', '=', location.id), ('id', 'child_of', self.location_dest_id.ids)]):
-                    if self._check_destination_location(location):
-                        return
-
-            product_packaging = self.env['product.packaging'].search([('barcode', '=', parsed_result['code'])], limit=1)
-            if product_packaging.product_id:
-                if self._check_product(product_packaging.product_id,product_packaging.qty):
+                if self._check_barcode_location(parsed_result['code']):
                     return
 
+            if self._check_barcode_packaging(parsed_result['code']):
+                return
+
         return {'warning': {
             'title': _('Wrong barcode'),
             'message': _('The barcode "%(barcode)s" doesn\'t correspond to a proper product, package or location.') % {'barcode': barcode}
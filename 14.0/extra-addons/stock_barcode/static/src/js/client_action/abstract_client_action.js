@@ -10,10 +10,17 @@ var ViewsWidget = require('stock_barcode.ViewsWidget');
 var HeaderWidget = require('stock_barcode.HeaderWidget');
 var LinesWidget = require('stock_barcode.LinesWidget');
 var SettingsWidget = require('stock_barcode.SettingsWidget');
+var local_storage = require('web.local_storage');
+var session = require('web.session');
 var utils = require('web.utils');
 
 var _t = core._t;
 
+// The product catalogs already downloaded, by allowed companies. They are
+// kept between the openings of the client action and only updated with the
+// products modified since their last sync.
+var productCatalogs = {};
+
 function isChildOf(locationParent, locationChild) {
     return _.str.startsWith(locationChild.parent_path, locationParent.parent_path);
 }
@@ -221,13 +228,103 @@ var ClientAction = AbstractAction.extend({
      * @return {Promise}
      */
     _getProductBarcodes: function () {
+        var self = this;
+        var key = 'stock_barcode.product_catalog.' + session.db + '.' + session.uid + '.' +
+            (session.user_context.allowed_company_ids || []).join(',');
+        var catalog = productCatalogs[key] || this._loadProductCatalog(key);
+        return this._syncProductCatalog(catalog, catalog.version, 0).then(function () {
+            productCatalogs[key] = catalog;
+            self._storeProductCatalog(key, catalog);
+            self.productsByBarcode = catalog.productsByBarcode;
+        });
+    },
+
+    /**
+     * Return the product catalog kept in the local storage, or an empty one.
+     *
+     * @private
+     * @param {string} key
+     * @returns {Object} the catalog, with its `version` and `productsByBarcode`
+     */
+    _loadProductCatalog: function (key) {
+        try {
+            var catalog = JSON.parse(local_storage.getItem(key));
+            if (catalog && catalog.version && catalog.productsByBarcode) {
+                return catalog;
+            }
+        } catch (e) {}
+        return {version: false, productsByBarcode: {}};
+    },
+
+    /**
+     * Keep the product catalog in the local storage, if it has enough room.
+     *
+     * @private
+     * @param {string} key
+     * @param {Object} catalog
+     */
+    _storeProductCatalog: function (key, catalog) {
+        try {
+            local_storage.setItem(key, JSON.stringify(catalog));
+        } catch (e) {
+            local_storage.removeItem(key);
+        }
+    },
+
+    /**
+     * Download the pages of the products modified since the given version, or
+     * of the whole catalog when the server requires it, and update the catalog
+     * with them.
+     *
+     * @private
+     * @param {Object} catalog
+     * @param {string|false} since
+     * @param {integer} afterId
+     * @returns {Promise}
+     */
+    _syncProductCatalog: function (catalog, since, afterId) {
         var self = this;
         return this._rpc({
             'model': 'product.product',
-            'method': 'get_all_products_by_barcode',
-            'args': [],
+            'method': 'get_barcode_catalog',
+            'kwargs': {since: since, after_id: afterId},
         }).then(function (res) {
-            self.productsByBarcode = res;
+            if (res.reset && !afterId) {
+                catalog.productsByBarcode = {};
+            }
+            var productsByBarcode = catalog.productsByBarcode;
+            if (!res.reset) {
+                var productIds = new Set(res.product_ids);
+                _.each(_.keys(productsByBarcode), function (barcode) {
+                    if (productIds.has(productsByBarcode[barcode].id)) {
+                        delete productsByBarcode[barcode];
+                    }
+                });
+            }
+            var index = _.invert(res.fields);
+            _.each(res.records, function (record) {
+                var product = {
+                    id: record[index.id],
+                    display_name: record[index.display_name],
+                    uom_id: [record[index.uom_id], record[index.uom_name]],
+                    tracking: record[index.tracking],
+                };
+                if (record[index.qty] !== null) {
+                    product.qty = record[index.qty];
+                    product.product_id = [product.id, product.display_name];
+                }
+                productsByBarcode[record[index.barcode]] = product;
+            });
+            if (res.after_id) {
+                return self._syncProductCatalog(catalog, since, res.after_id).then(function () {
+                    if (!afterId) {
+                        catalog.version = res.version;
+                    }
+                });
+            }
+            if (!afterId) {
+                catalog.version = res.version;
+            }
         });
     },
 
@@ -245,7 +342,8 @@ var ClientAction = AbstractAction.extend({
             var product = this.productsByBarcode[parsed.base_code];
             // if base barcode is not a product, error will be thrown in _step_product()
             if (product) {
-                product.qty = parsed.value;
+                // the catalog is shared with the next openings of the action
+                product = _.extend({}, product, {qty: parsed.value});
             }
             return product;
         } else {
@@ -34,8 +34,15 @@ QUnit.module('Barcode', {
                 return Promise.resolve(self.clientData.currentState);
             } else if (route === '/stock_barcode/static/img/barcode.svg') {
                 return Promise.resolve();
-            } else if (args.method === "get_all_products_by_barcode") {
-                return Promise.resolve({});
+            } else if (args.method === "get_barcode_catalog") {
+                return Promise.resolve({
+                    version: '2020-01-01 00:00:00',
+                    reset: true,
+                    fields: ['barcode', 'id', 'display_name', 'uom_id', 'uom_name', 'tracking', 'qty'],
+                    records: [],
+                    product_ids: [],
+                    after_id: false,
+                });
             } else if (args.method === "get_all_locations_by_barcode") {
                 return Promise.resolve({});
             }
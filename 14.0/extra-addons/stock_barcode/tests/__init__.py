@@ -1,3 +1,5 @@
 # -*- coding: utf-8 -*-
 
 from . import test_barcode_client_action
+from . import test_barcode_lookup
+from . import test_barcode_catalog
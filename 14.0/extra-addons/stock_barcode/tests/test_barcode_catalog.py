@@ -0,0 +1,99 @@
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+from odoo.tests import TransactionCase
+
+
+class TestBarcodeCatalog(TransactionCase):
+    def setUp(self):
+        super(TestBarcodeCatalog, self).setUp()
+        self.Product = self.env['product.product']
+        self.products = self.Product.create([{
+            'name': 'Catalog Product %s' % index,
+            'type': 'product',
+            'barcode': 'CATALOG-%s' % index,
+        } for index in range(3)])
+        self.packaging = self.env['product.packaging'].create({
+            'name': 'Catalog Box',
+            'product_id': self.products[0].id,
+            'qty': 12,
+            'barcode': 'CATALOG-BOX',
+        })
+
+    def _get_catalog(self, since=False, limit=None):
+        """ Return the rows of all the pages of the catalog by barcode, and the
+        last page. """
+        rows = {}
+        after_id = 0
+        while True:
+            page = self.Product.get_barcode_catalog(since=since, after_id=after_id, limit=limit)
+            for record in page['records']:
+                row = dict(zip(page['fields'], record))
+                rows[row['barcode']] = row
+            after_id = page['after_id']
+            if not after_id:
+                return rows, page
+
+    def test_catalog(self):
+        rows, page = self._get_catalog(limit=2)
+        self.assertTrue(page['reset'])
+        for product in self.products:
+            row = rows[product.barcode]
+            self.assertEqual(row['id'], product.id)
+            self.assertEqual(row['display_name'], product.display_name)
+            self.assertEqual(row['uom_id'], product.uom_id.id)
+            self.assertIsNone(row['qty'])
+        self.assertEqual(rows['CATALOG-BOX']['id'], self.products[0].id)
+        self.assertEqual(rows['CATALOG-BOX']['qty'], 12)
+
+    def test_catalog_delta(self):
+        __, page = self._get_catalog()
+        since = page['version']
+        # the records were synced
+        for table, ids in [('product_product', self.products.ids),
+                           ('product_template', self.products.product_tmpl_id.ids),
+                           ('product_packaging', self.packaging.ids)]:
+            self.env.cr.execute("UPDATE %s SET write_date = %%s::timestamp - interval '1 hour' WHERE id IN %%s" % table,
+                                [since, tuple(ids)])
+        self.products.invalidate_cache()
+
+        self.products[1].write({'barcode': 'CATALOG-NEW'})
+        self.products[2].write({'active': False})
+        rows, page = self._get_catalog(since=since)
+        self.assertFalse(page['reset'])
+        self.assertNotIn(self.products[0].id, page['product_ids'])
+        self.assertIn(self.products[1].id, page['product_ids'])
+        self.assertIn(self.products[2].id, page['product_ids'])
+        self.assertEqual(rows['CATALOG-NEW']['id'], self.products[1].id)
+        for barcode in ('CATALOG-0', 'CATALOG-1', 'CATALOG-2', 'CATALOG-BOX'):
+            self.assertNotIn(barcode, rows)
+
+        # the deleted records without barcode are not part of the catalog
+        product = self.Product.create({'name': 'Catalog Product Without Barcode', 'type': 'product'})
+        self.env['product.packaging'].create({'name': 'Catalog Box Without Barcode', 'product_id': self.products[0].id})
+        self.products[0].packaging_ids.filtered(lambda packaging: not packaging.barcode).unlink()
+        product.unlink()
+        __, page = self._get_catalog(since=since)
+        self.assertFalse(page['reset'])
+
+        # the deleted records can not be tracked, the whole catalog is sent
+        self.packaging.unlink()
+        rows, page = self._get_catalog(since=since)
+        self.assertTrue(page['reset'])
+        self.assertNotIn('CATALOG-BOX', rows)
+
+    def test_catalog_reset_company(self):
+        __, page = self._get_catalog()
+        since = page['version']
+        company = self.env['res.company'].create({'name': 'Catalog Company'})
+        product = self.Product.create({
+            'name': 'Catalog Product Other Company',
+            'type': 'product',
+            'barcode': 'CATALOG-OTHER',
+            'company_id': company.id,
+        })
+        # only the clients of the companies of the deleted products download the whole catalog
+        product.unlink()
+        __, page = self._get_catalog(since=since)
+        self.assertFalse(page['reset'])
+        page = self.Product.with_company(company).get_barcode_catalog(since=since)
+        self.assertTrue(page['reset'])
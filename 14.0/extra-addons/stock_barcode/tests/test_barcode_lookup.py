@@ -0,0 +1,65 @@
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+from odoo.tests import TransactionCase
+
+
+class TestBarcodeLookup(TransactionCase):
+    def setUp(self):
+        super(TestBarcodeLookup, self).setUp()
+        self.stock_location = self.env.ref('stock.stock_location_stock')
+        self.shelf = self.env['stock.location'].create({
+            'name': 'Shelf Lookup',
+            'location_id': self.stock_location.id,
+            'barcode': 'LOOKUP-SHELF',
+        })
+        self.product = self.env['product.product'].create({
+            'name': 'Lookup Product',
+            'type': 'product',
+            'barcode': 'LOOKUP-PRODUCT',
+        })
+        self.packaging = self.env['product.packaging'].create({
+            'name': 'Lookup Box',
+            'product_id': self.product.id,
+            'qty': 6,
+            'barcode': 'LOOKUP-BOX',
+        })
+        self.Picking = self.env['stock.picking']
+
+    def test_resolve_barcode(self):
+        Picking = self.Picking
+        self.assertEqual(Picking._get_barcode_records('LOOKUP-PRODUCT', 'product'), [(self.product.id, None)])
+        self.assertEqual(Picking._get_barcode_records('LOOKUP-BOX', 'packaging'), [(self.packaging.id, (self.product.id, 6))])
+        self.assertEqual(Picking._get_barcode_records('LOOKUP-SHELF', 'location'), [(self.shelf.id, self.shelf.parent_path)])
+        self.assertEqual(Picking._get_barcode_records('Shelf Lookup', 'location'), [(self.shelf.id, self.shelf.parent_path)])
+        self.assertTrue(Picking._is_child_location(self.shelf.parent_path, self.stock_location))
+        self.assertFalse(Picking._is_child_location(self.stock_location.parent_path, self.shelf))
+        for record_type in ('product', 'packaging', 'package', 'location'):
+            self.assertFalse(Picking._get_barcode_records('LOOKUP-NOTHING', record_type))
+
+    def test_resolve_barcode_cache(self):
+        Picking = self.Picking
+        Picking._get_barcode_records('LOOKUP-BOX', 'packaging')
+        with self.assertQueryCount(0):
+            Picking._get_barcode_records('LOOKUP-BOX', 'packaging')
+            Picking._get_barcode_records('LOOKUP-SHELF', 'location')
+            # the unknown barcodes are not cached
+            Picking._get_barcode_records('LOOKUP-NOTHING', 'packaging')
+
+        # the cache is only invalidated when a barcode changes
+        self.env['stock.quant.package'].create({'name': 'LOOKUP-PACKAGE'})
+        self.env['stock.location'].create({'name': 'Shelf Lookup 2', 'location_id': self.stock_location.id})
+        with self.assertQueryCount(0):
+            Picking._get_barcode_records('LOOKUP-BOX', 'packaging')
+
+        self.packaging.barcode = 'LOOKUP-BOX-2'
+        self.assertFalse(Picking._get_barcode_records('LOOKUP-BOX', 'packaging'))
+        self.assertTrue(Picking._get_barcode_records('LOOKUP-BOX-2', 'packaging'))
+
+        self.shelf.location_id = self.env.ref('stock.stock_location_customers')
+        records = Picking._get_barcode_records('LOOKUP-SHELF', 'location')
+        self.assertFalse(Picking._is_child_location(records[0][1], self.stock_location))
+
+    def test_resolve_barcode_package(self):
+        self.assertFalse(self.Picking._get_barcode_records('LOOKUP-PACKAGE', 'package'))
+        package = self.env['stock.quant.package'].create({'name': 'LOOKUP-PACKAGE'})
+        self.assertEqual(self.Picking._get_barcode_records('LOOKUP-PACKAGE', 'package'), [(package.id, None)])
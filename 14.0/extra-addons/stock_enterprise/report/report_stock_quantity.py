@@ -12,12 +12,14 @@ class ReportStockQuantity(models.Model):
     _inherit = 'report.stock.quantity'
 
     @api.model
-    def read_grid(self, row_fields, col_field, cell_field, domain=None, range=None, readonly_field=None, orderby=None):
+    def read_grid(self, row_fields, col_field, cell_field, domain=None, range=None, readonly_field=None, orderby=None,
+                  compact=False, limit=None, offset=0):
         if not orderby:
             orderby = 'product_id, state'
         read_grid = super(ReportStockQuantity, self).read_grid(row_fields,
             col_field, cell_field, domain=domain, range=range,
-            readonly_field=readonly_field, orderby=orderby)
+            readonly_field=readonly_field, orderby=orderby,
+            compact=compact, limit=limit, offset=offset)
         return read_grid
 
     @api.model
@@ -4,3 +4,4 @@
 from . import common
 from . import test_flow
 from . import test_ma_internals
+from . import test_performance
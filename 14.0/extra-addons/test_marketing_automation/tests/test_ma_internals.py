@@ -130,3 +130,33 @@ class MarketingCampaignTest(TestMACommon):
 
         self.assertEqual(campaign.running_participant_count, 4)
         self.assertEqual(campaign.participant_ids.mapped('res_id'), (test_records[0:3] | test_records[-1]).ids)
+
+    @users('user_markauto')
+    @mute_logger('odoo.addons.base.ir.ir_model', 'odoo.models')
+    def test_internals_sync_participants(self):
+        test_records = self.test_records.with_env(self.env)
+        campaign = self.env['marketing.campaign'].create({
+            'name': 'My First Campaign',
+            'model_id': self.env['ir.model']._get('marketing.test.sms').id,
+            'domain': '%s' % [('id', 'in', test_records.ids)],
+        })
+        mailing = self._create_mailing()
+        activity = self._create_activity(campaign, mailing=mailing, trigger_type='begin')
+
+        campaign.action_start_campaign()
+        participants = campaign.sync_participants()
+        self.assertEqual(participants, campaign.participant_ids)
+        self.assertEqual(participants.mapped('res_id'), test_records.ids)
+        self.assertEqual(activity.trace_ids.participant_id, participants)
+        self.assertEqual(set(activity.trace_ids.mapped('state')), {'scheduled'})
+
+        # nothing to do if nothing changed
+        self.assertFalse(campaign.sync_participants())
+
+        # the participants whose record does not match the filter anymore are removed
+        campaign.write({'domain': '%s' % [('id', 'in', test_records[1:].ids)]})
+        self.assertFalse(campaign.sync_participants())
+        removed = participants.filtered(lambda p: p.res_id == test_records[0].id)
+        self.assertEqual(removed.state, 'unlinked')
+        self.assertEqual(removed.trace_ids.state, 'canceled')
+        self.assertEqual(set((participants - removed).mapped('state')), {'running'})
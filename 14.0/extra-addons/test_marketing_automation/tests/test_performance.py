@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+import logging
+import time
+
+from odoo.addons.test_marketing_automation.tests.common import TestMACommon
+from odoo.tests import tagged
+from odoo.tools import mute_logger
+
+_logger = logging.getLogger(__name__)
+
+
+class TestMarketAutoPerformanceCommon(TestMACommon):
+
+    def _run_execute_benchmark(self, count):
+        """ Execute an activity filtering half of the ``count`` records of its
+        campaign, and log its throughput. """
+        records = self.env['marketing.test.sms'].with_context(
+            tracking_disable=True, mail_create_nolog=True, mail_create_nosubscribe=True,
+        ).create([{
+            'name': 'Bench_%06d' % index,
+            'description': 'even' if index % 2 == 0 else 'odd',
+        } for index in range(count)])
+        campaign = self.env['marketing.campaign'].create({
+            'name': 'Benchmark Campaign',
+            'model_id': self.env['ir.model']._get('marketing.test.sms').id,
+            'domain': '%s' % [('name', '=like', 'Bench_%')],
+        })
+        server_action = self.env['ir.actions.server'].create({
+            'name': 'Do nothing',
+            'state': 'code',
+            'model_id': self.env['ir.model']._get('marketing.test.sms').id,
+            'code': 'pass',
+        })
+        activity = self._create_activity(
+            campaign, action=server_action, trigger_type='begin', interval_number=0,
+            activity_domain='%s' % [('description', '=', 'even')])
+        campaign.action_start_campaign()
+        campaign.sync_participants()
+        self.assertEqual(len(activity.trace_ids), count)
+
+        self.env['base'].flush()
+        self.env['base'].invalidate_cache()
+        queries = self.env.cr.sql_log_count
+        start = time.time()
+        activity.execute()
+        duration = time.time() - start
+        queries = self.env.cr.sql_log_count - queries
+        _logger.info("marketing.activity.execute on %d traces: %.2fs, %d traces/s, %d queries",
+                     count, duration, count / (duration or 1), queries)
+
+        traces = activity.trace_ids
+        processed = traces.filtered(lambda trace: trace.state == 'processed')
+        rejected = traces.filtered(lambda trace: trace.state == 'rejected')
+        self.assertEqual(set(processed.mapped('res_id')), set(records[::2].ids))
+        self.assertEqual(set(rejected.mapped('res_id')), set(records[1::2].ids))
+
+
+@tagged('marketing_automation')
+class TestMarketAutoPerformance(TestMarketAutoPerformanceCommon):
+
+    @mute_logger('odoo.addons.base.models.ir_model')
+    def test_execute(self):
+        self._run_execute_benchmark(1200)
+
+
+@tagged('-standard', 'marketing_automation_perf')
+class TestMarketAutoBenchmark(TestMarketAutoPerformanceCommon):
+    """ Throughput of marketing.activity.execute, run with
+    ``--test-tags marketing_automation_perf`` """
+
+    @mute_logger('odoo.addons.base.models.ir_model')
+    def test_execute_benchmark(self):
+        self._run_execute_benchmark(100000)
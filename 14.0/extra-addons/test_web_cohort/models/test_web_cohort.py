@@ -14,6 +14,7 @@ class WebCohortSimpleModel(models.Model):
     date_start = fields.Datetime()
     date_stop = fields.Datetime()
     revenue = fields.Float()
+    price = fields.Float(group_operator='max')
     type_id = fields.Many2one("web.cohort.type")
 
 class WebCohortType(models.Model):
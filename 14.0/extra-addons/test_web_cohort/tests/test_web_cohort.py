@@ -203,3 +203,42 @@ class TestCohortEmpty(TestCohortCommon):
         result = self.WebCohortSimpleModel.get_cohort_data("date_start", "date_stop",
             'revenue', 'day', [], 'retention', 'backward')['rows']
         self.assertEqual(result, [])
+
+
+class TestCohortDomain(TestCohortCommon):
+    def setUp(self):
+        super().setUp()
+        data_list = []
+        for name, type_index, date_start, date_stop, price in [
+            ('A', 0, datetime.datetime(2019, 1, 10), False, 10),
+            ('B', 0, datetime.datetime(2019, 1, 12), datetime.datetime(2019, 1, 20), 30),
+            ('Z', 1, datetime.datetime(2019, 1, 14), False, 1000),
+            ('C', 0, datetime.datetime(2019, 2, 10), False, 20),
+            ('Y', 1, datetime.datetime(2019, 2, 14), False, 500),
+        ]:
+            data_list.append({
+                'name': name,
+                'type_id': self.type_ids[type_index],
+                'date_start': date_start,
+                'date_stop': date_stop,
+                'price': price,
+            })
+        self.records = self.WebCohortSimpleModel.create(data_list)
+
+    def test_domain_rows(self):
+        """
+            Test that each row keeps the domain of the view
+        """
+        domain = [('type_id', '=', self.type_ids[0])]
+        result = self.WebCohortSimpleModel.get_cohort_data("date_start", "date_stop",
+            'price', 'month', domain, 'retention', 'backward')['rows']
+        self.assertEqual(len(result), 2)
+        self.assertEqual(self.WebCohortSimpleModel.search(result[0]['domain']).mapped('name'), ['A', 'B'])
+        self.assertEqual(self.WebCohortSimpleModel.search(result[1]['domain']).mapped('name'), ['C'])
+        #The initial value of a non-additive measure is read on the records of the row only
+        self.assertEqual(result[0]['value'], 30)
+        self.assertEqual(result[0]['columns'][0]['value'], 30)
+        self.assertEqual(result[0]['columns'][0]['churn_value'], 0)
+        self.assertEqual(result[1]['value'], 20)
+        self.assertEqual(result[1]['columns'][0]['value'], 20)
+        self.assertEqual(result[1]['columns'][0]['churn_value'], 0)
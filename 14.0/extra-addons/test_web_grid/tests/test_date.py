@@ -2,6 +2,7 @@
 
 from .common import TestWebGrid
 from odoo.fields import Date
+from odoo.osv import expression
 
 
 class TestReadGridDomainDate(TestWebGrid):
@@ -112,6 +113,55 @@ class TestReadGridDomainDate(TestWebGrid):
         # Since the start_date for obj_2 is 2019-06-04, so it is the second week according to its domain
         self.assertEqual(result_read_grid.get('grid')[0][1].get('value'), self.grid_obj_2.resource_hours)  # resource_hours for grid_obj_2 is 4.0
 
+    def test_read_grid_compact_date(self):
+        row_fields = ['task_id']
+        col_field = "start_date"
+        cell_field = "resource_hours"
+        domain = [('project_id', '=', self.grid_obj_2.project_id.id)]
+        grid_obj = self.grid_obj_2.with_context(grid_anchor="2019-06-14")
+
+        result_read_grid = grid_obj.read_grid(row_fields, col_field, cell_field, domain, self.range_day, readonly_field='validated')
+        result_compact = grid_obj.read_grid(row_fields, col_field, cell_field, domain, self.range_day, readonly_field='validated', compact=True)
+
+        self.assertEqual(result_compact['cols'], result_read_grid['cols'])
+        self.assertEqual([r['values'] for r in result_compact['rows']], [r['values'] for r in result_read_grid['rows']])
+        self.assertEqual(result_compact['length'], 1)
+
+        # Only the non-empty cells are sent, located by their row and column
+        cells = [
+            {'row': i, 'col': j, 'size': cell['size'], 'value': cell['value'], 'readonly': cell['readonly']}
+            for i, row in enumerate(result_read_grid['grid'])
+            for j, cell in enumerate(row)
+            if cell['size']
+        ]
+        self.assertEqual(len(cells), 2)
+        self.assertEqual(sorted(result_compact['grid'], key=lambda c: (c['row'], c['col'])), cells)
+
+        # The domain of a cell is the combination of the domain of its row, its column and the view
+        row_domain = result_compact['rows'][0]['domain']
+        col_domain = result_compact['cols'][self.grid_obj_2.start_date.day - 1]['domain']
+        records = self.env['test.web.grid'].search(expression.AND([row_domain, col_domain, domain]))
+        self.assertEqual(records, self.grid_obj_2)
+
+    def test_read_grid_pagination_date(self):
+        row_fields = ['validated']
+        col_field = "start_date"
+        cell_field = "resource_hours"
+        domain = [('project_id', '=', self.grid_obj_2.project_id.id)]
+        grid_obj = self.grid_obj_2.with_context(grid_anchor="2019-06-14")
+
+        result_read_grid = grid_obj.read_grid(row_fields, col_field, cell_field, domain, self.range_day)
+        self.assertEqual(len(result_read_grid['rows']), 2)
+
+        for offset in range(2):
+            result_page = grid_obj.read_grid(row_fields, col_field, cell_field, domain, self.range_day, limit=1, offset=offset)
+            self.assertEqual(result_page['length'], 2)
+            self.assertEqual([r['values'] for r in result_page['rows']], [result_read_grid['rows'][offset]['values']])
+            self.assertEqual(
+                [cell['value'] for cell in result_page['grid'][0]],
+                [cell['value'] for cell in result_read_grid['grid'][offset]],
+            )
+
 class TestReadGridDomainDateNoLang(TestWebGrid):
     def test_read_grid_domain_date_no_lang(self):
         """ Check that week start and week end are defined even when user has no lang """
@@ -43,16 +43,25 @@ class AnalyticLine(models.Model):
             analytic_line.display_timer = analytic_line.encoding_uom_id == uom_hour
 
     @api.model
-    def read_grid(self, row_fields, col_field, cell_field, domain=None, range=None, readonly_field=None, orderby=None):
+    def read_grid(self, row_fields, col_field, cell_field, domain=None, range=None, readonly_field=None, orderby=None,
+                  compact=False, limit=None, offset=0):
         """
             Override method to manage the group_expand in project_id and employee_id fields
         """
-        result = super(AnalyticLine, self).read_grid(row_fields, col_field, cell_field, domain, range, readonly_field, orderby)
+        result = super(AnalyticLine, self).read_grid(row_fields, col_field, cell_field, domain, range, readonly_field, orderby,
+                                                     compact=compact, limit=limit, offset=offset)
 
         if not self.env.context.get('group_expand', False):
             return result
 
         res_rows = [row['values'] for row in result['rows']]
+        if limit and row_fields:
+            # the rows of the other pages are not expanded either
+            grid_domain = expression.AND([domain or [], self._grid_column_info(col_field, range).domain])
+            res_rows = [
+                {f: group[f] for f in row_fields}
+                for group in self._read_group_raw(grid_domain, [f.partition(':')[0] for f in row_fields], row_fields, lazy=False)
+            ]
 
         # For the group_expand, we need to have some information :
         #   1) search in domain one rule with one of next conditions :
@@ -183,6 +192,18 @@ class AnalyticLine(models.Model):
                     if not any(record == row for row in res_rows):
                         rows.append({'values': record, 'domain': [('id', '=', -1)]})
 
+        if 'length' in result:
+            # the expanded rows come after the rows of the last page
+            last_page = not limit or result['length'] <= offset + limit
+            result['length'] += len(rows)
+            if not last_page:
+                return result
+
+        if compact:
+            # the empty cells are not part of the compact grid
+            result['rows'].extend(rows)
+            return result
+
         # _grid_make_empty_cell return a dict, in this dictionary,
         # we need to check if the cell is in the current date,
         # then, we add a key 'is_current' into this dictionary
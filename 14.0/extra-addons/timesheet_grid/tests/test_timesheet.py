@@ -220,3 +220,26 @@ class TestTimesheetValidation(TestCommonTimesheet):
         self.assertFalse(
             project_2.allow_timesheet_timer,
             "On 'allow_timesheets' change to FALSE, 'allow_timesheet_timer' shall be set to FALSE")
+
+    def test_read_grid_pagination_group_expand(self):
+        """ The rows of the other pages are not expanded again on the last page, nor counted twice. """
+        Timesheet = self.env['account.analytic.line'].with_context(
+            group_expand=True, grid_anchor=fields.Date.to_string(fields.Date.today()))
+        row_fields = ['task_id']
+        domain = [('project_id', '=', self.project_customer.id)]
+        grid_range = {'name': 'week', 'string': 'Week', 'span': 'week', 'step': 'day'}
+
+        result = Timesheet.read_grid(row_fields, 'date', 'unit_amount', domain, grid_range)
+        # the rows of both tasks, and the empty row of the project
+        self.assertEqual(len(result['rows']), 3)
+
+        pages = [
+            Timesheet.read_grid(row_fields, 'date', 'unit_amount', domain, grid_range, limit=1, offset=offset)
+            for offset in range(2)
+        ]
+        for page in pages:
+            self.assertEqual(page['length'], 3)
+        self.assertEqual(
+            [row['values'] for page in pages for row in page['rows']],
+            [row['values'] for row in result['rows']],
+        )
@@ -38,42 +38,72 @@ class Base(models.AbstractModel):
         columns_avg = defaultdict(lambda: dict(percentage=0, count=0))
         total_value = 0
         initial_churn_value = 0
-        measure_is_many2one = self._fields.get(measure) and self._fields.get(measure).type == 'many2one'
+        measure_field = self._fields.get(measure)
+        measure_is_many2one = measure_field and measure_field.type == 'many2one'
         field_measure = (
             [measure + ':count_distinct']
             if measure_is_many2one
-            else ([measure] if  self._fields.get(measure) else [])
+            else ([measure] if measure_field else [])
         )
-        row_groups = self._read_group_raw(
+        # The whole matrix is read at once, grouped by start and stop periods, and the values of the rows are
+        # aggregated from its cells: the measures are summed, and the many2one measures are grouped by as well to
+        # count them distinctly. Other aggregates can't be combined and are read per row.
+        measure_is_additive = (
+            measure == '__count__' or measure_is_many2one
+            or (measure_field and (measure_field.group_operator or 'sum') == 'sum')
+        )
+        groupby = [date_start + ':' + interval, date_stop + ':' + interval]
+        if measure_is_many2one:
+            groupby.append(measure)
+        matrix_groups = self._read_group_raw(
             domain=domain,
-            fields=[date_start] + field_measure,
-            groupby=date_start + ':' + interval
+            fields=[date_start, date_stop] + ([] if measure_is_many2one else field_measure),
+            groupby=groupby,
+            lazy=False,
         )
-        for group in row_groups:
+        groups_per_row = {}
+        for group in matrix_groups:
             dates = group['%s:%s' % (date_start, interval)]
-            if not dates:
-                continue
+            if dates:
+                groups_per_row.setdefault(dates, []).append(group)
+
+        def aggregate(groups):
+            if measure_is_many2one:
+                return float(len({g[measure][0] for g in groups if g[measure]}))
+            if measure == '__count__':
+                return float(sum(g['__count'] for g in groups))
+            return float(sum(g[measure] or 0.0 for g in groups))
+
+        if not measure_is_additive:
+            row_values = {
+                group['%s:%s' % (date_start, interval)]: float(group[measure] or 0.0)
+                for group in self._read_group_raw(
+                    domain=domain,
+                    fields=[date_start] + field_measure,
+                    groupby=date_start + ':' + interval,
+                )
+            }
+
+        for dates, groups in groups_per_row.items():
+            range_start, range_end = dates[0].split('/')
+            row_domain = expression.AND([
+                ['&', (date_start, '>=', range_start), (date_start, '<', range_end)],
+                domain,
+            ])
             # Split with space for smoothly format datetime field
-            clean_start_date = dates[0].split('/')[0].split(' ')[0]
+            clean_start_date = range_start.split(' ')[0]
             cohort_start_date = fields.Datetime.from_string(clean_start_date)
-            if measure == '__count__':
-                value = float(group[date_start + '_count'])
-            else:
-                value = float(group[measure] or 0.0)
+            value = aggregate(groups) if measure_is_additive else row_values.get(dates, 0.0)
             total_value += value
 
-            sub_group = self._read_group_raw(
-                domain=group['__domain'],
-                fields=[date_stop] + field_measure,
-                groupby=date_stop + ':' + interval
-            )
-            sub_group_per_period = {}
-            for g in sub_group:
+            groups_per_period = defaultdict(list)
+            for g in groups:
                 d_stop = g["%s:%s" % (date_stop, interval)]
                 if d_stop:
                     date_group = fields.Datetime.from_string(d_stop[0].split('/')[0])
-                    group_interval = date_group.strftime(DISPLAY_FORMATS[interval])
-                    sub_group_per_period[group_interval] = g
+                    groups_per_period[date_group.strftime(DISPLAY_FORMATS[interval])].append((date_group, g))
+                else:
+                    groups_per_period[False].append((False, g))
 
             columns = []
             initial_value = value
@@ -103,34 +133,34 @@ class Base(models.AbstractModel):
                     continue
 
                 significative_period = col_start_date.strftime(DISPLAY_FORMATS[interval])
-                col_group = sub_group_per_period.get(significative_period, {})
-                if not col_group:
-                    col_value = 0.0
-                elif measure == '__count__':
-                    col_value = col_group[date_stop + '_count']
-                else:
-                    col_value = col_group[measure] or 0.0
+                col_groups = [g for date_group, g in groups_per_period.get(significative_period, [])]
+                col_value = aggregate(col_groups) if col_groups else 0.0
 
                 # In backward timeline, if columns are out of given range, we need
                 # to set initial value for calculating correct percentage
                 if timeline == 'backward' and col_index == 0:
-                    outside_timeline_domain = expression.AND(
-                        [
-                            group['__domain'],
-                            ['|',
-                                (date_stop, '=', False),
-                                (date_stop, '>=', fields.Datetime.to_string(col_start_date)),
-                            ]
-                        ]
-                    )
-                    col_group = self._read_group_raw(
-                        domain=outside_timeline_domain,
-                        fields=field_measure,
-                        groupby=[]
-                    )
-                    if measure == '__count__':
-                        initial_value = float(col_group[0]['__count'])
+                    if measure_is_additive:
+                        initial_value = aggregate([
+                            g
+                            for period_groups in groups_per_period.values()
+                            for date_group, g in period_groups
+                            if not date_group or date_group >= col_start_date
+                        ])
                     else:
+                        outside_timeline_domain = expression.AND(
+                            [
+                                row_domain,
+                                ['|',
+                                    (date_stop, '=', False),
+                                    (date_stop, '>=', fields.Datetime.to_string(col_start_date)),
+                                ]
+                            ]
+                        )
+                        col_group = self._read_group_raw(
+                            domain=outside_timeline_domain,
+                            fields=field_measure,
+                            groupby=[]
+                        )
                         initial_value = float(col_group[0][measure] or 0.0)
                     initial_churn_value = value - initial_value
 
@@ -151,11 +181,11 @@ class Base(models.AbstractModel):
                     period = col_start_date.strftime(DISPLAY_FORMATS[interval])
 
                 if mode == 'churn':
-                    domain = [
+                    col_domain = [
                         (date_stop, '<', col_end_date.strftime(DEFAULT_SERVER_DATE_FORMAT)),
                     ]
                 else:
-                    domain = ['|',
+                    col_domain = ['|',
                         (date_stop, '>=', col_end_date.strftime(DEFAULT_SERVER_DATE_FORMAT)),
                         (date_stop, '=', False),
                     ]
@@ -164,14 +194,14 @@ class Base(models.AbstractModel):
                     'value': col_remaining_value,
                     'churn_value': col_value + (columns[-1]['churn_value'] if col_index > 0 else initial_churn_value),
                     'percentage': percentage,
-                    'domain': domain,
+                    'domain': col_domain,
                     'period': period,
                 })
 
             rows.append({
                 'date': dates[1],
                 'value': value,
-                'domain': group['__domain'],
+                'domain': row_domain,
                 'columns': columns,
             })
 
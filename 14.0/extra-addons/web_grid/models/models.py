@@ -19,7 +19,8 @@ class Base(models.AbstractModel):
     _inherit = 'base'
 
     @api.model
-    def read_grid(self, row_fields, col_field, cell_field, domain=None, range=None, readonly_field=None, orderby=None):
+    def read_grid(self, row_fields, col_field, cell_field, domain=None, range=None, readonly_field=None, orderby=None,
+                  compact=False, limit=None, offset=0):
         """
         Current anchor (if sensible for the col_field) can be provided by the
         ``grid_anchor`` value in the context
@@ -29,13 +30,27 @@ class Base(models.AbstractModel):
         :param str cell_field: cell field, summed
         :param range: displayed range for the current page
         :param readonly_field: make cell readonly based on value of readonly_field given
+        :param bool compact: only return the non-empty cells, without their
+                             domain (see below)
+        :param int limit: maximum number of rows to return
+        :param int offset: number of rows to skip
         :type range: None | {'step': object, 'span': object}
         :type domain: None | list
         :returns: dict of prev context, next context, matrix data, row values
                   and column values
+
+        In compact mode, ``grid`` is the list of the non-empty cells, each one
+        located by the ``row`` and ``col`` indexes of its row and column. The
+        domain of a cell is the conjunction of the domains of its row, its
+        column and the view, and is left to the caller to compose when needed.
+
+        When the rows are paginated (or the grid is compact), the rows are read
+        on their own and the result also contains the total number of rows as
+        ``length``.
         """
         domain = expression.normalize_domain(domain)
         column_info = self._grid_column_info(col_field, range)
+        grid_domain = expression.AND([domain, column_info.domain])
 
         grid_select = set([col_field, cell_field])
 
@@ -45,54 +60,77 @@ class Base(models.AbstractModel):
             if readonly_field != column_info.grouping and not self._fields[readonly_field].group_operator:
                 raise UserError(_("The field used as readonly type must have a group_operator attribute."))
 
+        row_key = lambda it, fs=row_fields: tuple(it[f] for f in fs)
+
+        length = None
+        if compact or limit or offset:
+            # the rows have their own domain, so that the cells only need to be
+            # read for the rows of the current page
+            rows, length = self._grid_read_rows(row_fields, grid_domain, orderby=orderby, limit=limit, offset=offset)
+            if limit or offset:
+                grid_domain = expression.OR([r['domain'] for r in rows])
+
         # [{ __count, __domain, grouping, **row_fields, cell_field }]
         groups = self._read_group_raw(
-            expression.AND([domain, column_info.domain]),
+            grid_domain,
             list(grid_select) + [f.partition(':')[0] for f in row_fields],
             [column_info.grouping] + row_fields,
             lazy=False, orderby=orderby
         )
 
-        row_key = lambda it, fs=row_fields: tuple(it[f] for f in fs)
-
-        # [{ values: { field1: value1, field2: value2 } }]
-        rows = self._grid_get_row_headers(row_fields, groups, key=row_key)
+        if length is None:
+            # [{ values: { field1: value1, field2: value2 } }]
+            rows = self._grid_get_row_headers(row_fields, groups, key=row_key)
         # column_info.values is a [(value, label)] seq
         # convert to [{ values: { col_field: (value, label) } }]
         cols = column_info.values
 
-        # map of cells indexed by row_key (tuple of row values) then column value
-        cell_map = collections.defaultdict(dict)
-        for group in groups:
-            row = row_key(group)
-            col = column_info.format(group[column_info.grouping])
-            cell_map[row][col] = self._grid_format_cell(group, cell_field, readonly_field)
-
-        # pre-build whole grid, row-major, h = len(rows), w = len(cols),
-        # each cell is
-        #
-        # * size (number of records)
-        # * value (accumulated cell_field)
-        # * domain (domain for the records of that cell
-        grid = []
-        for r in rows:
-            row = []
-            grid.append(row)
-            r_k = row_key(r['values'])
-            for c in cols:
-                col_value = c['values'][col_field][0]
-                it = cell_map[r_k].get(col_value)
-                if it: # accumulated cell exists, just use it
-                    row.append(it)
-                else:
-                    # generate de novo domain for the cell
-                    # The domain of the cell is the combination of the domain of the row, the
-                    # column and the view.
-                    row.append(self._grid_make_empty_cell(r['domain'], c['domain'], domain))
-                row[-1]['is_current'] = c.get('is_current', False)
-                row[-1]['is_unavailable'] = c.get('is_unavailable', False)
-
-        return {
+        if compact:
+            row_indexes = {row_key(r['values']): index for index, r in enumerate(rows)}
+            col_indexes = {c['values'][col_field][0]: index for index, c in enumerate(cols)}
+            grid = []
+            for group in groups:
+                row_index = row_indexes.get(row_key(group))
+                col_index = col_indexes.get(column_info.format(group[column_info.grouping]))
+                if row_index is None or col_index is None:
+                    continue
+                cell = self._grid_format_cell(group, cell_field, readonly_field)
+                cell.pop('domain')
+                cell.update(row=row_index, col=col_index)
+                grid.append(cell)
+        else:
+            # map of cells indexed by row_key (tuple of row values) then column value
+            cell_map = collections.defaultdict(dict)
+            for group in groups:
+                row = row_key(group)
+                col = column_info.format(group[column_info.grouping])
+                cell_map[row][col] = self._grid_format_cell(group, cell_field, readonly_field)
+
+            # pre-build whole grid, row-major, h = len(rows), w = len(cols),
+            # each cell is
+            #
+            # * size (number of records)
+            # * value (accumulated cell_field)
+            # * domain (domain for the records of that cell
+            grid = []
+            for r in rows:
+                row = []
+                grid.append(row)
+                r_k = row_key(r['values'])
+                for c in cols:
+                    col_value = c['values'][col_field][0]
+                    it = cell_map[r_k].get(col_value)
+                    if it: # accumulated cell exists, just use it
+                        row.append(it)
+                    else:
+                        # generate de novo domain for the cell
+                        # The domain of the cell is the combination of the domain of the row, the
+                        # column and the view.
+                        row.append(self._grid_make_empty_cell(r['domain'], c['domain'], domain))
+                    row[-1]['is_current'] = c.get('is_current', False)
+                    row[-1]['is_unavailable'] = c.get('is_unavailable', False)
+
+        result = {
             'prev': column_info.prev,
             'next': column_info.next,
             'initial': column_info.initial,
@@ -100,6 +138,9 @@ class Base(models.AbstractModel):
             'rows': rows,
             'grid': grid,
         }
+        if length is not None:
+            result['length'] = length
+        return result
 
     def _grid_make_empty_cell(self, row_domain, column_domain, view_domain):
         cell_domain = expression.AND([row_domain, column_domain, view_domain])
@@ -134,6 +175,47 @@ class Base(models.AbstractModel):
             for values, domains in rows
         ]
 
+    def _grid_read_rows(self, row_fields, domain, orderby=None, limit=None, offset=0):
+        """ Read the row headers of the grid independently of its cells: the
+        domain of a row is the domain of its group, instead of the disjunction
+        of the domains of its cells.
+
+        :returns: tuple (rows, length), length being the total number of rows
+        """
+        if not row_fields:
+            # a single row gathering all the records, if any
+            if not self.search(domain, limit=1):
+                return [], 0
+            return ([] if offset else [{'values': {}, 'domain': domain}]), 1
+
+        fields = [f.partition(':')[0] for f in row_fields]
+        groups = self._read_group_raw(domain, fields, row_fields, offset=offset, limit=limit, orderby=orderby, lazy=False)
+        rows = [
+            {'values': {f: group[f] for f in row_fields}, 'domain': group['__domain']}
+            for group in groups
+        ]
+
+        length = len(rows) + offset
+        if limit and len(rows) == limit:
+            length = self._grid_count_rows(row_fields, domain)
+        return rows, length
+
+    def _grid_count_rows(self, row_fields, domain):
+        """ Return the number of rows of the grid, counting the groups of the
+        records by ``row_fields`` without reading nor aggregating them. """
+        self.check_access_rights('read')
+        self._flush_search(domain, fields=[f.partition(':')[0] for f in row_fields])
+        query = self._where_calc(domain)
+        self._apply_ir_rules(query, 'read')
+        groupby_terms = [self._read_group_process_groupby(gb, query)['qualified_field'] for gb in row_fields]
+        from_clause, where_clause, params = query.get_sql()
+        self._cr.execute("""
+            SELECT COUNT(*) FROM (
+                SELECT 1 FROM %s WHERE %s GROUP BY %s
+            ) AS grid_rows
+        """ % (from_clause, where_clause or 'TRUE', ', '.join(groupby_terms)), params)
+        return self._cr.fetchone()[0]
+
     def _grid_column_info(self, name, range):
         """
         :param str name:
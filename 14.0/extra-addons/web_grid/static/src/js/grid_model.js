@@ -3,6 +3,7 @@ odoo.define('web_grid.GridModel', function (require) {
 
 var AbstractModel = require('web.AbstractModel');
 var concurrency = require('web.concurrency');
+var Domain = require('web.Domain');
 var utils = require('web.utils');
 
 const { _t } = require('web.core');
@@ -251,6 +252,57 @@ const GridModel = AbstractModel.extend({
         }
         return rowValues;
     },
+    /**
+     * read_grid is called in compact mode: only the non-empty cells are sent,
+     * without their domain. Rebuild the whole row-major matrix, the domain of
+     * a cell being composed from the domains of its row, its column and the
+     * view the first time it is needed.
+     *
+     * @private
+     * @param {Object} result compact result of read_grid, modified in place
+     * @param {Array} [domain] domain given to read_grid
+     * @returns {Object}
+     */
+    _expandGrid: function (result, domain) {
+        const viewDomain = Domain.prototype.normalizeArray((domain || []).slice());
+        const makeCell = (row, col) => {
+            let cellDomain = null;
+            const cell = {
+                size: 0,
+                value: 0,
+                is_current: col.is_current || false,
+                is_unavailable: col.is_unavailable || false,
+            };
+            Object.defineProperty(cell, 'domain', {
+                enumerable: true,
+                get: function () {
+                    if (!cellDomain) {
+                        const domains = [row.domain, col.domain, viewDomain].filter(d => d.length);
+                        cellDomain = [];
+                        for (let i = 1; i < domains.length; i++) {
+                            cellDomain.push('&');
+                        }
+                        cellDomain = cellDomain.concat(...domains);
+                    }
+                    return cellDomain;
+                },
+                set: function (value) {
+                    cellDomain = value;
+                },
+            });
+            return cell;
+        };
+        const grid = result.rows.map(row => result.cols.map(col => makeCell(row, col)));
+        for (const cell of result.grid) {
+            Object.assign(grid[cell.row][cell.col], {
+                size: cell.size,
+                value: cell.value,
+                readonly: cell.readonly,
+            });
+        }
+        result.grid = grid;
+        return result;
+    },
     /**
      * @private
      * @param {string[]} groupBy
@@ -352,11 +404,13 @@ const GridModel = AbstractModel.extend({
                 range: this.currentRange,
                 domain: sectionGroup.__domain,
                 readonly_field: this.readonlyField,
+                compact: true,
             },
             context: this.getContext(additionalContext),
-        })
-        rpcProm.then(function (grid) {
+        }).then(function (grid) {
+            grid = self._expandGrid(grid, sectionGroup.__domain);
             grid.__label = sectionGroup[self.sectionField];
+            return grid;
         });
         return rpcProm;
     },
@@ -366,7 +420,7 @@ const GridModel = AbstractModel.extend({
      * @returns {Promise}
      */
     _fetchUngroupedData: async function (groupBy) {
-        const result = await this.dp.add(this._rpc({
+        const result = this._expandGrid(await this.dp.add(this._rpc({
                 model: this.modelName,
                 method: 'read_grid',
                 kwargs: {
@@ -376,9 +430,10 @@ const GridModel = AbstractModel.extend({
                     domain: this.domain,
                     range: this.currentRange,
                     readonly_field: this.readonlyField,
+                    compact: true,
                 },
                 context: this.getContext(),
-        }));
+        })), this.domain);
 
         const rows = result.rows;
         rows.forEach((row, rowIndex) => {
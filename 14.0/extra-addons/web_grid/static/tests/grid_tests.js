@@ -649,9 +649,13 @@ QUnit.module('Views', {
             data: this.data,
             arch: this.arch,
             currentDate: "2017-01-25",
-            mockRPC: function () {
+            mockRPC: function (route, args) {
                 return this._super.apply(this, arguments).then(function (result) {
-                    domain = result.grid[0][2].domain;
+                    if (args.method === 'read_grid') {
+                        // the domain of a cell is composed from the domains
+                        // of its row and its column
+                        domain = ['&'].concat(result.rows[0].domain, result.cols[2].domain);
+                    }
                     return result;
                 });
             }
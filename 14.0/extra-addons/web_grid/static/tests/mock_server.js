@@ -138,6 +138,25 @@ MockServer.include({
             grid.push(cells);
         });
 
+        if (kwargs.compact) {
+            // only keep the non-empty cells, without their domain
+            var compactGrid = [];
+            _.each(grid, function (cells, rowIndex) {
+                _.each(cells, function (cell, colIndex) {
+                    if (cell.size) {
+                        compactGrid.push({
+                            row: rowIndex,
+                            col: colIndex,
+                            size: cell.size,
+                            value: cell.value,
+                            readonly: cell.readonly,
+                        });
+                    }
+                });
+            });
+            grid = compactGrid;
+        }
+
         return Promise.resolve({
             cols: columns,
             rows: rows,